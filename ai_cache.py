@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# ==========================================
+# 1. إعدادات ذاكرة ردود الذكاء الاصطناعي
+# ==========================================
+DEFAULT_TTL = 30 * 24 * 3600     # صلاحية الرد المحفوظ (30 يوماً)
+DEFAULT_MAX_ENTRIES = 5000       # عند التجاوز يُحذف الأقدم استخداماً (LRU)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT PRIMARY KEY,
+    value       TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at);
+"""
+
+
+def make_key(*parts):
+    """مفتاح ثابت (SHA-256) لأي مجموعة من القيم القابلة للتحويل إلى JSON"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ==========================================
+# 2. الذاكرة الدائمة على القرص
+# ==========================================
+class ResponseCache:
+    """
+    ذاكرة دائمة (SQLite) لنتائج التحليل الذكي مع صلاحية زمنية وحد أقصى للحجم.
+    الطلبات المتزامنة لنفس المفتاح داخل العملية تُدمج في طلب واحد.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight = {}  # المفتاح -> (حدث الانتهاء، قائمة النتيجة)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def get(self, key):
+        """إرجاع القيمة المحفوظة أو None إذا لم توجد أو انتهت صلاحيتها"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get_or_compute(self, key, compute, cacheable=lambda value: True):
+        """
+        إرجاع القيمة المحفوظة، أو حسابها مرة واحدة فقط حتى لو طلبتها عدة جلسات
+        في نفس اللحظة (ينتظر الباقون نتيجة الطلب الجاري بدلاً من تكراره).
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            pending = self._inflight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._inflight[key] = (threading.Event(), [])
+        done, result = pending
+
+        if not leader:
+            done.wait()
+            if result:
+                return result[0]
+            return compute()  # فشل الطلب الأصلي: نحاول بأنفسنا
+
+        try:
+            value = compute()
+            if cacheable(value):
+                self.put(key, value)
+            result.append(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            done.set()
+
+
+# ==========================================
+# 3. سجل الذواكر المفتوحة (واحدة لكل ملف)
+# ==========================================
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(path):
+    key = os.path.abspath(path)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ResponseCache(path)
+        return cache
@@ -0,0 +1,148 @@
+import json
+
+# ==========================================
+# 1. قراءة رد التحليل أثناء وصوله
+# ==========================================
+# النموذج يرسل كائن JSON {"narrative": "...", "action_plan": [[...], ...]} على دفعات صغيرة.
+# المحلل هنا يتتبع بنية الكائن حرفاً حرفاً، فيظهر نص التحليل مع وصوله
+# وتُضاف كل خطوة من الخطة بمجرد اكتمالها، دون انتظار نهاية الرد.
+NARRATIVE_KEY = "narrative"
+PLAN_KEY = "action_plan"
+
+
+def _complete_prefix(raw):
+    """الجزء القابل للفك من محتوى نص JSON غير مكتمل: يحذف تسلسل هروب مقطوعاً في النهاية (مثل "\\" أو "\\u06")"""
+    cut = raw.rfind("\\")
+    if cut == -1:
+        return raw
+    # عدد الشرطات المائلة المتتالية: عدد زوجي يعني أن الأخيرة ليست بداية هروب
+    start = cut
+    while start > 0 and raw[start - 1] == "\\":
+        start -= 1
+    if (cut - start) % 2 == 1:
+        return raw
+    tail = raw[cut:]
+    if len(tail) == 1:
+        return raw[:cut]
+    if tail[1] == "u" and len(tail) < 6:
+        return raw[:cut]
+    return raw
+
+
+class AnalysisStream:
+    """
+    محلل تزايدي لرد التحليل: feed(جزء) يُرجع True إذا ظهر محتوى جديد
+    في narrative (النص حتى الآن) أو action_plan (الخطوات المكتملة حتى الآن).
+    النص الكامل متاح في text للتحليل النهائي بـ parse_analysis.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.narrative = ""
+        self.action_plan = []
+        self._pos = 0            # أول حرف لم يُفحص بعد
+        self._stack = []         # الحاويات المفتوحة: "{" أو "["
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect_key = False  # داخل الكائن الرئيسي: النص التالي مفتاح وليس قيمة
+        self._is_key = False
+        self._key = None          # آخر مفتاح في الكائن الرئيسي
+        self._item_start = None   # بداية عنصر الخطة الجاري
+        self._done = False
+
+    def _top_level(self):
+        return len(self._stack) == 1
+
+    def _in_plan(self):
+        return self._key == PLAN_KEY and self._stack == ["{", "["]
+
+    def feed(self, chunk):
+        if not chunk or self._done:
+            self.text += chunk or ""
+            return False
+        self.text += chunk
+        text = self.text
+        changed = False
+        i = self._pos
+        while i < len(text) and not self._done:
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    changed |= self._close_string(i)
+                i += 1
+                continue
+
+            if not self._stack:
+                # تجاهل أي نص قبل الكائن (مثل ```json)
+                if ch == "{":
+                    self._stack.append("{")
+                    self._expect_key = True
+                i += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i + 1
+                self._is_key = self._top_level() and self._expect_key
+                if self._in_plan():
+                    self._item_start = i
+            elif ch in "{[":
+                if self._in_plan():
+                    self._item_start = i
+                self._stack.append(ch)
+            elif ch in "}]":
+                self._stack.pop()
+                if not self._stack:
+                    self._done = True
+                elif self._in_plan() and self._item_start is not None:
+                    changed |= self._close_item(i)
+            elif self._top_level():
+                if ch == ",":
+                    self._expect_key = True
+                elif ch == ":":
+                    self._expect_key = False
+            i += 1
+        self._pos = i
+
+        if self._in_string and not self._is_key and self._top_level() and self._key == NARRATIVE_KEY:
+            changed |= self._update_narrative(text[self._string_start:i])
+        return changed
+
+    def _close_string(self, end):
+        raw = self.text[self._string_start:end]
+        if self._is_key:
+            self._key = json.loads(f'"{raw}"')
+            return False
+        if self._top_level() and self._key == NARRATIVE_KEY:
+            return self._update_narrative(raw)
+        if self._in_plan() and self._item_start == self._string_start - 1:
+            return self._close_item(end)
+        return False
+
+    def _update_narrative(self, raw):
+        try:
+            value = json.loads(f'"{_complete_prefix(raw)}"', strict=False)
+        except ValueError:
+            return False
+        # نصف زوج بديل (رمز تعبيري) ينتظر نصفه الثاني في الدفعة التالية
+        if value and "\ud800" <= value[-1] <= "\udbff":
+            value = value[:-1]
+        if value == self.narrative:
+            return False
+        self.narrative = value
+        return True
+
+    def _close_item(self, end):
+        raw = self.text[self._item_start:end + 1]
+        self._item_start = None
+        try:
+            self.action_plan.append(json.loads(raw))
+        except ValueError:
+            return False
+        return True
@@ -0,0 +1,257 @@
+import threading
+
+from history import _percentages, flatten_ratings
+
+# ==========================================
+# 1. إعدادات إحصائيات الأقسام
+# ==========================================
+# مجاميع كل مستوى تُحدَّث بفرق التلميذ المعدَّل فقط (طرح مساهمته القديمة وإضافة الجديدة)،
+# فلا تحتاج لوحة التحكم إلى إعادة حساب كل التلاميذ.
+ALL_LEVELS = None       # مفتاح مجاميع كل التلاميذ
+HISTOGRAM_BINS = 10     # فئات توزيع الأداء العام: 0-10%، 10-20%، ...، 90-100%
+RANK_BUCKETS = 1001     # دقة الترتيب: 0.1% (التلاميذ داخل نفس الخانة متساوون في الرتبة)
+
+
+def _bucket(overall):
+    return min(RANK_BUCKETS - 1, max(0, int(round(overall * (RANK_BUCKETS - 1) / 100))))
+
+
+def _histogram_bin(overall):
+    return min(HISTOGRAM_BINS - 1, int(overall * HISTOGRAM_BINS / 100))
+
+
+# ==========================================
+# 2. فهرس الترتيب
+# ==========================================
+class RankIndex:
+    """
+    فهرس إحصاءات ترتيبية (شجرة Fenwick على خانات الأداء العام):
+    الإضافة والحذف وحساب الرتبة والمئين بزمن لوغاريتمي مهما كان عدد التلاميذ.
+    """
+
+    def __init__(self):
+        self._tree = [0] * (RANK_BUCKETS + 1)
+        self._members = {}   # الخانة -> أسماء تلاميذها (لعرض الأوائل دون ترتيب الكل)
+        self.size = 0
+
+    def add(self, bucket, name, delta):
+        if delta > 0:
+            self._members.setdefault(bucket, set()).add(name)
+        else:
+            members = self._members[bucket]
+            members.discard(name)
+            if not members:
+                del self._members[bucket]
+        self.size += delta
+        i = bucket + 1
+        while i <= RANK_BUCKETS:
+            self._tree[i] += delta
+            i += i & -i
+
+    def count_below(self, bucket):
+        """عدد التلاميذ في الخانات الأقل من bucket"""
+        total = 0
+        i = bucket
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def rank(self, bucket):
+        """الرتبة (1 للأفضل): واحد زائد عدد التلاميذ الأعلى أداءً"""
+        return self.size - self.count_below(bucket + 1) + 1
+
+    def percentile(self, bucket):
+        """نسبة التلاميذ الأقل أداءً (مع نصف المتساوين)"""
+        if not self.size:
+            return 0.0
+        below = self.count_below(bucket)
+        equal = len(self._members.get(bucket, ()))
+        return (below + equal / 2) * 100.0 / self.size
+
+    def top(self, limit):
+        """أسماء الأوائل من الخانة الأعلى نزولاً: [(الخانة، الاسم)]"""
+        result = []
+        for bucket in sorted(self._members, reverse=True):
+            for name in sorted(self._members[bucket]):
+                result.append((bucket, name))
+                if len(result) >= limit:
+                    return result
+        return result
+
+
+# ==========================================
+# 3. مجاميع المستوى الواحد
+# ==========================================
+class ClassStats:
+    """مجاميع مستوى واحد: عدد التلاميذ، مجموع النسب، توزيع الأداء، درجات كل مهارة، والترتيب"""
+
+    def __init__(self):
+        self.students = 0
+        self.totals = [0.0, 0.0, 0.0]            # مجموع النسب الأكاديمية والسلوكية والعامة
+        self.histogram = [0] * HISTOGRAM_BINS
+        self.skills = {}                         # (الفئة، المجال، المادة، المهارة) -> [عدد 0، عدد 1، عدد 2]
+        self.ranks = RankIndex()
+
+    def add(self, name, entry, sign):
+        """إضافة مساهمة تلميذ (sign=1) أو طرحها (sign=-1)"""
+        percentages, flat = entry
+        self.students += sign
+        for i, value in enumerate(percentages):
+            self.totals[i] += sign * value
+        self.histogram[_histogram_bin(percentages[2])] += sign
+        self.ranks.add(_bucket(percentages[2]), name, sign)
+        for key, score in flat:
+            counts = self.skills.get(key)
+            if counts is None:
+                counts = self.skills[key] = [0, 0, 0]
+            counts[score] += sign
+
+
+# ==========================================
+# 4. إحصائيات كل الأقسام
+# ==========================================
+class ClassAnalytics:
+    """
+    إحصائيات مادية لكل مستوى تُحدَّث تلميذاً تلميذاً.
+    sync يطبق فقط التلاميذ الذين تغيروا في المخزن منذ آخر مزامنة (من هذه الجلسة أو غيرها).
+    """
+
+    def __init__(self):
+        self.revision = None
+        self._entries = {}   # الاسم -> (المستوى، (النسب)، ((المهارة، الدرجة)، ...))
+        self._classes = {}
+        self._keys = {}      # مسارات المهارات المشتركة بين كل التلاميذ (بدل نسخة لكل تلميذ)
+        self._lock = threading.RLock()
+
+    def _stats(self, level):
+        stats = self._classes.get(level)
+        if stats is None:
+            stats = self._classes[level] = ClassStats()
+        return stats
+
+    def remove(self, name):
+        with self._lock:
+            old = self._entries.pop(name, None)
+            if old is None:
+                return
+            level, *entry = old
+            for key in (level, ALL_LEVELS):
+                stats = self._classes[key]
+                stats.add(name, entry, -1)
+                if not stats.students:
+                    del self._classes[key]
+
+    def update(self, name, record):
+        """استبدال مساهمة تلميذ بسجله الجديد (record=None للحذف)"""
+        with self._lock:
+            self.remove(name)
+            if record is None:
+                return
+            # الدرجات غير المعتادة (خارج 0-2) لا تدخل في عدّ مستويات الاكتساب
+            flat = tuple(
+                (self._keys.setdefault(k, k), v) for k, v in flatten_ratings(record.get("evaluations", {})).items()
+                if type(v) is int and 0 <= v <= 2
+            )
+            totals = {"academic": [0, 0], "behavioral": [0, 0]}
+            for (category, *_), score in flat:
+                totals[category][0] += score
+                totals[category][1] += 1
+            (ac_total, ac_count), (bh_total, bh_count) = totals["academic"], totals["behavioral"]
+            percentages = _percentages(ac_total, ac_count, bh_total, bh_count)
+            level = record.get("info", {}).get("class_level") or ""
+            self._entries[name] = (level, percentages, flat)
+            for key in (level, ALL_LEVELS):
+                self._stats(key).add(name, (percentages, flat), 1)
+
+    def rebuild(self, records, revision=None):
+        with self._lock:
+            self._entries = {}
+            self._classes = {}
+            for name, record in records.items():
+                self.update(name, record)
+            self.revision = revision
+
+    def sync(self, store):
+        """تطبيق تعديلات المخزن منذ آخر مزامنة (أو إعادة البناء إذا تعذر معرفتها)"""
+        with self._lock:
+            revision, names = store.changes(self.revision)
+            if names is None:
+                self.rebuild(store.load_all(), revision)
+                return self
+            for name in names:
+                self.update(name, store.get(name))
+            self.revision = revision
+            return self
+
+    # --- القراءة ---
+    def levels(self):
+        with self._lock:
+            return sorted(level for level in self._classes if level)
+
+    def summary(self, level=ALL_LEVELS):
+        """عدد التلاميذ ومتوسطات النسب وتوزيع الأداء العام لمستوى (أو للجميع)"""
+        with self._lock:
+            stats = self._classes.get(level) or ClassStats()
+            n = stats.students
+            return {
+                "students": n,
+                "academic_average": stats.totals[0] / n if n else 0.0,
+                "behavioral_average": stats.totals[1] / n if n else 0.0,
+                "overall_average": stats.totals[2] / n if n else 0.0,
+                "histogram": list(stats.histogram),
+            }
+
+    def skills(self, level=ALL_LEVELS):
+        """
+        لكل مهارة: عدد التلاميذ المقيّمين، توزيعهم على المستويات ونسبة الاكتساب
+        (بنفس أعمدة جدول "skills" في score_roster).
+        """
+        with self._lock:
+            stats = self._classes.get(level) or ClassStats()
+            rows = []
+            for (category, domain, subject, skill), counts in stats.skills.items():
+                rated = sum(counts)
+                if not rated:
+                    continue
+                total = counts[1] + 2 * counts[2]
+                rows.append({
+                    "category": category, "domain": domain, "subject": subject, "skill": skill,
+                    "rated": rated, "level_0": counts[0], "level_1": counts[1], "level_2": counts[2],
+                    "total": total, "acquired_percentage": total * 50.0 / rated,
+                })
+            return rows
+
+    def hardest_skills(self, level=ALL_LEVELS, limit=5):
+        """المهارات الأقل اكتساباً (الأكثر تلاميذ غير مكتسبين عند التساوي)"""
+        rows = self.skills(level)
+        rows.sort(key=lambda r: (r["acquired_percentage"], -r["level_0"]))
+        return rows[:limit]
+
+    def ranking(self, level=ALL_LEVELS, limit=10):
+        """الأوائل: [{"rank", "name", "overall_percentage"}] من الأعلى أداءً"""
+        with self._lock:
+            stats = self._classes.get(level)
+            if stats is None:
+                return []
+            return [
+                {"rank": stats.ranks.rank(bucket), "name": name,
+                 "overall_percentage": self._entries[name][1][2]}
+                for bucket, name in stats.ranks.top(limit)
+            ]
+
+    def rank_of(self, name, across_levels=False):
+        """رتبة تلميذ ومئينه داخل مستواه (أو بين كل التلاميذ)، أو None إن لم يوجد"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            own_level, percentages, _ = entry
+            stats = self._classes[ALL_LEVELS if across_levels else own_level]
+            bucket = _bucket(percentages[2])
+            return {
+                "rank": stats.ranks.rank(bucket),
+                "students": stats.students,
+                "percentile": stats.ranks.percentile(bucket),
+                "overall_percentage": percentages[2],
+            }
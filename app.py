@@ -1,14 +1,18 @@
+import os
 import streamlit as st
-import pandas as pd
-import json
+import ai_cache
 import data_manager as dm
-from datetime import datetime
+import jobs
+import metrics
 
 # ==========================================
 # 1. إعدادات الصفحة والتهيئة
 # ==========================================
 st.set_page_config(page_title="نظام التقييم الشامل المطور", layout="wide", page_icon="🎓")
 
+# مجلد حفظ التقارير الجماعية
+REPORTS_DIR = "reports"
+
 # تحميل التنسيقات (CSS)
 def load_css():
     try:
@@ -24,9 +28,86 @@ def load_css():
 
 load_css()
 
-# تهيئة البيانات
-if 'students' not in st.session_state:
-    st.session_state.students = dm.load_data()
+# تهيئة البيانات: فهرس الأسماء والبيانات الشخصية فقط، وتُجلب التقييمات لكل تلميذ عند الحاجة
+students = dm.student_index()
+
+# اختيار تلميذ بالبحث: القائمة المنسدلة تعرض أول النتائج فقط بدل آلاف الأسماء
+PICKER_LIMIT = 50
+
+def student_picker(key):
+    query = st.text_input("🔍 بحث بالاسم أو رقم التعريف:", key=f"{key}_query")
+    total, names = students.search(query, limit=PICKER_LIMIT)
+    if not total:
+        st.info("لا توجد نتائج مطابقة، تُعرض كل القائمة.")
+        total, names = students.search(limit=PICKER_LIMIT)
+    if total > len(names):
+        st.caption(f"عرض أول {len(names)} من {total} نتيجة، اكتب المزيد لتضييق البحث.")
+    return st.selectbox("اختر التلميذ:", names, key=f"{key}_student")
+
+def student_record(student):
+    """
+    السجل المشترك للتلميذ المختار؛ إذا حُذف من جلسة أخرى (أو تعذرت القراءة)
+    تُعرض رسالة وتتوقف الصفحة بدل الانهيار، والقائمة تتحدث في التشغيل التالي.
+    """
+    record = dm.student_view(student) if student is not None else None
+    if record is None:
+        st.warning("تعذر تحميل بيانات هذا التلميذ (ربما حُذف). اختر تلميذاً آخر أو حدّث الصفحة.")
+        st.stop()
+    return record
+
+# متابعة المهام الخلفية (التحليل الذكي و PDF): تُنفَّذ خارج الجلسة وتعرض الصفحة حالتها فقط
+JOB_POLL_SECONDS = 2
+STREAM_POLL_SECONDS = 0.5   # تحديث أسرع لعرض نص التحليل أثناء وصوله
+
+def narrative_box(text):
+    st.markdown(
+        f"""
+        <div style="background-color:#f8f9fa; padding:20px; border-radius:10px; border-right: 5px solid #2e86de; font-size:16px; line-height:1.8; color:#2c3e50;">
+        {text.replace(chr(10), '<br>')}
+        </div>
+        """, unsafe_allow_html=True
+    )
+
+def show_partial_analysis(partial):
+    """التحليل الجزئي أثناء وصوله: النص حتى الآن والخطوات المكتملة"""
+    if partial["narrative"]:
+        narrative_box(partial["narrative"] + " ▌")
+    for item in partial["action_plan"]:
+        if isinstance(item, (list, tuple)) and len(item) == 2:
+            st.caption(f"📌 {item[0]}: {item[1]}")
+
+def job_status(kind, target, poll=JOB_POLL_SECONDS, show_partial=None):
+    """
+    عرض حالة آخر مهمة (kind, target) مع تحديث تلقائي ما دامت جارية،
+    ثم إعادة تحميل الصفحة عند انتهائها لعرض النتيجة. يُرجع المهمة أو None.
+    show_partial(partial): عرض النتيجة الجزئية للمهمة الجارية إن وجدت.
+    """
+    queue = jobs.get_queue()
+    job = queue.latest(kind, target)
+    active = job is not None and job["status"] in jobs.ACTIVE
+
+    @st.fragment(run_every=poll if active else None)
+    def show():
+        current = queue.latest(kind, target)
+        if current is None:
+            return
+        if current["status"] in jobs.ACTIVE:
+            if current["partial"] and show_partial:
+                show_partial(current["partial"])
+            elif current["total"]:
+                st.progress(current["done"] / current["total"],
+                            text=f"{current['done']}/{current['total']} — {current['message'] or ''}")
+            elif current["status"] == jobs.QUEUED:
+                st.info("⏳ في الانتظار... يمكنك متابعة العمل وستظهر النتيجة هنا.")
+            else:
+                st.info("⏳ جاري التنفيذ... يمكنك متابعة العمل وستظهر النتيجة هنا.")
+        elif active:
+            st.rerun()
+        elif current["status"] == jobs.FAILED:
+            st.error(f"تعذر التنفيذ: {current['error']}")
+
+    show()
+    return job
 
 # ==========================================
 # 2. القائمة الجانبية
@@ -44,8 +125,13 @@ with st.sidebar:
     
     st.markdown("---")
     
-    if st.session_state.students:
-        st.caption(f"عدد التلاميذ: {len(st.session_state.students)}")
+    if students:
+        st.caption(f"عدد التلاميذ: {len(students)}")
+
+    # القياس مشترك بين الجلسات فلا يُغيَّر إلا عند نقر المستخدم على الخيار
+    st.checkbox("🩺 لوحة التشخيص", value=metrics.ENABLED, key="diagnostics",
+                on_change=lambda: metrics.enable(st.session_state["diagnostics"]),
+                help="قياس زمن العمليات (التحميل، الحفظ، الحساب، الذكاء الاصطناعي، PDF)")
 
 # ==========================================
 # 3. سجل التلاميذ
@@ -67,33 +153,68 @@ if menu == "سجل التلاميذ":
                 if name:
                     info = {"dob": str(dob), "gender": gender, "class_level": level}
                     dm.save_student_info(name, info)
-                    st.session_state.students = dm.load_data()
+                    students = dm.student_index()
                     st.success(f"تم حفظ {name}")
                 else:
                     st.error("الاسم مطلوب")
 
+        with st.expander("📥 استيراد قائمة التلاميذ (XLS / XLSX / CSV)"):
+            roster_file = st.file_uploader("ملف القائمة:", type=["xls", "xlsx", "csv", "htm", "html"])
+            import_level = st.selectbox("المستوى (إن لم يكن في الملف):", ["", "تحضيري", "روضة", "سنة أولى"])
+            import_update = st.checkbox("تحديث بيانات التلاميذ الموجودين")
+            if roster_file is not None and st.button("استيراد"):
+                import roster_import
+                try:
+                    with st.spinner("جاري الاستيراد..."):
+                        summary = roster_import.import_roster(
+                            roster_file, update_existing=import_update, default_level=import_level
+                        )
+                except (ValueError, ImportError) as e:
+                    st.error(f"تعذر قراءة الملف: {e}")
+                else:
+                    st.success(
+                        f"تمت إضافة {summary['added']} تلميذ، تحديث {summary['updated']}، "
+                        f"وتجاهل {summary['duplicates']} مكرر (من {summary['rows']} صف)."
+                    )
+                    for error in summary["errors"][:20]:
+                        st.warning(error)
+                    students = dm.student_index()
+
     with c2:
         st.subheader("القائمة")
-        if st.session_state.students:
-            for n, d in st.session_state.students.items():
+        if students:
+            query = st.text_input("🔍 بحث:", key="registry_query")
+            registry_level = st.selectbox("المستوى:", ["الكل"] + students.levels(), key="registry_level")
+            registry_level = None if registry_level == "الكل" else registry_level
+            # عرض صفحة واحدة فقط من السجل (بدل عنصر لكل تلميذ في كل إعادة تشغيل للصفحة)
+            total, _ = students.search(query, level=registry_level, limit=0)
+            pages = max(1, -(-total // dm.PAGE_SIZE))
+            page = st.number_input("الصفحة:", min_value=1, max_value=pages, value=1, key="registry_page") if pages > 1 else 1
+            _, page_names = students.search(
+                query, level=registry_level, offset=(page - 1) * dm.PAGE_SIZE, limit=dm.PAGE_SIZE
+            )
+            st.caption(f"{total} تلميذ — الصفحة {page} من {pages}")
+            for n in page_names:
+                d = students.info(n)
                 with st.expander(n):
-                    st.write(f"المستوى: {d['info'].get('class_level')}")
-                    st.write(f"الجنس: {d['info'].get('gender')}")
+                    st.write(f"المستوى: {d.get('class_level')}")
+                    st.write(f"الجنس: {d.get('gender')}")
 
 # ==========================================
 # 4. التقييم الأكاديمي
 # ==========================================
 elif menu == "تقييم المواد الدراسية":
     st.header("📚 التقييم الأكاديمي")
-    if not st.session_state.students:
+    if not students:
         st.warning("الرجاء إضافة تلاميذ.")
     else:
-        student = st.selectbox("اختر التلميذ:", list(st.session_state.students.keys()))
-        info = st.session_state.students[student]["info"]
+        student = student_picker("academic")
+        record = student_record(student)  # سجل مشترك للقراءة فقط، والحفظ يمر عبر save_evaluation
+        info = record["info"]
         st.caption(f"البيانات: {info.get('class_level')} | {info.get('gender')}")
         
         with st.form("academic_form"):
-            current = st.session_state.students[student].get("evaluations", {}).get("academic", {})
+            current = record.get("evaluations", {}).get("academic", {})
             new_data = {}
             
             tabs = st.tabs(list(dm.ACADEMIC_SUBJECTS.keys()))
@@ -108,24 +229,24 @@ elif menu == "تقييم المواد الدراسية":
                     new_data[subj] = subj_data
             
             if st.form_submit_button("حفظ التقييم الأكاديمي"):
-                data = st.session_state.students
-                if "evaluations" not in data[student]: data[student]["evaluations"] = {}
-                data[student]["evaluations"]["academic"] = new_data
-                data[student]["evaluations"]["last_update"] = datetime.now().strftime("%Y-%m-%d")
-                dm.save_data(data)
-                st.session_state.students = dm.load_data()
-                st.toast("تم الحفظ!", icon="✅")
+                # دمج المهارات المتغيرة فقط في السجل الحالي للتلميذ (دون المساس بتعديلات الجلسات الأخرى)
+                if dm.evaluation_changes(record, "academic", new_data):
+                    dm.save_evaluation(student, "academic", new_data)
+                    st.toast("تم الحفظ!", icon="✅")
+                else:
+                    st.toast("لا توجد تغييرات للحفظ.", icon="ℹ️")
 
 # ==========================================
 # 5. التقييم السلوكي
 # ==========================================
 elif menu == "تقييم المهارات السلوكية":
     st.header("🧠 التقييم السلوكي")
-    if st.session_state.students:
-        student = st.selectbox("اختر التلميذ:", list(st.session_state.students.keys()))
+    if students:
+        student = student_picker("behavioral")
+        record = student_record(student)
         
         with st.form("behavioral_form"):
-            current = st.session_state.students[student].get("evaluations", {}).get("behavioral", {})
+            current = record.get("evaluations", {}).get("behavioral", {})
             new_data = {}
             
             tabs = st.tabs(list(dm.BEHAVIORAL_SKILLS.keys()))
@@ -145,13 +266,12 @@ elif menu == "تقييم المهارات السلوكية":
                     new_data[main] = main_data
             
             if st.form_submit_button("حفظ التقييم السلوكي"):
-                data = st.session_state.students
-                if "evaluations" not in data[student]: data[student]["evaluations"] = {}
-                data[student]["evaluations"]["behavioral"] = new_data
-                data[student]["evaluations"]["last_update"] = datetime.now().strftime("%Y-%m-%d")
-                dm.save_data(data)
-                st.session_state.students = dm.load_data()
-                st.toast("تم الحفظ!", icon="✅")
+                # دمج المهارات المتغيرة فقط في السجل الحالي للتلميذ (دون المساس بتعديلات الجلسات الأخرى)
+                if dm.evaluation_changes(record, "behavioral", new_data):
+                    dm.save_evaluation(student, "behavioral", new_data)
+                    st.toast("تم الحفظ!", icon="✅")
+                else:
+                    st.toast("لا توجد تغييرات للحفظ.", icon="ℹ️")
 
 # ==========================================
 # 6. التقرير التشخيصي (النسخة النهائية)
@@ -159,53 +279,56 @@ elif menu == "تقييم المهارات السلوكية":
 elif menu == "التقرير التشخيصي":
     st.header("📈 التقرير التشخيصي الشامل")
     
-    if not st.session_state.students:
+    if not students:
         st.warning("لا توجد بيانات.")
     else:
-        student = st.selectbox("اختر التلميذ:", list(st.session_state.students.keys()))
+        student = student_picker("report")
         
-        student_data = st.session_state.students[student]
+        student_data = student_record(student)
         info = student_data["info"]
         evals = student_data.get("evaluations", {})
         gender = info.get("gender", "ذكر")
         
-        # عرض النتائج بالأرقام
-        scores = dm.calculate_scores(evals)
+        # عرض النتائج بالأرقام (من الذاكرة المؤقتة ما لم تتغير التقييمات)
+        scores = dm.student_scores(student)
         
         c1, c2, c3 = st.columns(3)
         c1.metric("التحصيل الدراسي", f"{scores['academic_percentage']:.0f}%")
         c2.metric("السلوك والمواظبة", f"{scores['behavioral_percentage']:.0f}%")
         c3.metric("النسبة العامة", f"{scores['overall_percentage']:.0f}%")
         st.progress(scores['overall_percentage'] / 100)
+
+        # السجل الزمني: تطور التلميذ بين التقييمات المختلفة
+        trajectory = dm.student_trajectory(student)
+        if len(trajectory) > 1:
+            with st.expander("📈 تطور الأداء عبر التقييمات"):
+                chart = trajectory.set_index("date")[
+                    ["academic_percentage", "behavioral_percentage", "overall_percentage"]
+                ].rename(columns={
+                    "academic_percentage": "التحصيل الدراسي",
+                    "behavioral_percentage": "السلوك والمواظبة",
+                    "overall_percentage": "النسبة العامة",
+                })
+                st.line_chart(chart)
         
         st.divider()
 
-        # إدارة استدعاء الذكاء الاصطناعي لمنع استهلاك الحد المسموح (Rate Limit)
-        ai_state_key = f"ai_report_{student}"
-        if ai_state_key not in st.session_state:
-            st.session_state[ai_state_key] = {"narrative": "", "action_plan": []}
+        # التحليل المحفوظ لنفس التقييمات (في سجل التلميذ أو في الذاكرة) يُعرض دون أي اتصال
+        cached = dm.saved_analysis(student, student_data) or dm.cached_analysis(student, evals, gender)
+        narrative, action_plan = cached if cached else ("", [])
 
         if st.button("🤖 توليد / تحديث التحليل التربوي الذكي", type="secondary"):
-            with st.spinner("يتصل بالذكاء الاصطناعي لتحليل البيانات..."):
-                narr, plan = dm.analyze_student_performance(student, evals, gender)
-                st.session_state[ai_state_key] = {"narrative": narr, "action_plan": plan}
+            # يُنفَّذ الطلب في الخلفية؛ عند وجود تحليل معروض يُطلب تحليل جديد بدلاً من المحفوظ
+            jobs.get_queue().submit("analysis", student, {"refresh": bool(narrative)})
+        job_status("analysis", student, poll=STREAM_POLL_SECONDS, show_partial=show_partial_analysis)
 
-        narrative = st.session_state[ai_state_key]["narrative"]
-        action_plan = st.session_state[ai_state_key]["action_plan"]
-        
         # عرض التحليل والخطة
         col_text, col_plan = st.columns([2, 1])
         
         with col_text:
             st.subheader("📝 التحليل التربوي")
             if narrative:
-                st.markdown(
-                    f"""
-                    <div style="background-color:#f8f9fa; padding:20px; border-radius:10px; border-right: 5px solid #2e86de; font-size:16px; line-height:1.8; color:#2c3e50;">
-                    {narrative.replace(chr(10), '<br>')}
-                    </div>
-                    """, unsafe_allow_html=True
-                )
+                narrative_box(narrative)
             else:
                 st.info("اضغط على الزر أعلاه لتوليد التحليل باستخدام الذكاء الاصطناعي.")
 
@@ -227,60 +350,142 @@ elif menu == "التقرير التشخيصي":
         # قسم PDF
         st.subheader("📄 إصدار التقرير الرسمي")
         
-        pdf_key = f"pdf_{student}_{evals.get('last_update', 'new')}"
-        
-        if pdf_key not in st.session_state:
-            if st.button("🔄 إنشاء ملف PDF (جاهز للطباعة)", type="primary"):
-                try:
-                    import pdf_generator
-                    with st.spinner("جاري صياغة التقرير، رسم الجداول، وضبط التنسيق..."):
-                        pdf_bytes, error = pdf_generator.create_pdf(
-                            student, info, evals, narrative, action_plan
-                        )
-                        
-                        if pdf_bytes:
-                            st.session_state[pdf_key] = pdf_bytes
-                            st.rerun()
-                        else:
-                            st.error(f"خطأ: {error}")
-                except ImportError:
-                    st.error("المكتبات مفقودة (fpdf2, arabic-reshaper, python-bidi)")
-        
-        if pdf_key in st.session_state:
-            c_d1, c_d2 = st.columns([1, 4])
-            with c_d1:
+        # يُعاد إنشاء الملف إذا تغيرت التقييمات أو التحليل منذ إنشائه
+        pdf_params = {"last_update": evals.get("last_update"), "analysis": ai_cache.make_key(narrative, action_plan)[:16]}
+        if st.button("🔄 إنشاء ملف PDF (جاهز للطباعة)", type="primary"):
+            jobs.get_queue().submit("pdf", student, pdf_params)
+        pdf_job = job_status("pdf", student)
+        if pdf_job and pdf_job["status"] == jobs.DONE:
+            if pdf_job["params"] == pdf_params:
                 st.download_button(
                     label="📥 تحميل PDF",
-                    data=st.session_state[pdf_key],
+                    data=jobs.get_queue().result(pdf_job["job_id"]),
                     file_name=f"Report_{student}.pdf",
                     mime="application/pdf",
                     type="primary"
                 )
-            with c_d2:
-                if st.button("إعادة إنشاء"):
-                    del st.session_state[pdf_key]
-                    st.rerun()
+            else:
+                st.caption("تغيرت البيانات منذ آخر تقرير، أعد إنشاءه.")
+
+        # التوليد الجماعي لتقارير قسم كامل (بالتوازي، والنتيجة تُكتب على القرص)
+        with st.expander("🗂️ إصدار تقارير قسم كامل"):
+            levels = students.levels()
+            batch_level = st.selectbox("المستوى:", ["جميع التلاميذ"] + levels, key="batch_level")
+            batch_format = st.radio("صيغة الإخراج:", ["أرشيف ZIP (ملف لكل تلميذ)", "ملف PDF واحد للطباعة"], horizontal=True)
+            batch_target = None if batch_level == "جميع التلاميذ" else batch_level
+            if st.button("🔄 إنشاء التقارير"):
+                jobs.get_queue().submit("pdf_batch", batch_level, {
+                    "level": batch_target, "merged": batch_format.startswith("ملف"),
+                    "out_dir": os.path.abspath(REPORTS_DIR),
+                })
+            batch_job = job_status("pdf_batch", batch_level)
+            if batch_job and batch_job["status"] == jobs.DONE and os.path.exists(batch_job["output"]):
+                batch_path = batch_job["output"]
+                st.success(f"آخر تقارير جاهزة: {batch_path}")
+                with open(batch_path, "rb") as f:
+                    st.download_button(
+                        label="📥 تحميل التقارير",
+                        data=f,
+                        file_name=os.path.basename(batch_path),
+                        mime="application/pdf" if batch_path.endswith(".pdf") else "application/zip",
+                    )
 
 # ==========================================
 # 7. لوحة التحكم
 # ==========================================
 elif menu == "لوحة التحكم":
     st.header("📊 إحصائيات عامة")
-    if st.session_state.students:
-        df = []
-        for name, data in st.session_state.students.items():
-            scores = dm.calculate_scores(data.get("evaluations", {}))
-            df.append({
-                "الاسم": name,
-                "المستوى": data["info"].get("class_level"),
-                "الأداء العام": f"{scores['overall_percentage']:.1f}%"
-            })
-        st.dataframe(pd.DataFrame(df), use_container_width=True)
+    if students:
+        import pandas as pd
+        # مجاميع جاهزة تُحدَّث عند كل حفظ، فلا يُعاد حساب كل التلاميذ عند فتح اللوحة
+        stats = dm.class_analytics()
+        dash_level = st.selectbox("المستوى:", ["جميع التلاميذ"] + stats.levels(), key="dash_level")
+        dash_level = None if dash_level == "جميع التلاميذ" else dash_level
+        summary = stats.summary(dash_level)
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("عدد التلاميذ", summary["students"])
+        m2.metric("الأداء العام", f"{summary['overall_average']:.1f}%")
+        m3.metric("الأكاديمي", f"{summary['academic_average']:.1f}%")
+        m4.metric("السلوكي", f"{summary['behavioral_average']:.1f}%")
+
+        c1, c2 = st.columns(2)
+        with c1:
+            st.subheader("توزيع الأداء العام")
+            width = 100 // len(summary["histogram"])
+            st.bar_chart(pd.DataFrame(
+                {"عدد التلاميذ": summary["histogram"]},
+                index=[f"{i * width}-{(i + 1) * width}%" for i in range(len(summary["histogram"]))],
+            ))
+        with c2:
+            st.subheader("الأوائل")
+            top = stats.ranking(dash_level, limit=10)
+            if top:
+                st.dataframe(pd.DataFrame({
+                    "الرتبة": [r["rank"] for r in top],
+                    "الاسم": [r["name"] for r in top],
+                    "الأداء العام": [f"{r['overall_percentage']:.1f}%" for r in top],
+                }), hide_index=True, use_container_width=True)
+
+        hardest = stats.hardest_skills(dash_level, limit=5)
+        if hardest:
+            st.subheader("المهارات الأصعب")
+            st.dataframe(pd.DataFrame({
+                "المادة": [r["subject"] for r in hardest],
+                "المهارة": [r["skill"] for r in hardest],
+                "نسبة الاكتساب": [f"{r['acquired_percentage']:.1f}%" for r in hardest],
+                **{label: [r[f"level_{score}"] for r in hardest] for label, score in dm.RATING_MAP.items()},
+            }), hide_index=True, use_container_width=True)
+
+        terms = dm.class_term_averages()
+        if not terms.empty:
+            st.subheader("متوسط الأداء حسب الفصل الدراسي")
+            st.dataframe(pd.DataFrame({
+                "الفصل": terms["term"],
+                "المستوى": terms["class_level"],
+                "عدد التلاميذ": terms["students"],
+                "المتوسط": terms["average"].map("{:.1f}%".format),
+            }), use_container_width=True)
+
+        with st.expander("🤖 توليد التحليل الذكي لقسم كامل"):
+            levels = students.levels()
+            bulk_level = st.selectbox("المستوى:", ["جميع التلاميذ"] + levels)
+            bulk_refresh = st.checkbox("إعادة توليد التحليلات الموجودة")
+            if st.button("بدء التوليد الجماعي"):
+                jobs.get_queue().submit("bulk_analysis", bulk_level, {
+                    "level": None if bulk_level == "جميع التلاميذ" else bulk_level, "refresh": bulk_refresh,
+                })
+            bulk_job = job_status("bulk_analysis", bulk_level)
+            if bulk_job and bulk_job["status"] == jobs.DONE:
+                st.success(f"اكتمل التوليد: {bulk_job['message']}")
         
         if st.button("🗑️ حذف جميع البيانات"):
-            st.session_state.students = {}
             dm.save_data({})
+            dm.forget_history()
             st.rerun()
     else:
         st.info("لا توجد بيانات.")
 
+# ==========================================
+# 8. لوحة التشخيص (في آخر الصفحة لتشمل قياسات هذا التحميل)
+# ==========================================
+if metrics.ENABLED:
+    with st.sidebar:
+        st.markdown("---")
+        st.subheader("🩺 التشخيص")
+        metric_stats = metrics.snapshot()
+        if metric_stats["timings"]:
+            import pandas as pd
+            st.dataframe(pd.DataFrame([
+                {"العملية": name, "العدد": t["count"], "الوسيط (ms)": round(t["p50_ms"], 1),
+                 "p95 (ms)": round(t["p95_ms"], 1), "المجموع (ms)": round(t["total_ms"], 1)}
+                for name, t in metric_stats["timings"].items()
+            ]), hide_index=True, use_container_width=True)
+        for name, value in metric_stats["counters"].items():
+            st.caption(f"{name}: {value}")
+        st.download_button("تصدير JSON Lines", metrics.export_jsonl(metric_stats),
+                           file_name="metrics.jsonl", mime="application/x-ndjson")
+        st.download_button("تصدير Prometheus", metrics.export_prometheus(metric_stats),
+                           file_name="metrics.prom", mime="text/plain")
+        if st.button("تصفير القياسات"):
+            metrics.reset()
+            st.rerun()
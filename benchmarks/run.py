@@ -0,0 +1,330 @@
+"""
+قياس أداء المسارات الحرجة: التحميل والحفظ، حساب النسب، التقارير النصية و PDF، ومسار التحليل الذكي.
+
+الاستعمال:
+    python benchmarks/run.py                      # الأحجام الافتراضية ومقارنة بخط الأساس المحفوظ
+    python benchmarks/run.py --sizes 100 100000   # أحجام أخرى (حتى 100 ألف تلميذ)
+    python benchmarks/run.py --only pdf           # الحالات التي يحتوي اسمها على "pdf" فقط
+    python benchmarks/run.py --save-baseline      # تحديث خط الأساس بعد تحسين مقصود
+
+لكل حالة: عدد التكرارات، الوسيط و p95 و p99 بالمللي ثانية، الإنتاجية (عنصر/ثانية)، وذروة الذاكرة.
+يُرجع رمز خروج 1 إذا تراجع وسيط أي حالة عن خط الأساس بأكثر من نسبة السماح.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "tests"))
+import analytics
+import data_manager as dm
+import pdf_generator
+import serialization
+import skill_catalog
+import storage
+from fake_openai import FakeOpenAIServer
+from synthetic import make_roster
+
+# تحذيرات fpdf عن الرموز غير الموجودة في الخط تتكرر مع كل تقرير
+logging.getLogger("fpdf").setLevel(logging.ERROR)
+
+# ==========================================
+# 1. الإعدادات
+# ==========================================
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_SIZES = [100, 1000, 10000]
+DEFAULT_TOLERANCE = 0.5     # تراجع الوسيط بأكثر من 50% يُعد انحداراً
+SAMPLE_STUDENTS = 200       # عينة التلاميذ للعمليات التي تُقاس لكل تلميذ
+PDF_BATCH_SIZE = 20
+AI_REQUESTS = 20
+
+
+def _repeat_for(size):
+    """عدد التكرارات حسب الحجم حتى يبقى زمن التشغيل معقولاً"""
+    return 5 if size <= 1000 else 3 if size <= 10000 else 1
+
+
+def _percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(fn, repeat=5, items=1, warmup=1, setup=None):
+    """
+    تشغيل fn عدة مرات وإرجاع إحصائيات الزمن، ثم تشغيلها مرة أخيرة تحت tracemalloc لذروة الذاكرة
+    (منفصلة عن التوقيت لأن tracemalloc يبطئ التنفيذ). setup تُستدعى قبل كل تشغيل خارج التوقيت.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    latencies = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    latencies.sort()
+    p50 = _percentile(latencies, 0.5)
+    return {
+        "n": repeat,
+        "p50_ms": p50 * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "throughput": items / p50 if p50 else float("inf"),
+        "peak_mb": peak / 1e6,
+    }
+
+
+# ==========================================
+# 2. حالات القياس
+# ==========================================
+# كل مجموعة مولّد يُرجع (اسم الحالة، دالة القياس) فلا يُقاس إلا ما يطابق --only
+def storage_cases(size, workdir):
+    roster = make_roster(size)
+    path = os.path.join(workdir, f"roster_{size}.json")
+    counter = [0]
+
+    def fresh_file():
+        counter[0] += 1
+        dm.DATA_FILE = os.path.join(workdir, f"save_{size}_{counter[0]}.json")
+
+    def save():
+        dm.save_data(roster)
+        # لا نحتفظ بالمخازن المؤقتة في الذاكرة بين التكرارات
+        storage._stores.pop(("json", os.path.abspath(dm.DATA_FILE)), None)
+
+    dm.DATA_FILE = path
+    dm.save_data(roster)
+    repeat = _repeat_for(size)
+    yield f"save_data[{size}]", lambda: measure(save, repeat, size, setup=fresh_file)
+
+    dm.DATA_FILE = path
+    yield f"load_data.cold[{size}]", lambda: measure(lambda: storage.JournalStore(path).load_all(), repeat, size)
+    yield f"load_data.warm[{size}]", lambda: measure(dm.load_data, repeat, size)
+
+    name, record = next(iter(roster.items()))
+    academic = record["evaluations"]["academic"]
+    subject = next(iter(academic))
+    skill = next(iter(dm.ACADEMIC_SUBJECTS[subject]))
+    scores = [0]
+
+    def save_one():
+        # تعديل مهارة واحدة كما يفعل المعلم في نموذج التقييم
+        scores[0] = (scores[0] + 1) % 3
+        dm.save_evaluation(name, "academic", {**academic, subject: {**academic[subject], skill: scores[0]}})
+
+    yield f"save_evaluation[{size}]", lambda: measure(save_one, max(repeat, 5), 1)
+    # إعادة حفظ الاستمارة دون تعديل (نقرات متكررة على زر الحفظ)
+    yield f"save_evaluation.unchanged[{size}]", lambda: measure(
+        lambda: dm.save_evaluation(name, "academic", dm.get_student(name)["evaluations"]["academic"]), max(repeat, 5), 1
+    )
+    # مسار cli: تحميل السجلات ثم الحساب الجماعي عليها
+    yield f"score_roster[{size}]", lambda: measure(lambda: dm.score_roster(dm.load_data()), repeat, size)
+    yield f"class_analytics.build[{size}]", lambda: measure(
+        lambda: analytics.ClassAnalytics().sync(dm._store()), repeat, size
+    )
+    # لوحة التحكم بعد حفظ تقييم: تطبيق التلميذ المعدَّل فقط على المجاميع الجاهزة
+    yield f"class_analytics.after_save[{size}]", lambda: measure(
+        lambda: dm.class_analytics().summary(), max(repeat, 5), 1, setup=save_one
+    )
+
+
+def snapshot_cases(size, workdir):
+    """
+    كتابة وقراءة ملف اللقطة بكل صيغة متاحة، مقارنة بـ JSON المنسق (indent=4) الذي كان الصيغة الأصلية.
+    size_mb في النتيجة هو حجم الملف الناتج.
+    """
+    roster = make_roster(size)
+    store = storage.JournalStore(os.path.join(workdir, f"snapshot_{size}.json"))
+    store.replace_all(roster)
+    catalog, records = store._catalog, store.refresh()
+    repeat = _repeat_for(size)
+
+    def with_size(stats, path):
+        stats["size_mb"] = os.path.getsize(path) / 1e6
+        return stats
+
+    pretty = os.path.join(workdir, f"snapshot_{size}.pretty.json")
+
+    def dump_pretty():
+        with open(pretty, "w", encoding="utf-8") as f:
+            json.dump(roster, f, ensure_ascii=False, indent=4)
+
+    def load_pretty():
+        with open(pretty, "r", encoding="utf-8") as f:
+            json.load(f)
+
+    yield f"snapshot.dump.pretty_json[{size}]", lambda: with_size(measure(dump_pretty, repeat, size), pretty)
+    yield f"snapshot.load.pretty_json[{size}]", lambda: with_size(measure(load_pretty, repeat, size), pretty)
+
+    for name in serialization.CODECS:
+        codec = serialization.get_codec(name)
+        if codec.name != name:   # المكتبة غير مثبتة
+            continue
+        path = os.path.join(workdir, f"snapshot_{size}.{name}")
+
+        def dump(codec=codec, path=path):
+            payload = codec.dumps(skill_catalog.encode_snapshot(catalog, records, binary=codec.binary))
+            storage.atomic_write(path, lambda f: f.write(payload), binary=True)
+
+        dump()
+        yield f"snapshot.dump.{name}[{size}]", lambda dump=dump, path=path: with_size(
+            measure(dump, repeat, size), path
+        )
+        yield f"snapshot.load.{name}[{size}]", lambda path=path: with_size(
+            measure(lambda: storage.JournalStore(path).refresh(), repeat, size), path
+        )
+
+
+def per_student_cases(workdir):
+    roster = make_roster(SAMPLE_STUDENTS, seed=1)
+    records = list(roster.items())
+
+    def scores():
+        for _, record in records:
+            dm.calculate_scores(record["evaluations"])
+
+    def text_reports():
+        for name, record in records:
+            stats = dm.calculate_scores(record["evaluations"])
+            dm.generate_text_report(name, record["info"], record["evaluations"], stats,
+                                    "تلميذ مجتهد يحتاج إلى مزيد من التركيز.", [("القراءة", "قراءة يومية")])
+
+    yield f"calculate_scores[x{SAMPLE_STUDENTS}]", lambda: measure(scores, 5, SAMPLE_STUDENTS)
+    yield f"generate_text_report[x{SAMPLE_STUDENTS}]", lambda: measure(text_reports, 5, SAMPLE_STUDENTS)
+
+    narrative = "تلميذ مجتهد يشارك بفعالية في أنشطة القسم ويحتاج إلى دعم في الكتابة. " * 8
+    name, record = records[0]
+    yield "create_pdf.single", lambda: measure(
+        lambda: pdf_generator.create_pdf(name, record["info"], record["evaluations"], narrative, []), 5, 1
+    )
+
+    jobs = [(n, r["info"], r["evaluations"], narrative, []) for n, r in records[:PDF_BATCH_SIZE]]
+    out = os.path.join(workdir, "batch.zip")
+    yield f"create_pdf.batch[x{PDF_BATCH_SIZE}]", lambda: measure(
+        lambda: pdf_generator.create_pdf_batch(jobs, out), 3, PDF_BATCH_SIZE
+    )
+
+
+def ai_cases(workdir):
+    roster = make_roster(AI_REQUESTS, seed=2)
+    records = list(roster.items())
+    with FakeOpenAIServer() as server, \
+            mock.patch.object(dm, "AI_BASE_URL", server.base_url), \
+            mock.patch.object(dm, "AI_CACHE_FILE", os.path.join(workdir, "ai.db")), \
+            mock.patch.dict(os.environ, {"CEREBRAS_API_KEY": "bench"}):
+
+        def request_all():
+            for name, record in records:
+                dm.analyze_student_performance(name, record["evaluations"], record["info"]["gender"], refresh=True)
+
+        def cached_all():
+            for name, record in records:
+                dm.analyze_student_performance(name, record["evaluations"], record["info"]["gender"])
+
+        yield f"analyze.request[x{AI_REQUESTS}]", lambda: measure(request_all, 3, AI_REQUESTS)
+        yield f"analyze.cached[x{AI_REQUESTS}]", lambda: measure(cached_all, 5, AI_REQUESTS)
+
+
+def run(sizes=DEFAULT_SIZES, only=None, progress=print):
+    """تشغيل الحالات (في مجلد مؤقت) وإرجاع {اسم الحالة: الإحصائيات}"""
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    saved = (dm.DATA_FILE, dm.HISTORY_FILE, dm.STORAGE_BACKEND)
+    dm.HISTORY_FILE = os.path.join(workdir, "history.db")
+    dm.STORAGE_BACKEND = "json"
+    try:
+        groups = [storage_cases(size, workdir) for size in sizes]
+        groups += [snapshot_cases(size, workdir) for size in sizes]
+        groups += [per_student_cases(workdir), ai_cases(workdir)]
+        for group in groups:
+            for name, bench in group:
+                if only and not any(o in name for o in only):
+                    continue
+                results[name] = stats = bench()
+                if progress:
+                    progress(format_row(name, stats))
+    finally:
+        dm.DATA_FILE, dm.HISTORY_FILE, dm.STORAGE_BACKEND = saved
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+# ==========================================
+# 3. خط الأساس والمقارنة
+# ==========================================
+def format_row(name, stats):
+    row = (f"{name:<34} n={stats['n']:<3} p50={stats['p50_ms']:>10.2f}ms p95={stats['p95_ms']:>10.2f}ms "
+           f"p99={stats['p99_ms']:>10.2f}ms {stats['throughput']:>12.1f}/s peak={stats['peak_mb']:>8.2f}MB")
+    if "size_mb" in stats:
+        row += f" file={stats['size_mb']:.2f}MB"
+    return row
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """الحالات التي تراجع وسيطها عن خط الأساس بأكثر من tolerance: [(الاسم، الأساس، الحالي)]"""
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base and stats["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+            regressions.append((name, base["p50_ms"], stats["p50_ms"]))
+    return regressions
+
+
+def load_baseline(path=BASELINE_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس أداء المسارات الحرجة")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", help="تشغيل الحالات التي يحتوي اسمها على أحد هذه النصوص")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true", help="حفظ النتائج كخط أساس جديد")
+    parser.add_argument("--output", help="حفظ النتائج بصيغة JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.only)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        baseline = load_baseline(args.baseline)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"تم حفظ خط الأساس في {args.baseline}")
+        return 0
+
+    regressions = compare(results, load_baseline(args.baseline), args.tolerance)
+    for name, base, current in regressions:
+        print(f"انحدار: {name} {base:.2f}ms -> {current:.2f}ms")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+مولد قوائم تلاميذ اصطناعية واقعية (من 100 إلى 100 ألف تلميذ) لقياس الأداء.
+يستعمل شجرة المواد والمهارات الحقيقية من data_manager وأسماء عربية.
+"""
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_manager as dm
+
+BOYS = ["محمد", "أحمد", "يوسف", "عبد الرحمن", "إسحاق", "أنس", "ياسين", "آدم", "زكرياء", "إلياس",
+        "عمر", "علي", "رائد", "أيوب", "مصطفى", "حمزة", "وسيم", "إبراهيم", "مالك", "عبد الله"]
+GIRLS = ["مريم", "فاطمة", "خديجة", "سارة", "آية", "تسنيم", "ملاك", "هبة", "نور الهدى", "أسماء",
+         "رحمة", "إيناس", "شيماء", "لينة", "دعاء", "رتاج", "جنى", "سلسبيل", "ميار", "أمينة"]
+SURNAMES = ["بن علي", "بوزيد", "سعدي", "بلقاسم", "حمادي", "بن عيسى", "قاسمي", "بوعلام", "مرابط", "زروقي",
+            "عمراني", "بن يحيى", "شريف", "لعريبي", "بوشارب", "حداد", "مسعودي", "بن سالم", "طالبي", "رحماني",
+            "بلعيد", "دراجي", "خليفي", "بن ناصر", "عثماني"]
+CLASS_LEVELS = ["تحضيري", "روضة", "سنة أولى"]
+
+UNRATED_RATE = 0.1           # نسبة المهارات التي لم تُقيّم بعد
+SCORE_WEIGHTS = (2, 3, 5)    # احتمال: غير مكتسب، في طريق الاكتساب، مكتسب
+
+
+def _scores(rng, skills):
+    return {
+        skill: rng.choices((0, 1, 2), SCORE_WEIGHTS)[0]
+        for skill in skills
+        if rng.random() >= UNRATED_RATE
+    }
+
+
+def make_student(rng, index):
+    """تلميذ واحد: (الاسم، السجل) بنفس بنية students_data.json"""
+    gender = rng.choice(("ذكر", "أنثى"))
+    first = rng.choice(BOYS if gender == "ذكر" else GIRLS)
+    # رقم التسلسل يضمن تفرد الأسماء حتى في القوائم الكبيرة
+    name = f"{first} {rng.choice(SURNAMES)} {index + 1}"
+    dob = date(2018, 1, 1) + timedelta(days=rng.randrange(3 * 365))
+    evaluations = {
+        "academic": {subject: _scores(rng, skills) for subject, skills in dm.ACADEMIC_SUBJECTS.items()},
+        "behavioral": {
+            main: {sub: _scores(rng, skills) for sub, skills in sub_cats.items()}
+            for main, sub_cats in dm.BEHAVIORAL_SKILLS.items()
+        },
+        "last_update": "2025-12-15",
+    }
+    info = {
+        "dob": dob.isoformat(),
+        "gender": gender,
+        "class_level": rng.choice(CLASS_LEVELS),
+        "id": str(100000 + index),
+    }
+    return name, {"info": info, "evaluations": evaluations}
+
+
+def make_roster(count, seed=0):
+    """قاموس {الاسم: السجل} بعدد count من التلاميذ (نفس البذرة تعطي نفس القائمة)"""
+    rng = random.Random(seed)
+    return dict(make_student(rng, i) for i in range(count))
@@ -0,0 +1,162 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import openai
+
+import data_manager as dm
+
+# ==========================================
+# 1. إعدادات التوليد الجماعي
+# ==========================================
+BULK_WORKERS = 4          # عدد الطلبات المتزامنة
+BULK_RATE = 0.5           # متوسط الطلبات في الثانية (حد مزود الخدمة)
+BULK_BURST = 4            # أقصى دفعة فورية قبل تطبيق الحد
+BULK_MAX_RETRIES = 4      # إعادة المحاولة عند 429 أو أخطاء الخادم
+BULK_BACKOFF = 2.0        # ثوانٍ الانتظار الأولى (تتضاعف مع كل محاولة)
+
+# أخطاء مؤقتة تستحق إعادة المحاولة
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+)
+
+
+class TokenBucket:
+    """محدد معدل الطلبات (Token Bucket) آمن بين الخيوط"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """الانتظار حتى يتوفر رصيد لطلب واحد"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _retry_after(error):
+    """مدة الانتظار التي يطلبها الخادم في ترويسة Retry-After (إن وجدت)"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+# ==========================================
+# 2. تحليل تلميذ واحد مع إعادة المحاولة
+# ==========================================
+def _analyze_with_retry(client, bucket, name, evals, gender, max_retries, backoff):
+    for attempt in range(max_retries + 1):
+        bucket.acquire()
+        try:
+            response = dm.request_completion(client, name, evals, gender)
+            return dm.parse_analysis(response.choices[0].message.content)
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+            delay = max(delay, _retry_after(e) or 0)
+            time.sleep(delay)
+
+
+# ==========================================
+# 3. التوليد الجماعي لقسم كامل
+# ==========================================
+def analyze_class(class_level=None, names=None, refresh=False, workers=BULK_WORKERS,
+                  rate=BULK_RATE, burst=BULK_BURST, max_retries=BULK_MAX_RETRIES,
+                  backoff=BULK_BACKOFF, progress=None):
+    """
+    توليد التحليل الذكي لجميع تلاميذ مستوى معين (أو لقائمة أسماء) بشكل متزامن
+    مع احترام حد الطلبات، وحفظ النتائج في المخزن.
+    progress(done, total, name, status) تُستدعى في الخيط المستدعي بعد كل تلميذ،
+    حيث status إحدى: "cached"، "ok"، "failed".
+    يُرجع ملخصاً: {"total", "ok", "cached", "failed", "errors", "elapsed"}.
+    """
+    start = time.perf_counter()
+    infos = dm.student_infos()
+    if names is None:
+        names = [n for n, info in infos.items() if class_level is None or info.get("class_level") == class_level]
+
+    summary = {"total": len(names), "ok": 0, "cached": 0, "failed": 0, "errors": {}, "elapsed": 0.0}
+    pending = []
+    done = 0
+
+    def report(name, status):
+        nonlocal done
+        done += 1
+        summary[status] += 1
+        if progress:
+            progress(done, len(names), name, status)
+
+    # التلاميذ الذين لديهم تحليل محفوظ لنفس التقييمات لا يحتاجون أي طلب
+    for name in names:
+        record = dm.get_student(name)
+        if record is None:
+            # حُذف التلميذ (أو الاسم غير صحيح): يُحسب فاشلاً حتى يطابق المجموع عدد الأسماء
+            summary["errors"][name] = "التلميذ غير موجود في البيانات."
+            report(name, "failed")
+            continue
+        evals = record.get("evaluations", {})
+        gender = record.get("info", {}).get("gender", "ذكر")
+        key = dm.analysis_cache_key(name, evals, gender)
+        if not refresh:
+            cached = dm.cached_analysis(name, evals, gender)
+            if cached is not None:
+                if dm.saved_analysis(name, record) is None:
+                    dm.save_analysis(name, key, {"narrative": cached[0], "action_plan": cached[1], "ok": True})
+                report(name, "cached")
+                continue
+        pending.append((name, evals, gender, key))
+
+    if pending:
+        api_key = dm._get_api_key()
+        if not api_key:
+            for name, *_ in pending:
+                summary["errors"][name] = "لم يتم العثور على مفتاح Cerebras."
+                report(name, "failed")
+            summary["elapsed"] = time.perf_counter() - start
+            return summary
+
+        client = dm._get_client(api_key, max_retries=0)
+        bucket = TokenBucket(rate, burst)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_analyze_with_retry, client, bucket, name, evals, gender, max_retries, backoff):
+                    (name, key)
+                for name, evals, gender, key in pending
+            }
+            for future in as_completed(futures):
+                name, key = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    summary["errors"][name] = str(e)
+                    report(name, "failed")
+                    continue
+                if result["ok"]:
+                    dm.save_analysis(name, key, result)
+                    report(name, "ok")
+                else:
+                    summary["errors"][name] = result["narrative"]
+                    report(name, "failed")
+
+    summary["elapsed"] = time.perf_counter() - start
+    return summary
@@ -0,0 +1,156 @@
+"""
+تشغيل المهام الجماعية من سطر الأوامر دون واجهة Streamlit (مناسب لـ cron).
+
+أمثلة:
+    python cli.py scores --out exports/                      # ملفات CSV بنسب التلاميذ والمواد
+    python cli.py text --level "تحضيري" --out reports/txt    # تقرير نصي لكل تلميذ
+    python cli.py pdf --since 2025-12-01 --out reports/pdf   # ملف PDF لكل تلميذ قُيِّم منذ التاريخ
+    python cli.py pdf --format zip --out reports/             # أرشيف ZIP واحد (أو merged لملف PDF مدمج)
+    python cli.py json --out backup/                          # students.json منسق (نسخة احتياطية أو نقل)
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime
+
+import data_manager as dm
+
+# ==========================================
+# 1. اختيار التلاميذ
+# ==========================================
+def select_students(level=None, since=None, names=None):
+    """
+    أسماء التلاميذ المطابقين للمرشحات (بترتيب السجل):
+    level: المستوى الدراسي، since: آخر تحديث للتقييمات بتاريخ "YYYY-MM-DD" أو بعده، names: قائمة أسماء.
+    """
+    infos = dm.student_infos()
+    selected = [
+        name for name, info in infos.items()
+        if (not level or info.get("class_level") == level) and (not names or name in names)
+    ]
+    if since:
+        selected = [
+            name for name in selected
+            if ((dm.get_student(name) or {}).get("evaluations", {}).get("last_update") or "") >= since
+        ]
+    return selected
+
+
+# ==========================================
+# 2. الأوامر
+# ==========================================
+def _report_text(job):
+    """دالة العامل: تقرير نصي لتلميذ واحد"""
+    name, info, evals, narrative, action_plan = job
+    stats = dm.calculate_scores(evals)
+    return name, dm.generate_text_report(name, info, evals, stats, narrative, action_plan)
+
+
+def export_scores(names, out_dir):
+    """كتابة scores.csv (لكل تلميذ) و subjects.csv (لكل مادة على مستوى المجموعة المختارة)"""
+    # score_roster على سجلات المجموعة المختارة فقط حتى تعكس نسب المواد نفس التلاميذ
+    records = {name: dm.get_student(name) or {} for name in names}
+    roster = dm.score_roster(records)
+    # utf-8-sig حتى يفتح Excel الأسماء العربية بشكل صحيح
+    roster["students"].to_csv(os.path.join(out_dir, "scores.csv"), index=False, encoding="utf-8-sig")
+    roster["subjects"].to_csv(os.path.join(out_dir, "subjects.csv"), index=False, encoding="utf-8-sig")
+    return len(names), {}
+
+
+def export_text_reports(names, out_dir, workers=None):
+    """تقرير نصي لكل تلميذ في out_dir (بالتحليل المحفوظ إن وجد)"""
+    from pdf_generator import report_filename
+    jobs = dm.iter_report_inputs(names)
+    workers = workers or os.cpu_count() or 1
+    # التقرير النصي سريع جداً، فتُرسل للعمال دفعات كبيرة بدل تلميذ واحد في كل مرة
+    chunksize = max(1, len(names) // (workers * 4))
+    with multiprocessing.Pool(processes=workers) as pool:
+        for name, text in pool.imap(_report_text, jobs, chunksize=chunksize):
+            with open(os.path.join(out_dir, report_filename(name, "txt")), "w", encoding="utf-8") as f:
+                f.write(text)
+    return len(names), {}
+
+
+def export_pdf_reports(names, out_dir, fmt="files", workers=None):
+    """تقارير PDF: ملف لكل تلميذ (files)، أو أرشيف ZIP (zip)، أو ملف مدمج (merged)"""
+    import pdf_generator
+    if fmt == "files":
+        output_path = out_dir
+    else:
+        suffix = "pdf" if fmt == "merged" else "zip"
+        output_path = os.path.join(out_dir, f"Reports_{datetime.now():%Y%m%d_%H%M%S}.{suffix}")
+    return pdf_generator.create_pdf_batch(
+        dm.iter_report_inputs(names), output_path, merged=fmt == "merged", workers=workers, total=len(names)
+    )
+
+
+def export_json(names, out_dir):
+    """students.json منسق بسجلات التلاميذ المختارين (بغض النظر عن صيغة التخزين)"""
+    written = dm.export_json(os.path.join(out_dir, "students.json"), names)
+    return written, {}
+
+
+# ==========================================
+# 3. نقطة الدخول
+# ==========================================
+def build_parser():
+    parser = argparse.ArgumentParser(description="المهام الجماعية لنظام التقييم (بدون واجهة)")
+    parser.add_argument("command", choices=["scores", "text", "pdf", "json"])
+    parser.add_argument("--out", default="reports", help="مجلد النتائج (يُنشأ إن لم يوجد)")
+    parser.add_argument("--level", help="المستوى الدراسي")
+    parser.add_argument("--since", help="التلاميذ الذين حُدّثت تقييماتهم في هذا التاريخ أو بعده (YYYY-MM-DD)")
+    parser.add_argument("--name", action="append", dest="names", help="تلميذ محدد (يمكن تكراره)")
+    parser.add_argument("--format", dest="fmt", choices=["files", "zip", "merged"], default="files",
+                        help="شكل تقارير PDF")
+    parser.add_argument("--workers", type=int, help="عدد العمليات المتوازية (افتراضياً عدد المعالجات)")
+    parser.add_argument("--data", help="ملف البيانات (JSON أو SQLite حسب --backend)")
+    parser.add_argument("--backend", choices=["json", "sqlite"], help="نوع المخزن")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.backend:
+        dm.STORAGE_BACKEND = args.backend
+    if args.data:
+        if dm.STORAGE_BACKEND == "sqlite":
+            # قاعدة محددة صراحة: لا يُرحَّل إليها ملف JSON الموجود في مجلد العمل
+            dm.SQLITE_FILE = args.data
+            dm.MIGRATE_JSON_FILE = False
+        else:
+            dm.DATA_FILE = args.data
+    if args.since:
+        try:
+            datetime.strptime(args.since, "%Y-%m-%d")
+        except ValueError:
+            print(f"تاريخ غير صالح: {args.since}", file=sys.stderr)
+            return 2
+
+    names = select_students(args.level, args.since, args.names)
+    if not names:
+        print("لا يوجد تلاميذ مطابقون.")
+        return 0
+    os.makedirs(args.out, exist_ok=True)
+
+    start = time.perf_counter()
+    if args.command == "scores":
+        written, errors = export_scores(names, args.out)
+    elif args.command == "text":
+        written, errors = export_text_reports(names, args.out, args.workers)
+    elif args.command == "json":
+        written, errors = export_json(names, args.out)
+    else:
+        written, errors = export_pdf_reports(names, args.out, args.fmt, args.workers)
+    elapsed = time.perf_counter() - start
+
+    for name, error in errors.items():
+        print(f"خطأ ({name}): {error}", file=sys.stderr)
+    rate = written / elapsed if elapsed else 0.0
+    print(f"{args.command}: {written}/{len(names)} تلميذ في {elapsed:.2f} ث ({rate:.1f} تلميذ/ث) -> {args.out}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+# ==========================================
+# شبكة التقييم الرسمية: المواد والمهارات وسلم التقييم
+# ==========================================
+# وحدة بدون أي استيراد: تستعملها data_manager والنماذج وفهرس المهارات في طبقة التخزين
+# (skill_catalog) دون أن تعتمد طبقة التخزين على data_manager.
+ACADEMIC_SUBJECTS = {
+    "اللغة العربية": ["القراءة", "الكتابة", "التواصل الشفهي", "الفهم والاستيعاب"],
+    "الرياضيات": ["الأعداد والحساب", "الهندسة والفضاء", "القياس", "حل المسائل"],
+    "التربية الإسلامية": ["حفظ القرآن", "الفهم والاستيعاب", "السيرة والآداب"],
+    "التربية العلمية": ["اكتشاف المحيط", "البيئة والطبيعة"]
+}
+
+BEHAVIORAL_SKILLS = {
+    "المهارات الاجتماعية والشخصية": {
+        "التفاعل والاندماج": ["المشاركة مع الأقران", "العمل الجماعي", "احترام القواعد"],
+        "الاستقلالية": ["الاعتماد على النفس", "إدارة الأدوات المدرسية", "المبادرة"]
+    },
+    "المهارات المعرفية والحركية": {
+        "التركيز والانتباه": ["الانتباه أثناء الدرس", "إنجاز المهمة المطلوبة"],
+        "التناسق الحركي": ["التحكم في القلم", "الأنشطة اليدوية"]
+    }
+}
+
+RATING_OPTIONS = ["غير مكتسب", "في طريق الاكتساب", "مكتسب"]
+RATING_MAP = {"غير مكتسب": 0, "في طريق الاكتساب": 1, "مكتسب": 2}
@@ -1,71 +1,271 @@
+import bisect
+import itertools
 import json
 import os
-import streamlit as st
-from openai import OpenAI
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+import storage
+import ai_cache
+import history
+import analytics
+import metrics
+import serialization
+from curriculum import ACADEMIC_SUBJECTS, BEHAVIORAL_SKILLS, RATING_OPTIONS, RATING_MAP
+
+# المكتبات الثقيلة (numpy و pandas و streamlit و openai) تُستورد داخل الدوال التي تحتاجها،
+# فاستيراد الوحدة لحساب النسب أو قراءة البيانات لا يكلف تحميلها
 
 # ==========================================
 # 1. إعدادات مسار تخزين البيانات
 # ==========================================
 DATA_FILE = "students_data.json"
+SQLITE_FILE = "students_data.db"
+
+# نوع المخزن: "json" (افتراضي) أو "sqlite" للمدارس ذات الأعداد الكبيرة
+STORAGE_BACKEND = os.environ.get("STUDENTS_STORAGE", "json")
+
+# ترحيل DATA_FILE تلقائياً إلى قاعدة SQLite فارغة عند أول استخدام (يُعطَّل عند اختيار قاعدة بعينها)
+MIGRATE_JSON_FILE = True
+
+# صيغة ملف اللقطة لمخزن JSON: "json" (مضغوط، افتراضي) أو "msgpack" (ثنائي أصغر وأسرع، يتطلب مكتبة msgpack).
+# الصيغة الحالية للملف تُكتشف تلقائياً عند القراءة ويُحوَّل الملف عند أول حفظ.
+SNAPSHOT_FORMAT = os.environ.get("STUDENTS_SNAPSHOT_FORMAT", "json")
+
+# أقصى عدد من التلاميذ تُحفظ نتائجهم في ذاكرة الدرجات المؤقتة
+SCORE_CACHE_SIZE = 4096
+
+# أقصى عدد من سجلات التلاميذ المشتركة للقراءة بين الجلسات (انظر student_view)
+VIEW_CACHE_SIZE = 4096
+
+# إعدادات الذكاء الاصطناعي (Cerebras عبر واجهة متوافقة مع OpenAI)
+AI_BASE_URL = os.environ.get("CEREBRAS_BASE_URL", "https://api.cerebras.ai/v1")
+AI_MODEL = "gpt-oss-120b"
+PROMPT_VERSION = 1  # يُرفع عند تعديل نص الأوامر لإبطال الردود المحفوظة
+AI_CACHE_FILE = "ai_cache.db"
+
+# السجل الزمني للتقييمات (ملف منفصل حتى لا يكبر ملف البيانات الرئيسي)
+HISTORY_FILE = "evaluation_history.db"
+
+# جدول المهام الخلفية (تحليل ذكي وتقارير PDF) ونتائجها
+JOBS_FILE = "jobs.db"
 
 # ==========================================
 # 2. الثوابت والقوائم (Constants)
 # ==========================================
-ACADEMIC_SUBJECTS = {
-    "اللغة العربية": ["القراءة", "الكتابة", "التواصل الشفهي", "الفهم والاستيعاب"],
-    "الرياضيات": ["الأعداد والحساب", "الهندسة والفضاء", "القياس", "حل المسائل"],
-    "التربية الإسلامية": ["حفظ القرآن", "الفهم والاستيعاب", "السيرة والآداب"],
-    "التربية العلمية": ["اكتشاف المحيط", "البيئة والطبيعة"]
-}
-
-BEHAVIORAL_SKILLS = {
-    "المهارات الاجتماعية والشخصية": {
-        "التفاعل والاندماج": ["المشاركة مع الأقران", "العمل الجماعي", "احترام القواعد"],
-        "الاستقلالية": ["الاعتماد على النفس", "إدارة الأدوات المدرسية", "المبادرة"]
-    },
-    "المهارات المعرفية والحركية": {
-        "التركيز والانتباه": ["الانتباه أثناء الدرس", "إنجاز المهمة المطلوبة"],
-        "التناسق الحركي": ["التحكم في القلم", "الأنشطة اليدوية"]
-    }
-}
-
-RATING_OPTIONS = ["غير مكتسب", "في طريق الاكتساب", "مكتسب"]
-RATING_MAP = {"غير مكتسب": 0, "في طريق الاكتساب": 1, "مكتسب": 2}
+# ACADEMIC_SUBJECTS و BEHAVIORAL_SKILLS و RATING_OPTIONS و RATING_MAP معرفة في curriculum
+# (وحدة مستقلة يستعملها فهرس المهارات في طبقة التخزين أيضاً) وتُستورد هنا كما هي
 
 # ==========================================
 # 3. دوال إدارة الملفات (Input/Output)
 # ==========================================
+_migrated = set()
+
+def _store():
+    """إرجاع المخزن النشط (مع ترحيل ملف JSON القديم إلى SQLite عند أول استخدام)"""
+    if STORAGE_BACKEND != "sqlite":
+        return storage.get_store(DATA_FILE, snapshot_format=SNAPSHOT_FORMAT)
+    store = storage.get_store(SQLITE_FILE, backend="sqlite")
+    key = os.path.abspath(SQLITE_FILE)
+    if key not in _migrated:
+        _migrated.add(key)
+        if MIGRATE_JSON_FILE and store.is_empty() and os.path.exists(DATA_FILE):
+            storage.migrate_json_to_sqlite(DATA_FILE, SQLITE_FILE)
+    return store
+
+@metrics.timed("load_data")
 def load_data():
-    """تحميل بيانات الطلاب من ملف JSON"""
-    if not os.path.exists(DATA_FILE):
-        return {}
+    """تحميل بيانات الطلاب (اللقطة + السجل الإلحاقي)"""
     try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return _store().load_all()
     except Exception as e:
         print(f"Error loading data: {e}")
         return {}
 
-def save_data(data):
-    """حفظ قاموس البيانات بالكامل في ملف JSON"""
+@metrics.timed("save_data")
+def save_data(data, base=None):
+    """
+    حفظ قاموس البيانات بالكامل (يُسجَّل التلاميذ المتغيرون فقط).
+    base: النسخة التي حمّلتها الجلسة؛ عند تمريرها لا تُكتب إلا السجلات التي تغيرت عنها.
+    """
     try:
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        _store().replace_all(data, base=base)
     except Exception as e:
         print(f"Error saving data: {e}")
+    invalidate_scores()
+
+def export_json(path, names=None):
+    """تصدير السجلات (كلها أو names فقط) إلى ملف JSON منسق للقراءة أو للنقل؛ يُرجع عدد التلاميذ"""
+    if names is None:
+        data = load_data()
+    else:
+        records = ((name, get_student(name)) for name in names)
+        data = {name: record for name, record in records if record is not None}
+    storage.atomic_write(path, lambda f: serialization.export_pretty(f, data))
+    return len(data)
+
+def get_student(name):
+    """جلب سجل تلميذ واحد أو None إن لم يوجد"""
+    try:
+        return _store().get(name)
+    except Exception as e:
+        print(f"Error loading student: {e}")
+        return None
+
+def save_student(name, record):
+    """حفظ سجل تلميذ واحد دون إعادة كتابة بقية البيانات"""
+    try:
+        _store().put(name, record)
+    except Exception as e:
+        print(f"Error saving student: {e}")
+    invalidate_scores(name)
+
+def update_student(name, fn, on_write=None):
+    """
+    تعديل سجل تلميذ تحت قفل الكتابة: fn تستقبل السجل الحالي كما هو في المخزن
+    (أو None) وتُرجع السجل الجديد، فلا تضيع تعديلات جلسة أخرى على نفس التلميذ.
+    on_write() تُستدعى تحت نفس القفل بعد الكتابة إذا تغير السجل.
+    الدرجات المحفوظة تُبطل فقط إذا تغير رقم مراجعة التلميذ، أي إذا كُتب شيء فعلاً.
+    """
+    store = _store()
+    try:
+        revision = store.revision(name)
+        record = store.update(name, fn, on_write)
+    except Exception as e:
+        print(f"Error saving student: {e}")
+        invalidate_scores(name)
+        return None
+    if store.revision(name) != revision:
+        invalidate_scores(name)
+    return record
+
+def update_students(updates):
+    """
+    تعديل عدة تلاميذ ({الاسم: fn} بنفس معنى update_student) في كتابة واحدة،
+    للعمليات الجماعية مثل استيراد قائمة التلاميذ.
+    """
+    try:
+        return _store().update_many(updates)
+    except Exception as e:
+        print(f"Error saving students: {e}")
+        return None
+    finally:
+        invalidate_scores()
 
 def save_student_info(name, info):
     """حفظ أو تحديث بيانات تلميذ معين"""
-    data = load_data()
-    if name not in data:
-        data[name] = {"info": info, "evaluations": {}}
-    else:
-        data[name]["info"] = info
-    save_data(data)
+    def apply(record):
+        if record is None:
+            return {"info": info, "evaluations": {}}
+        record["info"] = info
+        return record
+    update_student(name, apply)
+
+def evaluation_changes(record, category, values):
+    """
+    المهارات التي تختلف درجتها في values عن تقييم الفئة المحفوظ في record:
+    {(الفئة، المجال، المادة، المهارة): الدرجة الجديدة} (history.REMOVED للمهارة غير الموجودة في values).
+    """
+    stored = (record or {}).get("evaluations", {}).get(category, {})
+    return history.diff_ratings(
+        history.flatten_ratings({category: stored}), history.flatten_ratings({category: values})
+    )
+
+def save_evaluation(name, category, values):
+    """
+    دمج تقييم فئة واحدة ("academic" أو "behavioral") في سجل التلميذ الحالي،
+    مع تسجيل الدرجات المتغيرة في السجل الزمني.
+    إذا لم تتغير أي درجة (evaluation_changes) لا يُكتب شيء ولا يتغير last_update،
+    فيبقى ملف PDF والدرجات المحفوظة صالحين. يُرجع السجل الحالي.
+    يرفع KeyError إذا لم يكن للتلميذ سجل (لا يُنشأ تلميذ جديد من التقييم، انظر save_student_info).
+    """
+    # فحص سريع على السجل المشترك دون قفل الكتابة: الحفظ المتكرر دون تعديل لا يكلف شيئاً
+    current = student_view(name)
+    if current is None:
+        raise KeyError(name)
+    if not evaluation_changes(current, category, values):
+        return current
+
+    previous = {}
+    missing = []
+    def apply(record):
+        if record is None:
+            # حُذف التلميذ من جلسة أخرى بعد الفحص: لا يُكتب شيء
+            missing.append(name)
+            return None
+        # إعادة الحساب تحت القفل: قد تكون جلسة أخرى حفظت نفس الدرجات في الأثناء
+        changes = evaluation_changes(record, category, values)
+        previous.clear()
+        if not changes:
+            return record
+        evals = record.setdefault("evaluations", {})
+        previous["evaluations"] = dict(evals)
+        evals[category] = values
+        evals["last_update"] = datetime.now().strftime("%Y-%m-%d")
+        previous["record"] = record
+        return record
+
+    def record_history():
+        # تحت قفل الكتابة: الحفظ المتزامن لنفس التلميذ يُسجَّل بنفس ترتيب الكتابات
+        record = previous["record"]
+        try:
+            _history().record(name, previous["evaluations"], record["evaluations"],
+                              class_level=record.get("info", {}).get("class_level", ""))
+        except Exception as e:
+            print(f"Error saving history: {e}")
+
+    record = update_student(name, apply, on_write=record_history)
+    if missing:
+        raise KeyError(name)
+    return record
+
+def student_infos():
+    """قاموس (الاسم -> البيانات الشخصية) دون تحميل التقييمات"""
+    try:
+        return _store().infos()
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        return {}
+
+def list_students():
+    """قائمة أسماء التلاميذ بترتيب التسجيل"""
+    return list(student_infos())
+
+def _history():
+    return history.get_history(HISTORY_FILE)
+
+def student_trajectory(name):
+    """تطور نسب التلميذ عبر كل التقييمات المسجلة (جدول مرتب زمنياً)"""
+    import pandas as pd
+    columns = ["date", "term", "academic_percentage", "behavioral_percentage", "overall_percentage"]
+    try:
+        return pd.DataFrame(_history().trajectory(name), columns=columns)
+    except Exception as e:
+        print(f"Error loading history: {e}")
+        return pd.DataFrame(columns=columns)
+
+def forget_history(name=None):
+    """حذف السجل الزمني لتلميذ (أو لكل التلاميذ)"""
+    try:
+        _history().forget(name)
+    except Exception as e:
+        print(f"Error saving history: {e}")
+
+def class_term_averages(term=None):
+    """متوسط الأداء العام لكل مستوى في كل فصل دراسي"""
+    import pandas as pd
+    columns = ["term", "class_level", "students", "average"]
+    try:
+        return pd.DataFrame(_history().class_averages(term), columns=columns)
+    except Exception as e:
+        print(f"Error loading history: {e}")
+        return pd.DataFrame(columns=columns)
 
 # ==========================================
 # 4. حساب الدرجات والنسب
 # ==========================================
+@metrics.timed("calculate_scores")
 def calculate_scores(evals):
     """حساب النسبة المئوية للتقييم الأكاديمي والسلوكي"""
     result = {
@@ -109,31 +309,346 @@ def calculate_scores(evals):
 
     return result
 
+class _LRUCache:
+    """ذاكرة مؤقتة محدودة الحجم على مستوى العملية (مشتركة بين جلسات Streamlit)"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+_score_cache = _LRUCache(SCORE_CACHE_SIZE)  # (المخزن، الاسم) -> (رقم المراجعة، النسب)
+
+def invalidate_scores(name=None):
+    """إبطال الدرجات المحفوظة لتلميذ معين (أو للجميع) بعد الحفظ"""
+    if name is None:
+        _score_cache.clear()
+    else:
+        _score_cache.pop((_store(), name))
+
+def student_scores(name):
+    """
+    نسب تلميذ من المخزن مع ذاكرة مؤقتة مرتبطة برقم مراجعة تقييماته:
+    لا يُعاد الحساب (ولا حتى قراءة السجل) ما دام التلميذ لم يُعدَّل.
+    """
+    store = _store()
+    revision = store.revision(name)
+    cached = _score_cache.get((store, name))
+    if cached is not None and revision is not None and cached[0] == revision:
+        return dict(cached[1])
+    record = store.get(name) or {}
+    scores = calculate_scores(record.get("evaluations", {}))
+    if revision is not None:
+        _score_cache.put((store, name), (revision, scores))
+    return dict(scores)
+
+def build_rating_matrix(groups, names):
+    """
+    بناء مصفوفة (تلميذ × مهارة) من مجموعات الدرجات (انظر storage.iter_rating_groups).
+    الأعمدة تبدأ بمهارات ACADEMIC_SUBJECTS و BEHAVIORAL_SKILLS ثم أي مهارة إضافية
+    موجودة في البيانات. الخانة -1 تعني أن المهارة لم تُقيَّم لهذا التلميذ.
+    """
+    import numpy as np
+    columns = [("academic", "", subj, skill) for subj, skills in ACADEMIC_SUBJECTS.items() for skill in skills]
+    columns += [
+        ("behavioral", main, sub, skill)
+        for main, subs in BEHAVIORAL_SKILLS.items()
+        for sub, skills in subs.items()
+        for skill in skills
+    ]
+    col_index = {c: i for i, c in enumerate(columns)}
+    row_index = {n: i for i, n in enumerate(names)}
+    # المواد تتكرر بنفس المهارات لكل التلاميذ، فنحسب أرقام أعمدتها مرة واحدة
+    group_cols = {}
+
+    row_ids, counts, col_ids, values = [], [], [], []
+    for name, category, domain, subject, skills in groups:
+        row = row_index.get(name)
+        if row is None or not skills:
+            continue
+        group_key = (category, domain, subject, tuple(skills))
+        cols = group_cols.get(group_key)
+        if cols is None:
+            cols = []
+            for skill in skills:
+                key = (category, domain, subject, skill)
+                if key not in col_index:
+                    col_index[key] = len(columns)
+                    columns.append(key)
+                cols.append(col_index[key])
+            group_cols[group_key] = cols
+        row_ids.append(row)
+        counts.append(len(cols))
+        col_ids.extend(cols)
+        values.extend(skills.values())
+
+    matrix = np.full((len(names), len(columns)), -1, dtype=np.int8)
+    if values:
+        rows_arr = np.repeat(np.asarray(row_ids, dtype=np.intp), counts)
+        matrix[rows_arr, np.asarray(col_ids, dtype=np.intp)] = values
+    return matrix, columns
+
+def score_roster(students):
+    """
+    حساب النسب لجميع التلاميذ دفعة واحدة (عمليات مصفوفية بدل حلقة لكل تلميذ).
+    students: قاموس السجلات (لوحة التحكم تستعمل class_analytics الذي يتحدث تدريجياً).
+    يُرجع قاموساً من ثلاثة DataFrame:
+      - "students": النسب الأكاديمية والسلوكية والعامة لكل تلميذ (بنفس منطق calculate_scores)
+      - "subjects": نسبة التحكم في كل مادة/مجال على مستوى القسم
+      - "skills": عدد التقييمات وتوزيع المستويات ونسبة الاكتساب لكل مهارة
+    """
+    infos = {n: rec.get("info", {}) for n, rec in students.items()}
+    groups = (g for n, rec in students.items() for g in storage.iter_rating_groups(n, rec.get("evaluations", {})))
+    matrix, columns = build_rating_matrix(groups, list(infos))
+    return _score_matrix(infos, matrix, columns)
+
+def _percentage(total, count):
+    import numpy as np
+    return np.divide(total * 100.0, count * 2, out=np.zeros(len(total)), where=count > 0)
+
+def _score_matrix(infos, matrix, columns):
+    import numpy as np
+    import pandas as pd
+    names = list(infos)
+    rated = matrix >= 0
+    values = np.where(rated, matrix, 0).astype(np.int32)
+    is_academic = np.array([c[0] == "academic" for c in columns], dtype=bool)
+    ac_total, ac_count = values[:, is_academic].sum(axis=1), rated[:, is_academic].sum(axis=1)
+    bh_total, bh_count = values[:, ~is_academic].sum(axis=1), rated[:, ~is_academic].sum(axis=1)
+    ac_pct = _percentage(ac_total, ac_count)
+    bh_pct = _percentage(bh_total, bh_count)
+    overall = np.where(
+        (ac_count > 0) & (bh_count > 0), (ac_pct + bh_pct) / 2,
+        np.where(ac_count > 0, ac_pct, bh_pct)
+    )
+    student_df = pd.DataFrame({
+        "name": names,
+        "class_level": [infos[n].get("class_level") for n in names],
+        "academic_percentage": ac_pct,
+        "behavioral_percentage": bh_pct,
+        "overall_percentage": overall,
+    })
+
+    # تجميع على مستوى المهارة من نفس المصفوفة
+    skill_df = pd.DataFrame(columns, columns=["category", "domain", "subject", "skill"])
+    skill_df["rated"] = rated.sum(axis=0)
+    for level in (0, 1, 2):
+        skill_df[f"level_{level}"] = (matrix == level).sum(axis=0)
+    skill_df["total"] = values.sum(axis=0)
+    skill_df["acquired_percentage"] = _percentage(skill_df["total"].to_numpy(), skill_df["rated"].to_numpy())
+    subject_df = skill_df.groupby(["category", "domain", "subject"], sort=False, as_index=False)[["rated", "total"]].sum()
+    subject_df["percentage"] = _percentage(subject_df["total"].to_numpy(), subject_df["rated"].to_numpy())
+
+    return {"students": student_df, "subjects": subject_df, "skills": skill_df}
+
 # ==========================================
 # 5. التحليل الذكي عبر Cerebras
 # ==========================================
-def analyze_student_performance(student_name, evals, gender):
+def _get_api_key():
+    """مفتاح Cerebras من متغيرات البيئة أو من إعدادات الأمان (Secrets)"""
+    api_key = os.environ.get("CEREBRAS_API_KEY")
+    if api_key:
+        return api_key
+    import streamlit as st
+    try:
+        return st.secrets["CEREBRAS_API_KEY"]
+    except (KeyError, FileNotFoundError):
+        return None
+
+_clients = {}
+
+def _get_client(api_key, max_retries=2):
+    """عميل اتصال واحد يُعاد استخدامه (مع اتصالاته المفتوحة) لكل مفتاح وعنوان"""
+    key = (api_key, AI_BASE_URL, max_retries)
+    client = _clients.get(key)
+    if client is None:
+        from openai import OpenAI
+        client = _clients[key] = OpenAI(api_key=api_key, base_url=AI_BASE_URL, max_retries=max_retries)
+    return client
+
+def _normalize_evals(evals):
+    """التقييمات كما تُرسل للنموذج (تاريخ آخر تحديث لا يؤثر على التحليل)"""
+    return {k: v for k, v in evals.items() if k != "last_update"}
+
+def analysis_cache_key(student_name, evals, gender):
+    """مفتاح ذاكرة التحليل: التلميذ، الجنس، التقييمات، نسخة الأوامر، والنموذج"""
+    return ai_cache.make_key(student_name, gender, _normalize_evals(evals), PROMPT_VERSION, AI_MODEL)
+
+def cached_analysis(student_name, evals, gender):
+    """إرجاع (التحليل، الخطة) المحفوظين مسبقاً دون أي اتصال، أو None"""
+    try:
+        cached = ai_cache.get_cache(AI_CACHE_FILE).get(analysis_cache_key(student_name, evals, gender))
+    except Exception as e:
+        print(f"AI cache error: {e}")
+        return None
+    if cached is None:
+        return None
+    return cached["narrative"], cached["action_plan"]
+
+@metrics.timed("analyze_student_performance")
+def analyze_student_performance(student_name, evals, gender, refresh=False, on_partial=None):
     """
     تحليل بيانات التلميذ باستخدام ذكاء Cerebras 
     لإرجاع تقرير سردي وخطة عمل مقترحة.
+    النتائج الناجحة تُحفظ على القرص، فإعادة عرض نفس التقييمات لا تكلف أي طلب.
+    refresh=True يتجاوز الذاكرة ويطلب تحليلاً جديداً (ثم يحفظه).
+    on_partial(narrative, action_plan): عند تمريرها يُطلب الرد متدفقاً وتُستدعى مع كل محتوى جديد
+    (النص حتى الآن والخطوات المكتملة حتى الآن).
+    """
+    result = analysis_result(student_name, evals, gender, refresh=refresh, on_partial=on_partial)
+    return result["narrative"], result["action_plan"]
+
+def analysis_result(student_name, evals, gender, refresh=False, on_partial=None):
     """
+    مثل analyze_student_performance لكن يُرجع {"narrative", "action_plan", "ok"}:
+    ok=False إذا كان النص رسالة خطأ (مفتاح مفقود أو فشل الطلب) وليس تحليلاً.
+    """
+    if not refresh:
+        cached = cached_analysis(student_name, evals, gender)
+        if cached is not None:
+            metrics.count("ai.cache_hits")
+            return {"narrative": cached[0], "action_plan": cached[1], "ok": True}
+
     # التحقق من وجود مفتاح API
+    api_key = _get_api_key()
+    if not api_key:
+        return {"narrative": "⚠️ تنبيه: لم يتم العثور على مفتاح Cerebras في إعدادات الأمان (Secrets).",
+                "action_plan": [], "ok": False}
+
+    def request():
+        return _request_analysis(_get_client(api_key), student_name, evals, gender, on_partial)
+
     try:
-        api_key = st.secrets["CEREBRAS_API_KEY"]
-    except KeyError:
-        return "⚠️ تنبيه: لم يتم العثور على مفتاح Cerebras في إعدادات الأمان (Secrets).", []
+        cache = ai_cache.get_cache(AI_CACHE_FILE)
+    except Exception as e:
+        print(f"AI cache error: {e}")
+        cache = None
 
-    # إعداد عميل الاتصال
-    client = OpenAI(
-        api_key=api_key,
-        base_url="https://api.cerebras.ai/v1",
-    )
+    if cache is None:
+        result = request()
+    elif refresh:
+        result = request()
+        if result["ok"]:
+            cache.put(analysis_cache_key(student_name, evals, gender), result)
+    else:
+        # الطلبات المتزامنة لنفس التلميذ (من عدة جلسات) تُدمج في طلب واحد
+        result = cache.get_or_compute(
+            analysis_cache_key(student_name, evals, gender), request, cacheable=lambda r: r["ok"]
+        )
+    return result
+
+def saved_analysis(student_name, record):
+    """التحليل المحفوظ في سجل التلميذ (من التوليد الجماعي) إن كان مطابقاً لتقييماته الحالية"""
+    report = record.get("ai_report")
+    if not report:
+        return None
+    evals = record.get("evaluations", {})
+    gender = record.get("info", {}).get("gender", "ذكر")
+    if report.get("key") != analysis_cache_key(student_name, evals, gender):
+        return None
+    return report["narrative"], report["action_plan"]
+
+def save_analysis(student_name, key, result):
+    """حفظ تحليل ناجح في سجل التلميذ (ai_report) وفي ذاكرة التحليل المؤقتة"""
+    def apply(record):
+        if record is None:
+            return None
+        record["ai_report"] = {
+            "key": key,
+            "narrative": result["narrative"],
+            "action_plan": result["action_plan"],
+            "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        }
+        return record
+    update_student(student_name, apply)
+    ai_cache.get_cache(AI_CACHE_FILE).put(key, result)
 
+def iter_report_inputs(names):
+    """مدخلات create_pdf لكل تلميذ: (الاسم، البيانات، التقييمات، التحليل، الخطة) مع التحليل المحفوظ إن وجد"""
+    for name in names:
+        record = get_student(name)
+        if record is None:
+            continue
+        info = record.get("info", {})
+        evals = record.get("evaluations", {})
+        analysis = (saved_analysis(name, record)
+                    or cached_analysis(name, evals, info.get("gender", "ذكر"))
+                    or ("", []))
+        yield name, info, evals, analysis[0], analysis[1]
+
+def _count_usage(usage):
+    if usage is not None:
+        metrics.count("ai.prompt_tokens", usage.prompt_tokens or 0)
+        metrics.count("ai.completion_tokens", usage.completion_tokens or 0)
+
+def _read_stream(response, on_partial, start):
+    """قراءة رد متدفق: تمرير التحليل الجزئي لـ on_partial مع كل محتوى جديد، وإرجاع النص الكامل"""
+    from ai_stream import AnalysisStream
+    parser = AnalysisStream()
+    first = True
+    for chunk in response:
+        _count_usage(getattr(chunk, "usage", None))
+        if not chunk.choices:
+            continue
+        if parser.feed(chunk.choices[0].delta.content or ""):
+            if first:
+                # زمن ظهور أول محتوى للمستخدم (بدل انتظار الرد كاملاً)
+                metrics.observe("ai.first_content", time.perf_counter() - start)
+                first = False
+            on_partial(parser.narrative, list(parser.action_plan))
+    return parser.text
+
+def _request_analysis(client, student_name, evals, gender, on_partial=None):
+    """إرسال طلب التحليل للنموذج وإرجاع {"narrative", "action_plan", "ok"}"""
+    try:
+        start = time.perf_counter()
+        response = request_completion(client, student_name, evals, gender, stream=on_partial is not None)
+        metrics.count("ai.requests")
+        if on_partial is not None:
+            return parse_analysis(_read_stream(response, on_partial, start))
+        _count_usage(response.usage)
+        return parse_analysis(response.choices[0].message.content)
+    except Exception as e:
+        print(f"API Error: {e}")
+        metrics.count("ai.errors")
+        return {"narrative": f"حدث خطأ أثناء الاتصال بمزود الذكاء الاصطناعي: {str(e)}", "action_plan": [], "ok": False}
+
+@metrics.timed("ai.request")
+def request_completion(client, student_name, evals, gender, stream=False):
+    """
+    استدعاء النموذج مباشرة (أخطاء الاتصال تُرفع كما هي ليتعامل معها المستدعي).
+    stream=True يُرجع الرد كتدفق من الأجزاء بدل انتظار اكتماله.
+    """
     # حساب الدرجات لتزويد الذكاء الاصطناعي بها
     scores = calculate_scores(evals)
     
     # تجهيز النص المساعد
-    evals_text = json.dumps(evals, ensure_ascii=False)
+    evals_text = json.dumps(_normalize_evals(evals), ensure_ascii=False)
     pronoun = "التلميذ" if gender == "ذكر" else "التلميذة"
 
     # صياغة الأوامر (Prompt)
@@ -154,20 +669,22 @@ def analyze_student_performance(student_name, evals, gender):
     ملاحظة هامة: يجب أن يكون الرد عبارة عن كود JSON فقط ولا تضف أي نص قبله أو بعده.
     """
 
-    try:
-        # استدعاء نموذج llama3.1-70b من Cerebras
-        response = client.chat.completions.create(
-            model="gpt-oss-120b", 
-            messages=[
-                {"role": "system", "content": "أنت خبير تربوي دقيق. استجابتك يجب أن تكون بصيغة JSON صحيحة 100% فقط."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1000
-        )
+    # استدعاء نموذج llama3.1-70b من Cerebras
+    return client.chat.completions.create(
+        model=AI_MODEL, 
+        messages=[
+            {"role": "system", "content": "أنت خبير تربوي دقيق. استجابتك يجب أن تكون بصيغة JSON صحيحة 100% فقط."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.7,
+        max_tokens=1000,
+        **({"stream": True, "stream_options": {"include_usage": True}} if stream else {})
+    )
 
-        result_text = response.choices[0].message.content.strip()
-        
+def parse_analysis(result_text):
+    """استخراج {"narrative", "action_plan", "ok"} من نص رد النموذج"""
+    result_text = (result_text or "").strip()
+    try:
         # إزالة علامات Markdown إذا أضافها النموذج
         if result_text.startswith("```json"):
             result_text = result_text.replace("```json", "", 1)
@@ -186,17 +703,16 @@ def analyze_student_performance(student_name, evals, gender):
         # تحويل النص إلى قاموس بايثون
         parsed_data = json.loads(clean_json_str)
         
-        narrative = parsed_data.get("narrative", "تعذر توليد التحليل التربوي بشكل صحيح.")
+        narrative = parsed_data.get("narrative")
         action_plan = parsed_data.get("action_plan", [])
+        if not narrative:
+            return {"narrative": "تعذر توليد التحليل التربوي بشكل صحيح.", "action_plan": action_plan, "ok": False}
         
-        return narrative, action_plan
+        return {"narrative": narrative, "action_plan": action_plan, "ok": True}
 
-    except json.JSONDecodeError as e:
+    except (json.JSONDecodeError, AttributeError) as e:
         print(f"JSON Parsing Error: {e} \nResponse was: {result_text}")
-        return "عذراً، قام الذكاء الاصطناعي بتوليد نص غير متوافق مع الهيكل المطلوب. يرجى المحاولة مرة أخرى.", []
-    except Exception as e:
-        print(f"API Error: {e}")
-        return f"حدث خطأ أثناء الاتصال بمزود الذكاء الاصطناعي: {str(e)}", []
+        return {"narrative": "عذراً، قام الذكاء الاصطناعي بتوليد نص غير متوافق مع الهيكل المطلوب. يرجى المحاولة مرة أخرى.", "action_plan": [], "ok": False}
 
 # ==========================================
 # 6. توليد التقارير النصية 
@@ -219,3 +735,219 @@ def generate_text_report(name, info, data, stats, narrative, action_plan):
          
     return report
 
+
+# ==========================================
+# 7. البحث في سجل التلاميذ
+# ==========================================
+NGRAM_SIZE = 3        # طول المقاطع لفهرس البحث داخل الكلمات
+PAGE_SIZE = 20        # عدد التلاميذ في كل صفحة من السجل
+
+_ARABIC_FOLDS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ة": "ه", "ى": "ي", "ؤ": "و", "ئ": "ي", "ـ": None,
+})
+_DIACRITICS = dict.fromkeys(list(range(0x064B, 0x0653)) + [0x0670])
+
+def normalize_arabic(text):
+    """توحيد النص للبحث: حذف التشكيل والتطويل وتوحيد الهمزات والتاء المربوطة والألف المقصورة"""
+    text = str(text).translate(_DIACRITICS).translate(_ARABIC_FOLDS).lower()
+    return " ".join(text.split())
+
+class StudentIndex:
+    """
+    فهرس بحث ثابت لأسماء التلاميذ وأرقام تعريفهم (يُبنى مرة لكل مراجعة للبيانات):
+    البحث ببداية الكلمة عبر قائمة مرتبة، وبجزء من الكلمة عبر فهرس المقاطع الثلاثية.
+    """
+
+    def __init__(self, infos):
+        self.names = list(infos)
+        self._infos = infos
+        self._rows = {name: row for row, name in enumerate(self.names)}
+        self._by_level = {}
+        tokens = {}
+        for row, (name, info) in enumerate(infos.items()):
+            self._by_level.setdefault(info.get("class_level") or "", []).append(row)
+            words = normalize_arabic(name).split()
+            if info.get("id"):
+                words.append(normalize_arabic(info["id"]))
+            for word in words:
+                tokens.setdefault(word, set()).add(row)
+        self._tokens = tokens
+        self._sorted = sorted(tokens)
+        self._grams = {}
+        for word in tokens:
+            for i in range(len(word) - NGRAM_SIZE + 1):
+                self._grams.setdefault(word[i:i + NGRAM_SIZE], set()).add(word)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    def info(self, name):
+        return self._infos.get(name, {})
+
+    def levels(self):
+        return sorted(level for level in self._by_level if level)
+
+    def names_in(self, level=None):
+        """أسماء تلاميذ مستوى معين (أو الجميع) بترتيب التسجيل"""
+        if not level:
+            return list(self.names)
+        return [self.names[row] for row in self._by_level.get(level, [])]
+
+    def _words_matching(self, term):
+        start = bisect.bisect_left(self._sorted, term)
+        words = set()
+        for word in itertools.islice(self._sorted, start, None):
+            if not word.startswith(term):
+                break
+            words.add(word)
+        if len(term) >= NGRAM_SIZE:
+            grams = [self._grams.get(term[i:i + NGRAM_SIZE], set()) for i in range(len(term) - NGRAM_SIZE + 1)]
+            words.update(w for w in set.intersection(*grams) if term in w)
+        return words
+
+    def _rows_matching(self, term):
+        rows = set()
+        for word in self._words_matching(term):
+            rows |= self._tokens[word]
+        return rows
+
+    def search(self, query="", level=None, offset=0, limit=PAGE_SIZE):
+        """
+        التلاميذ المطابقون لكل كلمات query (بداية كلمة أو جزء منها، بعد التوحيد) داخل المستوى level.
+        يُرجع (عدد النتائج، أسماء الصفحة المطلوبة) بترتيب التسجيل.
+        """
+        terms = normalize_arabic(query).split()
+        candidates = self._by_level.get(level, []) if level else None
+        if not terms:
+            rows = candidates if candidates is not None else range(len(self.names))
+            return len(rows), [self.names[row] for row in rows[offset:offset + limit]]
+        matched = None
+        for term in sorted(terms, key=len, reverse=True):
+            found = self._rows_matching(term)
+            matched = found if matched is None else matched & found
+            if not matched:
+                return 0, []
+        if candidates is not None:
+            matched &= set(candidates)
+        rows = sorted(matched)
+        return len(rows), [self.names[row] for row in rows[offset:offset + limit]]
+
+_index_cache = _LRUCache(2)   # (المخزن، مراجعة البيانات) -> StudentIndex
+
+def student_index():
+    """فهرس البحث للبيانات الحالية (يُعاد بناؤه فقط عند تغير البيانات)"""
+    try:
+        store = _store()
+        key = (store, store.revision())
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        return StudentIndex({})
+    index = _index_cache.get(key)
+    if index is None:
+        index = StudentIndex(student_infos())
+        _index_cache.put(key, index)
+    return index
+
+# ==========================================
+# 8. إحصائيات الأقسام (لوحة التحكم)
+# ==========================================
+_analytics = {}   # المخزن -> ClassAnalytics
+_analytics_lock = threading.Lock()
+
+def class_analytics():
+    """
+    إحصائيات الأقسام المادية للمخزن الحالي: تُبنى مرة واحدة في العملية،
+    ثم لا يُعاد عند كل قراءة إلا حساب التلاميذ الذين تغيرت سجلاتهم منذ آخر قراءة.
+    """
+    store = _store()
+    with _analytics_lock:
+        result = _analytics.get(store)
+        if result is None:
+            result = _analytics[store] = analytics.ClassAnalytics()
+    try:
+        return result.sync(store)
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        return result
+
+# ==========================================
+# 9. سجلات مشتركة للقراءة بين الجلسات
+# ==========================================
+# الصفحات تقرأ سجل التلميذ عند كل إعادة تشغيل للسكربت، ولكل متصفح مفتوح.
+# بدلاً من نسخة جديدة في كل مرة، يُحفظ سجل واحد غير قابل للتعديل لكل تلميذ
+# في العملية ويُعاد بناؤه فقط عند تغير رقم مراجعته، مع إعادة استخدام الأجزاء
+# التي لم تتغير من النسخة السابقة. التعديل يمر دائماً عبر update_student
+# التي تعطي الدالة نسخة خاصة بها (نسخ عند الكتابة).
+class FrozenRecord(dict):
+    """قاموس للقراءة فقط (يبقى dict حتى يعمل مع json وبقية الدوال كما هو)"""
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("السجل المشترك للقراءة فقط، استخدم update_student للتعديل")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenRecord, (dict(self),))
+
+    def thaw(self):
+        """نسخة عادية قابلة للتعديل (قواميس وقوائم)"""
+        return _thaw(self)
+
+def _freeze(obj, previous=None):
+    """
+    نسخة غير قابلة للتعديل من obj (القوائم تصبح tuple).
+    الأجزاء المساوية لما في previous (النسخة السابقة) تُعاد كما هي فتتشاركها النسختان.
+    """
+    if isinstance(obj, dict):
+        prev = previous if isinstance(previous, FrozenRecord) else {}
+        items = {k: _freeze(v, prev.get(k)) for k, v in obj.items()}
+        if prev is previous and len(items) == len(prev) and all(prev.get(k) is v for k, v in items.items()):
+            return previous
+        return FrozenRecord(items)
+    if isinstance(obj, (list, tuple)):
+        prev = previous if isinstance(previous, tuple) else ()
+        items = tuple(_freeze(v, prev[i] if i < len(prev) else None) for i, v in enumerate(obj))
+        if prev is previous and len(items) == len(prev) and all(a is b for a, b in zip(items, prev)):
+            return previous
+        return items
+    if type(previous) is type(obj) and previous == obj:
+        return previous
+    return obj
+
+def _thaw(obj):
+    if isinstance(obj, dict):
+        return {k: _thaw(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_thaw(v) for v in obj]
+    return obj
+
+_view_cache = _LRUCache(VIEW_CACHE_SIZE)   # (المخزن، الاسم) -> (رقم المراجعة، FrozenRecord)
+
+def student_view(name):
+    """
+    سجل تلميذ للعرض فقط (FrozenRecord) أو None: نفس الكائن لكل الجلسات
+    ما دام التلميذ لم يُعدَّل، فلا يزيد استهلاك الذاكرة بزيادة عدد المستخدمين.
+    """
+    try:
+        store = _store()
+        revision = store.revision(name)
+        if revision is None:
+            return None
+        cached = _view_cache.get((store, name))
+        if cached is not None and cached[0] == revision:
+            return cached[1]
+        record = store.get(name)
+    except Exception as e:
+        print(f"Error loading student: {e}")
+        return None
+    if record is None:
+        return None
+    view = _freeze(record, cached[1] if cached is not None else None)
+    _view_cache.put((store, name), (revision, view))
+    return view
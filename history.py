@@ -0,0 +1,253 @@
+import os
+import sqlite3
+import threading
+from array import array
+from datetime import datetime
+
+from storage import iter_rating_groups
+
+# ==========================================
+# 1. إعدادات السجل الزمني للتقييمات
+# ==========================================
+REMOVED = -1   # درجة خاصة في الفروقات: المهارة لم تعد مقيّمة
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS skills (
+    skill_id  INTEGER PRIMARY KEY,
+    category  TEXT NOT NULL,
+    domain    TEXT NOT NULL,
+    subject   TEXT NOT NULL,
+    skill     TEXT NOT NULL,
+    UNIQUE (category, domain, subject, skill)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id      INTEGER PRIMARY KEY,
+    student          TEXT NOT NULL,
+    class_level      TEXT NOT NULL,
+    taken_at         TEXT NOT NULL,
+    term             TEXT NOT NULL,
+    academic_total   INTEGER NOT NULL,
+    academic_count   INTEGER NOT NULL,
+    behavioral_total INTEGER NOT NULL,
+    behavioral_count INTEGER NOT NULL,
+    overall          REAL NOT NULL,
+    skill_ids        BLOB NOT NULL,
+    scores           BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_student ON snapshots(student, taken_at);
+CREATE INDEX IF NOT EXISTS idx_snapshots_term ON snapshots(term, class_level, student);
+"""
+
+
+def term_of(day):
+    """
+    الفصل الدراسي لتاريخ معين بصيغة "2025/2026-1":
+    الفصل الأول سبتمبر-ديسمبر، الثاني جانفي-مارس، الثالث أفريل-أوت.
+    """
+    if isinstance(day, str):
+        day = datetime.strptime(day[:10], "%Y-%m-%d")
+    if day.month >= 9:
+        return f"{day.year}/{day.year + 1}-1"
+    term = 2 if day.month <= 3 else 3
+    return f"{day.year - 1}/{day.year}-{term}"
+
+
+def flatten_ratings(evals):
+    """تقييمات تلميذ كقاموس مسطح {(الفئة، المجال، المادة، المهارة): الدرجة}"""
+    flat = {}
+    for _, category, domain, subject, skills in iter_rating_groups(None, evals or {}):
+        for skill, score in skills.items():
+            flat[(category, domain, subject, skill)] = score
+    return flat
+
+
+def diff_ratings(before, after):
+    """المهارات التي تغيرت درجتها فقط (REMOVED للمهارات المحذوفة)"""
+    delta = {key: score for key, score in after.items() if before.get(key) != score}
+    delta.update((key, REMOVED) for key in before if key not in after)
+    return delta
+
+
+def _percentages(ac_total, ac_count, bh_total, bh_count):
+    """نفس قواعد calculate_scores: الدرجة القصوى 2 لكل مهارة، والعام متوسط الفئتين المقيّمتين"""
+    academic = ac_total * 50.0 / ac_count if ac_count else 0.0
+    behavioral = bh_total * 50.0 / bh_count if bh_count else 0.0
+    if ac_count and bh_count:
+        overall = (academic + behavioral) / 2
+    else:
+        overall = academic if ac_count else behavioral
+    return academic, behavioral, overall
+
+
+# ==========================================
+# 2. مخزن السجل الزمني
+# ==========================================
+class HistoryStore:
+    """
+    سجل زمني مضغوط (SQLite) لكل تقييم: كل لقطة تحفظ المهارات المتغيرة فقط
+    كمصفوفتين متراصتين (معرفات المهارات والدرجات)، مع مجاميع جاهزة للاستعلامات السريعة.
+    منفصل عن ملف بيانات التلاميذ فلا يكبر الملف الرئيسي مع الزمن.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._load_skills()
+
+    def close(self):
+        self._conn.close()
+
+    def _load_skills(self):
+        """فهرس المهارات: كل مهارة تُخزن مرة واحدة ويُشار إليها في اللقطات برقمها"""
+        self._skill_ids = {}
+        self._skill_keys = {}
+        for row in self._conn.execute("SELECT skill_id, category, domain, subject, skill FROM skills"):
+            self._skill_ids[row[1:]] = row[0]
+            self._skill_keys[row[0]] = row[1:]
+
+    def _intern(self, key):
+        skill_id = self._skill_ids.get(key)
+        if skill_id is None:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO skills (category, domain, subject, skill) VALUES (?, ?, ?, ?)", key
+            )
+            skill_id = self._conn.execute(
+                "SELECT skill_id FROM skills WHERE category = ? AND domain = ? AND subject = ? AND skill = ?", key
+            ).fetchone()[0]
+            self._skill_ids[key] = skill_id
+            self._skill_keys[skill_id] = key
+        return skill_id
+
+    def record(self, name, before, after, class_level="", taken_at=None):
+        """
+        تسجيل لقطة جديدة لتقييمات التلميذ (before/after: قاموس evaluations كاملاً).
+        لا يُسجَّل شيء إذا لم تتغير أي درجة. يُرجع معرف اللقطة أو None.
+        """
+        flat_after = flatten_ratings(after)
+        delta = diff_ratings(flatten_ratings(before), flat_after)
+        if not delta:
+            return None
+        taken_at = taken_at or datetime.now()
+        totals = {"academic": [0, 0], "behavioral": [0, 0]}
+        for (category, *_), score in flat_after.items():
+            totals[category][0] += score
+            totals[category][1] += 1
+        (ac_total, ac_count), (bh_total, bh_count) = totals["academic"], totals["behavioral"]
+        overall = _percentages(ac_total, ac_count, bh_total, bh_count)[2]
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = array("I", (self._intern(key) for key in delta))
+                scores = array("b", delta.values())
+                cursor = self._conn.execute(
+                    "INSERT INTO snapshots (student, class_level, taken_at, term, academic_total, academic_count,"
+                    " behavioral_total, behavioral_count, overall, skill_ids, scores)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (name, class_level or "", taken_at.strftime("%Y-%m-%d %H:%M:%S"), term_of(taken_at),
+                     ac_total, ac_count, bh_total, bh_count, overall, ids.tobytes(), scores.tobytes()),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                # معرفات مهارات جديدة ربما دخلت الفهرس مع المعاملة الملغاة
+                self._load_skills()
+                raise
+        return cursor.lastrowid
+
+    def trajectory(self, name):
+        """
+        مسار أداء تلميذ: قائمة بترتيب زمني من
+        {"date", "term", "academic_percentage", "behavioral_percentage", "overall_percentage"}.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT taken_at, term, academic_total, academic_count, behavioral_total, behavioral_count"
+                " FROM snapshots WHERE student = ? ORDER BY taken_at, snapshot_id",
+                (name,),
+            ).fetchall()
+        points = []
+        for taken_at, term, *totals in rows:
+            academic, behavioral, overall = _percentages(*totals)
+            points.append({
+                "date": taken_at,
+                "term": term,
+                "academic_percentage": academic,
+                "behavioral_percentage": behavioral,
+                "overall_percentage": overall,
+            })
+        return points
+
+    def class_averages(self, term=None):
+        """
+        متوسط الأداء العام لكل (فصل، مستوى): آخر لقطة لكل تلميذ داخل الفصل.
+        يُرجع قائمة {"term", "class_level", "students", "average"} مرتبة حسب الفصل ثم المستوى.
+        """
+        where, params = ("WHERE term = ?", (term,)) if term else ("", ())
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT s.term, s.class_level, COUNT(*), AVG(s.overall) FROM snapshots s"
+                " JOIN (SELECT snapshot_id AS last, MAX(taken_at) FROM snapshots " + where +
+                " GROUP BY student, term) l ON s.snapshot_id = l.last"
+                " GROUP BY s.term, s.class_level ORDER BY s.term, s.class_level",
+                params,
+            ).fetchall()
+        return [
+            {"term": t, "class_level": level, "students": count, "average": average}
+            for t, level, count, average in rows
+        ]
+
+    def state_at(self, name, until=None):
+        """إعادة بناء تقييمات التلميذ (مسطحة) كما كانت في تاريخ معين بتطبيق الفروقات بالترتيب"""
+        query = "SELECT skill_ids, scores FROM snapshots WHERE student = ?"
+        params = [name]
+        if until is not None:
+            query += " AND taken_at <= ?"
+            params.append(until if isinstance(until, str) else until.strftime("%Y-%m-%d %H:%M:%S"))
+        with self._lock:
+            # الفروقات حُسبت بترتيب التسجيل فتُطبق بنفس الترتيب
+            rows = self._conn.execute(query + " ORDER BY snapshot_id", params).fetchall()
+            keys = self._skill_keys
+            state = {}
+            for ids_blob, scores_blob in rows:
+                ids = array("I")
+                ids.frombytes(ids_blob)
+                scores = array("b")
+                scores.frombytes(scores_blob)
+                for skill_id, score in zip(ids, scores):
+                    if score == REMOVED:
+                        state.pop(keys[skill_id], None)
+                    else:
+                        state[keys[skill_id]] = score
+        return state
+
+    def forget(self, name=None):
+        """حذف سجل تلميذ (أو السجل كاملاً إذا لم يُحدد اسم)"""
+        with self._lock:
+            if name is None:
+                self._conn.execute("DELETE FROM snapshots")
+            else:
+                self._conn.execute("DELETE FROM snapshots WHERE student = ?", (name,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+
+
+# ==========================================
+# 3. سجل المخازن المفتوحة (واحد لكل ملف)
+# ==========================================
+_histories = {}
+_histories_lock = threading.Lock()
+
+
+def get_history(path):
+    key = os.path.abspath(path)
+    with _histories_lock:
+        history = _histories.get(key)
+        if history is None:
+            history = _histories[key] = HistoryStore(path)
+        return history
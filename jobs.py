@@ -0,0 +1,376 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import data_manager as dm
+import metrics
+
+# ==========================================
+# 1. إعدادات المهام الخلفية
+# ==========================================
+# الأعمال الطويلة (التحليل الذكي وتقارير PDF) تُسجل في جدول مهام وتنفذها خيوط عاملة
+# مستقلة عن جلسات Streamlit، فتبقى الصفحة تفاعلية وتتابع الحالة فقط.
+JOB_WORKERS = 2             # عدد المهام المنفذة في نفس الوقت داخل العملية
+JOB_POLL_INTERVAL = 1.0     # ثوانٍ بين فحص الجدول عن مهام جديدة (من عمليات أخرى)
+JOB_STALE_AFTER = 600       # مهمة "جارية" بلا أي تحديث لهذه المدة تُعتبر متوقفة (عملية أُغلقت) وتُعاد
+JOB_HEARTBEAT_INTERVAL = 60  # تحديث نبض المهمة الجارية دورياً حتى لا تُعتبر متوقفة أثناء عمل طويل
+JOB_MAX_ATTEMPTS = 3
+JOB_RETENTION = 7 * 24 * 3600   # حذف المهام المنتهية (ونتائجها) بعد أسبوع
+PARTIAL_INTERVAL = 0.25     # أقل مدة بين كتابتين للنتيجة الجزئية (نص التحليل أثناء وصوله)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE = (QUEUED, RUNNING)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      INTEGER PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    target      TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    done        INTEGER NOT NULL DEFAULT 0,
+    total       INTEGER NOT NULL DEFAULT 0,
+    message     TEXT,
+    error       TEXT,
+    result      BLOB,
+    output      TEXT,
+    partial     TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    heartbeat   REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, job_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_target ON jobs(kind, target, job_id);
+"""
+
+COLUMNS = ("job_id", "kind", "target", "params", "status", "done", "total", "message", "error",
+           "output", "partial", "attempts", "created_at", "started_at", "finished_at")
+
+
+class JobError(Exception):
+    """فشل متوقع للمهمة (يُعرض نصه للمستخدم كما هو)"""
+
+
+# ==========================================
+# 2. أنواع المهام
+# ==========================================
+def run_analysis(job, progress):
+    """
+    التحليل الذكي لتلميذ واحد، والنتيجة تُحفظ في سجله (ai_report).
+    الرد يُطلب متدفقاً ويُكتب جزئياً في المهمة فتعرضه الصفحة أثناء وصوله.
+    """
+    record = dm.get_student(job["target"])
+    if record is None:
+        raise JobError("التلميذ غير موجود.")
+    evals = record.get("evaluations", {})
+    gender = record.get("info", {}).get("gender", "ذكر")
+    written = {"at": 0.0, "steps": 0}
+
+    def on_partial(narrative, action_plan):
+        now = time.monotonic()
+        # خطوة جديدة من الخطة تُكتب فوراً، والنص المتزايد كل PARTIAL_INTERVAL على الأكثر
+        if now - written["at"] >= PARTIAL_INTERVAL or len(action_plan) != written["steps"]:
+            written.update(at=now, steps=len(action_plan))
+            progress(0, 0, partial={"narrative": narrative, "action_plan": action_plan})
+
+    result = dm.analysis_result(
+        job["target"], evals, gender, refresh=job["params"].get("refresh", False), on_partial=on_partial
+    )
+    # النص عند الفشل رسالة خطأ: لا يُحفظ فوق التحليل السابق
+    if not result["ok"]:
+        raise JobError(result["narrative"])
+    key = dm.analysis_cache_key(job["target"], evals, gender)
+    dm.save_analysis(job["target"], key, result)
+
+
+def run_pdf(job, progress):
+    """تقرير PDF لتلميذ واحد (بالتحليل المحفوظ إن وجد)؛ النتيجة بايتات الملف"""
+    import pdf_generator
+    inputs = next(dm.iter_report_inputs([job["target"]]), None)
+    if inputs is None:
+        raise JobError("التلميذ غير موجود.")
+    pdf_bytes, error = pdf_generator.create_pdf(*inputs)
+    if not pdf_bytes:
+        raise JobError(error)
+    return pdf_bytes
+
+
+def run_pdf_batch(job, progress):
+    """تقارير مستوى كامل (أو كل التلاميذ) في ملف ZIP أو PDF مدمج داخل params["out_dir"]"""
+    import pdf_generator
+    params = job["params"]
+    names = dm.student_index().names_in(params.get("level"))
+    suffix = "pdf" if params.get("merged") else "zip"
+    os.makedirs(params["out_dir"], exist_ok=True)
+    out_path = os.path.join(params["out_dir"], f"Reports_{job['job_id']}_{time.strftime('%Y%m%d_%H%M%S')}.{suffix}")
+    written, errors = pdf_generator.create_pdf_batch(
+        dm.iter_report_inputs(names), out_path, merged=params.get("merged", False),
+        progress=lambda done, total, name: progress(done, total, name), total=len(names),
+    )
+    if not written:
+        raise JobError("؛ ".join(f"{n}: {e}" for n, e in errors.items()) or "لا يوجد تلاميذ.")
+    return out_path
+
+
+def run_bulk_analysis(job, progress):
+    """التحليل الذكي لكل تلاميذ مستوى (انظر bulk_analysis.analyze_class)"""
+    import bulk_analysis
+    summary = bulk_analysis.analyze_class(
+        class_level=job["params"].get("level"), refresh=job["params"].get("refresh", False),
+        progress=lambda done, total, name, status: progress(done, total, name),
+    )
+    if summary["failed"] and not (summary["ok"] or summary["cached"]):
+        raise JobError(next(iter(summary["errors"].values())))
+    progress(summary["total"], summary["total"],
+             f"{summary['ok']} جديد، {summary['cached']} محفوظ مسبقاً، {summary['failed']} فشل")
+    return None
+
+
+# النوع -> دالة التنفيذ handler(job, progress): تُرجع بايتات (result) أو مساراً (output) أو None.
+# progress(done, total, message) للتقدم، أو progress(0, 0, partial=قيمة) لنتيجة جزئية تعرضها الصفحة.
+HANDLERS = {
+    "analysis": run_analysis,
+    "pdf": run_pdf,
+    "pdf_batch": run_pdf_batch,
+    "bulk_analysis": run_bulk_analysis,
+}
+
+
+# ==========================================
+# 3. طابور المهام
+# ==========================================
+class JobQueue:
+    """
+    طابور مهام دائم (SQLite) مع مجموعة خيوط عاملة داخل العملية.
+    عدة عمليات يمكنها مشاركة نفس الملف: كل مهمة تُحجز داخل معاملة فلا تُنفذ مرتين.
+    """
+
+    def __init__(self, path, workers=JOB_WORKERS, handlers=None):
+        self.path = path
+        self.workers = workers
+        self.handlers = handlers if handlers is not None else HANDLERS
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "partial" not in columns:  # جداول أُنشئت قبل إضافة النتائج الجزئية
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN partial TEXT")
+
+    def close(self):
+        self.stop()
+        self._conn.close()
+
+    # --- الحالة ---
+    @staticmethod
+    def _row(row):
+        if row is None:
+            return None
+        job = dict(zip(COLUMNS, row))
+        job["params"] = json.loads(job["params"])
+        job["partial"] = json.loads(job["partial"]) if job["partial"] else None
+        return job
+
+    def _select(self, where, params=(), limit=None):
+        query = f"SELECT {', '.join(COLUMNS)} FROM jobs {where} ORDER BY job_id DESC"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._row(r) for r in rows]
+
+    def get(self, job_id):
+        rows = self._select("WHERE job_id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def latest(self, kind, target):
+        """آخر مهمة من نوع معين لهدف معين (تلميذ أو مستوى)، أو None"""
+        rows = self._select("WHERE kind = ? AND target = ?", (kind, target), limit=1)
+        return rows[0] if rows else None
+
+    def jobs(self, status=None, limit=50):
+        if status is None:
+            return self._select("", limit=limit)
+        return self._select("WHERE status = ?", (status,), limit=limit)
+
+    def result(self, job_id):
+        """بايتات نتيجة المهمة (مثل ملف PDF) أو None"""
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    # --- الإضافة ---
+    def submit(self, kind, target, params=None):
+        """
+        إضافة مهمة وإرجاع رقمها. إذا كانت نفس المهمة (النوع، الهدف، المعاملات) منتظرة أو جارية
+        يُرجع رقمها بدل تكرارها (نقرتان على نفس الزر أو معلمان لنفس التلميذ).
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        raw = json.dumps(params or {}, ensure_ascii=False, sort_keys=True)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT job_id FROM jobs WHERE kind = ? AND target = ? AND params = ? AND status IN (?, ?)",
+                    (kind, target, raw) + ACTIVE,
+                ).fetchone()
+                if row is None:
+                    row = self._conn.execute(
+                        "INSERT INTO jobs (kind, target, params, status, created_at) VALUES (?, ?, ?, ?, ?)"
+                        " RETURNING job_id",
+                        (kind, target, raw, QUEUED, time.time()),
+                    ).fetchone()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.start()
+        self._wakeup.set()
+        return row[0]
+
+    # --- التنفيذ ---
+    def _claim(self):
+        """حجز أقدم مهمة منتظرة (أو متوقفة لدى عملية أُغلقت) داخل معاملة"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?"
+                " WHERE status = ? AND heartbeat < ? AND attempts >= ?",
+                (FAILED, "توقفت المهمة عدة مرات دون أن تكتمل.", now, RUNNING, now - JOB_STALE_AFTER, JOB_MAX_ATTEMPTS),
+            )
+            row = self._conn.execute(
+                f"UPDATE jobs SET status = ?, started_at = ?, heartbeat = ?, attempts = attempts + 1, error = NULL"
+                f" WHERE job_id = (SELECT job_id FROM jobs WHERE status = ?"
+                f" OR (status = ? AND heartbeat < ? AND attempts < ?) ORDER BY job_id LIMIT 1)"
+                f" RETURNING {', '.join(COLUMNS)}",
+                (RUNNING, now, now, QUEUED, RUNNING, now - JOB_STALE_AFTER, JOB_MAX_ATTEMPTS),
+            ).fetchone()
+        return self._row(row)
+
+    def _progress(self, job_id, done, total, message="", partial=None):
+        with self._lock:
+            if partial is not None:
+                self._conn.execute(
+                    "UPDATE jobs SET partial = ?, heartbeat = ? WHERE job_id = ?",
+                    (json.dumps(partial, ensure_ascii=False), time.time(), job_id),
+                )
+                return
+            self._conn.execute(
+                "UPDATE jobs SET done = ?, total = ?, message = ?, heartbeat = ? WHERE job_id = ?",
+                (done, total, message, time.time(), job_id),
+            )
+
+    def _finish(self, job_id, status, error=None, result=None, output=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, result = ?, output = ?, finished_at = ? WHERE job_id = ?",
+                (status, error, result, output, time.time(), job_id),
+            )
+
+    def _keep_alive(self, job_id, finished):
+        """تحديث نبض المهمة كل JOB_HEARTBEAT_INTERVAL حتى انتهاء المعالج (ولو لم يُبلغ عن أي تقدم)"""
+        while not finished.wait(JOB_HEARTBEAT_INTERVAL):
+            try:
+                with self._lock:
+                    self._conn.execute(
+                        "UPDATE jobs SET heartbeat = ? WHERE job_id = ? AND status = ?", (time.time(), job_id, RUNNING)
+                    )
+            except sqlite3.Error as e:
+                print(f"Job queue error: {e}")
+
+    def run_one(self):
+        """تنفيذ مهمة واحدة إن وجدت (يُرجع False إذا كان الطابور فارغاً)"""
+        job = self._claim()
+        if job is None:
+            return False
+        handler = self.handlers.get(job["kind"])
+        start = time.perf_counter()
+        finished = threading.Event()
+        beat = threading.Thread(target=self._keep_alive, args=(job["job_id"], finished), daemon=True)
+        beat.start()
+        try:
+            if handler is None:
+                raise JobError(f"نوع مهمة غير معروف: {job['kind']}")
+            value = handler(job, lambda done, total, message="", partial=None:
+                            self._progress(job["job_id"], done, total, message, partial))
+        except Exception as e:
+            metrics.count("jobs.failed")
+            self._finish(job["job_id"], FAILED, error=str(e) or type(e).__name__)
+        else:
+            if isinstance(value, (bytes, bytearray)):
+                self._finish(job["job_id"], DONE, result=bytes(value))
+            else:
+                self._finish(job["job_id"], DONE, output=value)
+        finally:
+            finished.set()
+            beat.join()
+        metrics.observe(f"job.{job['kind']}", time.perf_counter() - start)
+        return True
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                if self.run_one():
+                    continue
+            except sqlite3.Error as e:
+                print(f"Job queue error: {e}")
+            self._wakeup.wait(JOB_POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def start(self):
+        """تشغيل الخيوط العاملة (مرة واحدة لكل طابور)"""
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            self._stopping.clear()
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, time.time() - JOB_RETENTION),
+            )
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def wait(self, job_id, timeout=None, interval=0.05):
+        """انتظار انتهاء مهمة (للاختبارات وسطر الأوامر)؛ يُرجع حالتها الأخيرة"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] not in ACTIVE:
+                return job
+            if deadline is not None and time.monotonic() > deadline:
+                return job
+            time.sleep(interval)
+
+
+# ==========================================
+# 4. سجل الطوابير المفتوحة (واحد لكل ملف)
+# ==========================================
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue(path=None):
+    """الطابور المشترك بين كل جلسات العملية (الملف الافتراضي dm.JOBS_FILE)"""
+    key = os.path.abspath(path or dm.JOBS_FILE)
+    with _queues_lock:
+        queue = _queues.get(key)
+        if queue is None:
+            queue = _queues[key] = JobQueue(key)
+        return queue
@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+# ==========================================
+# 1. إعدادات القياس
+# ==========================================
+# القياس معطل افتراضياً: الدوال المُعلَّمة تكتفي بفحص متغير واحد قبل استدعاء الدالة الأصلية
+ENABLED = os.environ.get("STUDENTS_METRICS", "") == "1"
+SAMPLE_SIZE = 512          # آخر القياسات المحفوظة لكل عملية لحساب الوسيط و p95
+PROMETHEUS_PREFIX = "students"
+
+_timings = {}
+_counters = {}
+_lock = threading.Lock()
+
+
+def enable(flag=True):
+    """تفعيل أو تعطيل القياس (لكل العملية، أي كل الجلسات)"""
+    global ENABLED
+    ENABLED = bool(flag)
+
+
+class _Timing:
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+
+def observe(name, seconds):
+    """تسجيل مدة عملية (بالثواني)"""
+    if not ENABLED:
+        return
+    with _lock:
+        timing = _timings.get(name)
+        if timing is None:
+            timing = _timings[name] = _Timing()
+        timing.count += 1
+        timing.total += seconds
+        timing.max = max(timing.max, seconds)
+        timing.samples.append(seconds)
+
+
+def count(name, value=1):
+    """زيادة عداد (عدد مرات الإصابة في الذاكرة، عدد الرموز المستهلكة...)"""
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+# ==========================================
+# 2. أدوات التعليم (Decorator و Context manager)
+# ==========================================
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """قياس مدة كتلة: with metrics.span("pdf.layout"): ..."""
+    return _Span(name) if ENABLED else _NULL_SPAN
+
+
+def timed(name):
+    """قياس مدة كل استدعاء للدالة تحت الاسم name"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# ==========================================
+# 3. القراءة والتصدير
+# ==========================================
+def _quantile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def snapshot():
+    """
+    حالة القياسات الحالية:
+    {"timings": {الاسم: {"count", "total_ms", "mean_ms", "p50_ms", "p95_ms", "max_ms"}}, "counters": {الاسم: القيمة}}
+    """
+    with _lock:
+        timings = {name: (t.count, t.total, t.max, sorted(t.samples)) for name, t in _timings.items()}
+        counters = dict(_counters)
+    return {
+        "timings": {
+            name: {
+                "count": n,
+                "total_ms": total * 1000,
+                "mean_ms": total * 1000 / n,
+                "p50_ms": _quantile(samples, 0.5) * 1000,
+                "p95_ms": _quantile(samples, 0.95) * 1000,
+                "max_ms": peak * 1000,
+            }
+            for name, (n, total, peak, samples) in sorted(timings.items())
+        },
+        "counters": dict(sorted(counters.items())),
+    }
+
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+
+
+def export_jsonl(stats=None):
+    """سطر JSON لكل مقياس (مع الطابع الزمني) للتحليل لاحقاً"""
+    stats = stats or snapshot()
+    now = time.time()
+    lines = [
+        json.dumps({"ts": now, "type": "timing", "name": name, **values}, ensure_ascii=False)
+        for name, values in stats["timings"].items()
+    ]
+    lines += [
+        json.dumps({"ts": now, "type": "counter", "name": name, "value": value}, ensure_ascii=False)
+        for name, value in stats["counters"].items()
+    ]
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def export_prometheus(stats=None):
+    """صيغة Prometheus النصية: ملخص (summary) لكل عملية وعداد لكل counter"""
+    stats = stats or snapshot()
+    timing = f"{PROMETHEUS_PREFIX}_operation_seconds"
+    out = []
+    if stats["timings"]:
+        out += [f"# HELP {timing} Duration of instrumented operations.", f"# TYPE {timing} summary"]
+        for name, values in stats["timings"].items():
+            label = f'op="{name}"'
+            out.append(f'{timing}{{{label},quantile="0.5"}} {values["p50_ms"] / 1000:.6f}')
+            out.append(f'{timing}{{{label},quantile="0.95"}} {values["p95_ms"] / 1000:.6f}')
+            out.append(f"{timing}_sum{{{label}}} {values['total_ms'] / 1000:.6f}")
+            out.append(f"{timing}_count{{{label}}} {values['count']}")
+    for name, value in stats["counters"].items():
+        metric = f"{PROMETHEUS_PREFIX}_{_metric_name(name)}_total"
+        out += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    return "\n".join(out) + "\n" if out else ""
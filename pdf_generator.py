@@ -1,5 +1,197 @@
 from fpdf import FPDF
+from fpdf.fonts import TTFFont, SubsetMap
+from fontTools import ttLib
+import collections
+import copy
+import functools
+import itertools
+import io
 import os
+import re
+import threading
+import zipfile
+import multiprocessing
+import metrics
+
+try:
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+except ImportError:
+    arabic_reshaper = None
+
+# ==========================================
+# ذاكرة الخطوط المشتركة بين التقارير
+# ==========================================
+FONTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'fonts')
+FONT_FAMILY = 'Amiri'
+FONT_FILES = {'': 'Amiri-Regular.ttf', 'B': 'Amiri-Bold.ttf'}
+
+# جداول يحذفها fpdf عند تضمين الخط على أي حال (لا نستعمل text shaping الخاص به)
+EMBED_DROP_TABLES = ["FFTM", "GDEF", "GPOS", "GSUB", "MATH", "hdmx", "meta", "sbix",
+                     "CBDT", "CBLC", "EBDT", "EBLC", "EBSC", "SVG ", "CPAL", "COLR"]
+
+_font_images = {}     # النمط -> بايتات الخط المخفف الجاهز للتضمين
+_font_templates = {}  # النمط -> TTFFont محلل (الخرائط وجدول عرض الحروف)
+_fonts_lock = threading.Lock()
+
+def _slim_font(path):
+    """
+    نسخة من الخط تحتفظ بكل حروف cmap وتحذف جداول التشكيل والحروف التي لا يصل إليها إلا عبرها.
+    يُقتطع منها subset كل تقرير بسرعة لأن عدد الحروف فيها أقل بكثير من الخط الأصلي.
+    """
+    from fontTools import subset as ftsubset
+    font = ttLib.TTFont(path, recalcTimestamp=False, lazy=True)
+    options = ftsubset.Options(notdef_outline=True, recommended_glyphs=True, layout_features=[])
+    options.drop_tables += EMBED_DROP_TABLES
+    subsetter = ftsubset.Subsetter(options)
+    subsetter.populate(unicodes=list(font.getBestCmap()))
+    subsetter.subset(font)
+    output = io.BytesIO()
+    font.save(output)
+    return output.getvalue()
+
+def font_images():
+    """بايتات الخطوط المخففة (تُحسب مرة واحدة لكل عملية)، أو None إذا كانت ملفات الخط غير موجودة"""
+    with _fonts_lock:
+        if not _font_images:
+            paths = {style: os.path.join(FONTS_DIR, f) for style, f in FONT_FILES.items()}
+            if not all(os.path.exists(p) for p in paths.values()):
+                return None
+            for style, path in paths.items():
+                _font_images[style] = _slim_font(path)
+        return dict(_font_images)
+
+def _font_template(style):
+    with _fonts_lock:
+        template = _font_templates.get(style)
+        if template is None:
+            fontkey = f"{FONT_FAMILY.lower()}{style}"
+            template = TTFFont(FPDF(), io.BytesIO(_font_images[style]), fontkey, style)
+            _font_templates[style] = template
+        return template
+
+def _attach_font(pdf, style):
+    """
+    إضافة الخط إلى المستند من القالب المحلل مسبقاً بدلاً من add_font:
+    الخرائط وجدول العرض مشتركة، أما الحالة الخاصة بالمستند (الحروف المستعملة) فجديدة.
+    """
+    template = _font_template(style)
+    font = copy.copy(template)
+    font.i = len(pdf.fonts) + 1
+    # التضمين يقتطع الـ subset داخل ttfont نفسه، لذا لكل مستند نسخة كسولة من البايتات المحفوظة
+    font.ttfont = ttLib.TTFont(io.BytesIO(_font_images[style]), recalcTimestamp=False, lazy=True)
+    font.subset = SubsetMap(font)
+    font.missing_glyphs = []
+    font.biggest_size_pt = 0
+    font._hbfont = None
+    pdf.fonts[font.fontkey] = font
+    return font
+
+# ==========================================
+# تشكيل النص العربي (reshape + bidi) مع ذاكرة مؤقتة
+# ==========================================
+SHAPING_CACHE_SIZE = 4096
+
+_shaped_labels = {}   # تسميات ثابتة (المواد، المهارات، التقديرات) محسوبة مسبقاً ولا تُطرد
+_labels_ready = False
+
+@functools.lru_cache(maxsize=SHAPING_CACHE_SIZE)
+def reshape_text(text):
+    """ربط الحروف العربية فقط (دون ترتيب bidi)، للفقرات التي تُقسم إلى أسطر لاحقاً"""
+    return arabic_reshaper.reshape(text)
+
+@functools.lru_cache(maxsize=SHAPING_CACHE_SIZE)
+def display_line(line):
+    """ترتيب bidi لسطر سبق ربط حروفه"""
+    return get_display(line)
+
+@functools.lru_cache(maxsize=SHAPING_CACHE_SIZE)
+def _shape(text):
+    return display_line(reshape_text(text))
+
+def shape_text(text):
+    """النص جاهزاً للرسم: ربط الحروف ثم ترتيب العرض من اليمين لليسار"""
+    text = str(text)
+    shaped = _shaped_labels.get(text)
+    if shaped is not None:
+        return shaped
+    if arabic_reshaper is None:
+        return text
+    try:
+        return _shape(text)
+    except Exception:
+        return text
+
+def catalog_labels():
+    """كل التسميات الثابتة التي تتكرر في التقارير: المواد والمجالات والمهارات والتقديرات"""
+    import data_manager as dm
+    labels = set(dm.RATING_OPTIONS)
+    for subject, skills in dm.ACADEMIC_SUBJECTS.items():
+        labels.add(subject)
+        labels.update(skills)
+    for category, domains in dm.BEHAVIORAL_SKILLS.items():
+        labels.add(category)
+        for domain, skills in domains.items():
+            labels.add(domain)
+            labels.update(skills)
+    return labels
+
+def shaped_labels():
+    """الأشكال المحسوبة مسبقاً للتسميات الثابتة (تُحسب مرة واحدة لكل عملية)"""
+    global _labels_ready
+    if not _labels_ready and arabic_reshaper is not None:
+        try:
+            labels = catalog_labels()
+        except ImportError:
+            labels = ()
+        _shaped_labels.update((label, _shape(label)) for label in labels)
+        _labels_ready = True
+    return dict(_shaped_labels)
+
+# ==========================================
+# تقسيم الفقرات إلى أسطر
+# ==========================================
+def break_lines(widths, space, max_width, optimal=False):
+    """
+    تقسيم كلمات فقرة إلى أسطر لا يتجاوز عرضها max_width.
+    widths: عرض كل كلمة (مقاس مسبقاً)، space: عرض المسافة بين كلمتين.
+    يُرجع قائمة (بداية، نهاية) لكل سطر. الكلمة الأطول من السطر تُوضع وحدها.
+    optimal=False: تعبئة كل سطر قدر الإمكان.
+    optimal=True: توزيع متوازن على طريقة Knuth-Plass يقلل مجموع مربعات الفراغ
+    في الأسطر (عدا الأخير)؛ المرشحون لبداية كل سطر محدودون بعرضه فيبقى الزمن خطياً.
+    """
+    n = len(widths)
+    if not optimal:
+        lines = []
+        start, line_w = 0, 0.0
+        for i, word_w in enumerate(widths):
+            if i > start and line_w + space + word_w > max_width:
+                lines.append((start, i))
+                start, line_w = i, word_w
+            else:
+                line_w = word_w if i == start else line_w + space + word_w
+        if start < n:
+            lines.append((start, n))
+        return lines
+
+    cost = [0.0] + [float("inf")] * n
+    best = [0] * (n + 1)
+    for end in range(1, n + 1):
+        line_w = -space
+        for start in range(end - 1, -1, -1):
+            line_w += widths[start] + space
+            if line_w > max_width and start < end - 1:
+                break
+            slack = 0.0 if end == n else max(max_width - line_w, 0.0) ** 2
+            if cost[start] + slack < cost[end]:
+                cost[end] = cost[start] + slack
+                best[end] = start
+    lines = []
+    end = n
+    while end > 0:
+        lines.append((best[end], end))
+        end = best[end]
+    return lines[::-1]
 
 class PDFReport(FPDF):
     def __init__(self, student_name, student_info):
@@ -8,72 +200,89 @@ class PDFReport(FPDF):
         self.student_info = student_info
         self.custom_font_loaded = False
         self.font_family = 'Helvetica'
+        self._layouts = {}
+        shaped_labels()
         
-        # إعداد الخطوط
-        base_path = os.path.dirname(os.path.abspath(__file__))
-        self.path_reg = os.path.join(base_path, 'assets', 'fonts', 'Amiri-Regular.ttf')
-        self.path_bold = os.path.join(base_path, 'assets', 'fonts', 'Amiri-Bold.ttf')
-        
-        if os.path.exists(self.path_reg) and os.path.exists(self.path_bold):
-             try:
-                self.add_font('Amiri', '', self.path_reg)
-                self.add_font('Amiri', 'B', self.path_bold)
-                self.font_family = 'Amiri'
+        # إعداد الخطوط (تُحلل مرة واحدة لكل عملية وتُشارك بين التقارير)
+        try:
+            if font_images():
+                self._load_fonts()
+                self.font_family = FONT_FAMILY
                 self.custom_font_loaded = True
-             except: pass
+        except Exception as e:
+            print(f"Error loading PDF fonts: {e}")
+
+    def _load_fonts(self):
+        """
+        الخطوط من القوالب المشتركة (_attach_font)، وإذا تعذر ذلك (تغير داخلي في fpdf2)
+        فعبر add_font العادية: أبطأ لكنها تبقي النص العربي مقروءاً.
+        """
+        try:
+            fonts = [_attach_font(self, style) for style in FONT_FILES]
+        except Exception as e:
+            print(f"Error sharing PDF fonts, falling back to add_font: {e}")
+            for style in FONT_FILES:
+                self.fonts.pop(f"{FONT_FAMILY.lower()}{style}", None)
+                self.add_font(FONT_FAMILY, style, os.path.join(FONTS_DIR, FONT_FILES[style]))
+            fonts = [self.fonts[f"{FONT_FAMILY.lower()}{style}"] for style in FONT_FILES]
+        self._char_widths = {font.fontkey: (font.cw, font.desc.missing_width) for font in fonts}
+
+    def text_width(self, text):
+        """عرض النص بوحدة الصفحة من جدول عرض الحروف المحسوب مسبقاً (بديل سريع لـ get_string_width)"""
+        if not self.custom_font_loaded:
+            return self.get_string_width(text)
+        widths, missing = self._char_widths[self.current_font.fontkey]
+        return sum(widths.get(ord(c), missing) for c in text) * self.font_size_pt * 0.001 / self.k
 
     def process_text(self, text):
         if not self.custom_font_loaded: return str(text)
-        try:
-            import arabic_reshaper
-            from bidi.algorithm import get_display
-            return get_display(arabic_reshaper.reshape(str(text)))
-        except: return str(text)
+        return shape_text(text)
 
     # --- دالة جديدة مخصصة لطباعة الفقرات العربية الطويلة بترتيب صحيح ---
-    def arabic_multi_cell(self, w, h, text, align='R'):
-        if not self.custom_font_loaded:
+    def layout_arabic(self, w, text, optimal=False):
+        """
+        تقسيم النص العربي إلى أسطر جاهزة للرسم بعرض w (None = سطر فارغ بين فقرتين).
+        كل كلمة تُقاس مرة واحدة، فعدد الأسطر (ومن ثم ارتفاع النص) معروف قبل الرسم.
+        """
+        key = (w, str(text), optimal, self.current_font.fontkey, self.font_size_pt)
+        lines = self._layouts.get(key)
+        if lines is not None:
+            return lines
+        lines = self._layouts[key] = []
+        space = self.text_width(" ")
+        measured = {}
+        for paragraph in reshape_text(str(text)).split('\n'):
+            if not paragraph.strip():
+                lines.append(None)
+                continue
+            words = [word for word in paragraph.split(' ') if word]
+            widths = []
+            for word in words:
+                width = measured.get(word)
+                if width is None:
+                    width = measured[word] = self.text_width(word)
+                widths.append(width)
+            # هامش بسيط 5 ملم كما في السابق
+            for start, end in break_lines(widths, space, w - 5, optimal):
+                lines.append(display_line(" ".join(words[start:end])))
+        return lines
+
+    def arabic_text_height(self, w, h, text, optimal=False):
+        """ارتفاع النص كما سترسمه arabic_multi_cell (بالخط الحالي)"""
+        if not self.custom_font_loaded or arabic_reshaper is None:
+            return len(self.multi_cell(w, h, str(text), 0, 'R', dry_run=True, output="LINES")) * h
+        return len(self.layout_arabic(w, text, optimal)) * h
+
+    def arabic_multi_cell(self, w, h, text, align='R', optimal=False):
+        if not self.custom_font_loaded or arabic_reshaper is None:
             self.multi_cell(w, h, str(text), 0, align)
             return
-            
-        try:
-            import arabic_reshaper
-            from bidi.algorithm import get_display
-            
-            # 1. التشكيل وربط الحروف
-            reshaped_text = arabic_reshaper.reshape(str(text))
-            
-            # 2. تقسيم النص إلى فقرات
-            paragraphs = reshaped_text.split('\n')
-            
-            for paragraph in paragraphs:
-                if not paragraph.strip():
-                    self.ln(h)
-                    continue
-                    
-                words = paragraph.split(' ')
-                line = ""
-                
-                for word in words:
-                    # اختبار عرض السطر إذا أضفنا الكلمة الجديدة
-                    test_line = line + " " + word if line else word
-                    
-                    # إذا تجاوز السطر العرض المسموح (مع ترك هامش بسيط 5 ملم)
-                    if self.get_string_width(test_line) > (w - 5): 
-                        # طباعة السطر الحالي بعد عكسه بـ bidi
-                        if line:
-                            self.cell(w, h, get_display(line), 0, 1, align)
-                        # البدء بسطر جديد
-                        line = word
-                    else:
-                        line = test_line
-                        
-                # طباعة ما تبقى من السطر الأخير في الفقرة
-                if line:
-                    self.cell(w, h, get_display(line), 0, 1, align)
-                    
-        except ImportError:
-            self.multi_cell(w, h, str(text), 0, align)
+
+        for line in self.layout_arabic(w, text, optimal):
+            if line is None:
+                self.ln(h)
+            else:
+                self.cell(w, h, line, 0, 1, align)
 
     # --- 5. ترويسة التقرير (Header) ---
     def header(self):
@@ -104,6 +313,7 @@ class PDFReport(FPDF):
         self.set_font(self.font_family, '', 8)
         self.cell(0, 10, self.process_text(f'صفحة {self.page_no()}'), 0, 0, 'C')
 
+    @metrics.timed("pdf.draw_signatures_fixed")
     def draw_signatures_fixed(self):
         """رسم التوقيعات في أسفل الصفحة الثانية دائماً"""
         self.set_y(-50) 
@@ -132,6 +342,7 @@ class PDFReport(FPDF):
         self.set_draw_color(0) # Reset
 
     # --- تفاصيل الطالب ---
+    @metrics.timed("pdf.draw_student_details")
     def draw_student_details(self):
         start_y = self.get_y()
         self.set_fill_color(250, 250, 252)
@@ -184,6 +395,7 @@ class PDFReport(FPDF):
         self.set_draw_color(0)
         self.set_fill_color(0)
 
+    @metrics.timed("pdf.draw_legend")
     def draw_legend(self):
         self.set_y(self.get_y() + 2)
         page_w = 190; box_w = 60
@@ -201,6 +413,7 @@ class PDFReport(FPDF):
         item(margin, "غير مكتسب", 0)
         self.ln(10)
 
+    @metrics.timed("pdf.draw_columnar_table")
     def draw_columnar_table(self, title, data_groups, columns_count):
         if not data_groups: return
         self.set_font(self.font_family, 'B', 11)
@@ -255,6 +468,7 @@ class PDFReport(FPDF):
             self.set_y(max_y + 5)
 
     # --- 4. صندوق التحليل (الملاحظات الختامية) ---
+    @metrics.timed("pdf.draw_analysis_section")
     def draw_analysis_section(self, narrative):
         self.add_page()
         
@@ -266,9 +480,12 @@ class PDFReport(FPDF):
         self.set_draw_color(100, 100, 150) 
         self.set_line_width(0.3)
         
-        # رسم خلفية الصندوق
+        # ارتفاع الصندوق محسوب مسبقاً من عدد أسطر التحليل (يُقص عند نهاية الصفحة)
         box_top = self.get_y()
-        self.rect(10, box_top, 190, 100, 'DF') 
+        self.set_font(self.font_family, '', 11)
+        height = 15 + self.arabic_text_height(180, 7, narrative, optimal=True) + 5
+        height = min(height, self.h - self.b_margin - box_top)
+        self.rect(10, box_top, 190, height, 'DF')
         
         self.set_xy(15, box_top + 5)
         self.set_font(self.font_family, 'B', 12)
@@ -279,16 +496,11 @@ class PDFReport(FPDF):
         self.set_xy(15, box_top + 15)
         self.set_font(self.font_family, '', 11)
         self.set_text_color(0)
-        self.arabic_multi_cell(180, 7, narrative, 'R')
-        
-        # إعادة رسم الإطار ليتناسب مع طول النص الفعلي
-        final_y = self.get_y() + 5
-        height = final_y - box_top
-        self.set_xy(10, box_top)
-        self.rect(10, box_top, 190, height, 'D')
+        self.arabic_multi_cell(180, 7, narrative, 'R', optimal=True)
         
-        self.set_y(final_y + 10)
+        self.set_y(self.get_y() + 15)
 
+    @metrics.timed("pdf.generate")
     def generate(self, evaluation_data, narrative, action_plan):
         self.add_page()
         self.draw_student_details()
@@ -310,7 +522,8 @@ class PDFReport(FPDF):
         self.draw_analysis_section(narrative)
         self.draw_signatures_fixed()
 
-        return bytes(self.output())
+        with metrics.span("pdf.output"):
+            return bytes(self.output())
 
 def create_pdf(student_name, student_info, data, narrative, action_plan):
     try:
@@ -319,3 +532,175 @@ def create_pdf(student_name, student_info, data, narrative, action_plan):
     except Exception as e:
         return None, str(e)
 
+
+# ==========================================
+# التوليد الجماعي (قسم كامل) عبر مجموعة عمليات
+# ==========================================
+def _init_worker(images, labels):
+    global _labels_ready
+    if images:
+        with _fonts_lock:
+            _font_images.update(images)
+    _shaped_labels.update(labels)
+    _labels_ready = True
+
+def _render_job(job):
+    """دالة العامل: توليد تقرير تلميذ واحد في عملية مستقلة"""
+    name, info, evals, narrative, action_plan = job
+    pdf_bytes, error = create_pdf(name, info, evals, narrative, action_plan)
+    return name, pdf_bytes, error
+
+UNSAFE_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|]+')
+
+def report_filename(name, ext="pdf"):
+    """اسم ملف آمن لتقرير التلميذ داخل الأرشيف أو المجلد"""
+    return f"Report_{UNSAFE_FILENAME_CHARS.sub('_', name)}.{ext}"
+
+# الخادم (Streamlit) متعدد الخيوط: fork من خيط عامل قد يرث أقفالاً محجوزة فيتجمد العامل،
+# لذا تُنشأ العمليات بطريقة forkserver (أو spawn حيث لا تتوفر)
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def _render_in_order(pool, jobs, window):
+    """نتائج _render_job بترتيب jobs مع إبقاء window مهمة على الأكثر قيد التنفيذ (لا تُقرأ كل المدخلات مسبقاً)"""
+    pending = collections.deque()
+    for job in jobs:
+        pending.append(pool.apply_async(_render_job, (job,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+class _MergedPdfWriter:
+    """
+    دمج ملفات PDF في ملف واحد بالكتابة المباشرة على القرص: كائنات كل تقرير تُعاد ترقيمها
+    وتُكتب فور وصوله، ولا يبقى في الذاكرة إلا مواقعها (لجدول xref) وأرقام صفحاتها.
+    """
+    PAGES_ID, CATALOG_ID = 1, 2
+
+    def __init__(self, f):
+        self.f = f
+        self.offsets = {}
+        self.kids = []
+        self.next_id = 3
+        f.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def _ref(self, idnum):
+        from pypdf.generic import IndirectObject
+        return IndirectObject(idnum, 0, None)
+
+    def _write(self, idnum, obj):
+        self.offsets[idnum] = self.f.tell()
+        self.f.write(f"{idnum} 0 obj\n".encode("ascii"))
+        obj.write_to_stream(self.f)
+        self.f.write(b"\nendobj\n")
+
+    def append(self, pdf_bytes):
+        from pypdf import PdfReader
+        from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject
+        mapping = {}
+        todo = []
+
+        def ref(indirect, obj=None):
+            key = (indirect.idnum, indirect.generation)
+            if key not in mapping:
+                mapping[key] = self.next_id
+                self.next_id += 1
+                todo.append((mapping[key], obj if obj is not None else indirect))
+            return self._ref(mapping[key])
+
+        def remap(obj):
+            items = obj.items() if isinstance(obj, DictionaryObject) else enumerate(obj)
+            for k, v in list(items):
+                if isinstance(v, IndirectObject):
+                    if v.pdf is not None:  # مراجع الملف المدمج (pdf=None) جاهزة
+                        obj[k] = ref(v)
+                elif isinstance(v, (DictionaryObject, ArrayObject)):
+                    remap(v)
+
+        for page in PdfReader(io.BytesIO(pdf_bytes)).pages:
+            # شجرة الصفحات الأصلية لا تُنسخ: كل صفحة تتبع شجرة الملف المدمج
+            page[NameObject("/Parent")] = self._ref(self.PAGES_ID)
+            self.kids.append(ref(page.indirect_reference, page))
+        while todo:
+            idnum, obj = todo.pop()
+            obj = obj.get_object()
+            if isinstance(obj, (DictionaryObject, ArrayObject)):
+                remap(obj)
+            self._write(idnum, obj)
+
+    def close(self):
+        from pypdf.generic import ArrayObject, DictionaryObject, NameObject, NumberObject
+        self._write(self.PAGES_ID, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(self.kids),
+            NameObject("/Count"): NumberObject(len(self.kids)),
+        }))
+        self._write(self.CATALOG_ID, DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): self._ref(self.PAGES_ID),
+        }))
+        xref = self.f.tell()
+        lines = [f"xref\n0 {self.next_id}\n", "0000000000 65535 f \n"]
+        lines += [f"{self.offsets[i]:010d} 00000 n \n" for i in range(1, self.next_id)]
+        lines.append(f"trailer\n<< /Size {self.next_id} /Root {self.CATALOG_ID} 0 R >>\nstartxref\n{xref}\n%%EOF\n")
+        self.f.write("".join(lines).encode("ascii"))
+
+def create_pdf_batch(jobs, output_path, merged=False, workers=None, progress=None, total=None):
+    """
+    توليد تقارير عدة تلاميذ بالتوازي وكتابتها مباشرة على القرص.
+    jobs: قائمة أو مولّد (الاسم، البيانات، التقييمات، التحليل، الخطة) بنفس معاملات create_pdf،
+    يُقرأ تدريجياً مع التوليد. total: عدد التقارير المتوقع لـ progress إذا كان jobs مولّداً.
+    merged=False: أرشيف ZIP بملف PDF لكل تلميذ؛ merged=True: ملف PDF واحد جاهز للطباعة.
+    إذا كان output_path مجلداً موجوداً يُكتب فيه ملف PDF مستقل لكل تلميذ.
+    progress(done, total, name) تُستدعى بعد كل تقرير.
+    يُرجع (عدد التقارير المكتوبة، قاموس الأخطاء {الاسم: الخطأ}).
+    """
+    if total is None and hasattr(jobs, "__len__"):
+        total = len(jobs)
+    jobs = iter(jobs)
+    first = next(jobs, None)
+    if first is None:
+        return 0, {}
+    jobs = itertools.chain([first], jobs)
+    errors = {}
+    written = 0
+    workers = min(workers or os.cpu_count() or 1, total or os.cpu_count() or 1)
+
+    def record(done, name, pdf_bytes, error, write):
+        nonlocal written
+        if pdf_bytes:
+            write(name, pdf_bytes)
+            written += 1
+        else:
+            errors[name] = error
+        if progress:
+            progress(done, max(total or 0, done), name)
+
+    # الخطوط والتسميات الثابتة تُحضَّر مرة واحدة هنا وتُمرر للعمال بدل أن يحسبها كل عامل من جديد
+    context = multiprocessing.get_context(POOL_START_METHOD)
+    pool = context.Pool(processes=workers, initializer=_init_worker, initargs=(font_images(), shaped_labels()))
+    try:
+        # الترتيب محفوظ، وكل تقرير يُكتب فور وصوله دون تجميع التقارير في الذاكرة
+        results = _render_in_order(pool, jobs, workers * 2)
+        if merged:
+            with open(output_path, "wb") as f:
+                merger = _MergedPdfWriter(f)
+                for done, (name, pdf_bytes, error) in enumerate(results, 1):
+                    record(done, name, pdf_bytes, error, lambda _, data: merger.append(data))
+                merger.close()
+        elif os.path.isdir(output_path):
+            def write_file(name, data):
+                with open(os.path.join(output_path, report_filename(name)), "wb") as f:
+                    f.write(data)
+            for done, (name, pdf_bytes, error) in enumerate(results, 1):
+                record(done, name, pdf_bytes, error, write_file)
+        else:
+            with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                for done, (name, pdf_bytes, error) in enumerate(results, 1):
+                    record(done, name, pdf_bytes, error,
+                           lambda name, data: archive.writestr(report_filename(name), data))
+    finally:
+        pool.close()
+        pool.join()
+
+    return written, errors
@@ -0,0 +1,361 @@
+import codecs
+import csv
+import os
+import re
+import unicodedata
+from datetime import date, datetime, timedelta
+from html.parser import HTMLParser
+
+import data_manager as dm
+
+# ==========================================
+# 1. إعدادات الاستيراد
+# ==========================================
+IMPORT_CHUNK_ROWS = 500        # عدد الصفوف المعالجة في كل دفعة
+READ_BLOCK_SIZE = 64 * 1024    # حجم كتلة القراءة لملفات CSV و HTML
+
+# عناوين الأعمدة المعروفة في تصديرات المنصة الرقمية وجداول المدارس
+HEADER_ALIASES = {
+    "name": ["الاسم واللقب", "اللقب والاسم", "الاسم الكامل", "الاسم الثلاثي", "name", "full name", "nom et prenom", "nom prenom"],
+    "surname": ["اللقب", "nom", "surname", "last name"],
+    "first_name": ["الاسم", "prenom", "first name"],
+    "id": ["رقم التعريف", "رقم التلميذ", "الرقم التعريفي", "المعرف", "id", "matricule", "identifiant"],
+    "dob": ["تاريخ الميلاد", "تاريخ الازدياد", "dob", "date de naissance", "birth date", "date of birth"],
+    "gender": ["الجنس", "sexe", "gender", "sex"],
+    "class_level": ["المستوى", "القسم", "الفوج", "class", "classe", "niveau", "class level"],
+}
+
+GENDER_VALUES = {
+    "ذكر": "ذكر", "ذ": "ذكر", "m": "ذكر", "male": "ذكر", "masculin": "ذكر", "garcon": "ذكر", "h": "ذكر",
+    "أنثى": "أنثى", "انثى": "أنثى", "أ": "أنثى", "ا": "أنثى", "f": "أنثى", "female": "أنثى",
+    "feminin": "أنثى", "fille": "أنثى",
+}
+
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%d.%m.%Y", "%d/%m/%y"]
+EXCEL_EPOCH = date(1899, 12, 30)
+
+_SPACES = re.compile(r"\s+")
+
+
+def _fold(text):
+    """توحيد النص للمقارنة: حذف التشكيل والتطويل ونقاط النهاية والمسافات الزائدة"""
+    text = unicodedata.normalize("NFKD", str(text)).replace("ـ", "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _SPACES.sub(" ", text).strip(" :").lower()
+
+
+_HEADER_LOOKUP = {_fold(alias): field for field, aliases in HEADER_ALIASES.items() for alias in aliases}
+_GENDER_LOOKUP = {_fold(k): v for k, v in GENDER_VALUES.items()}
+
+
+# ==========================================
+# 2. قراءة الصفوف من كل صيغة (بشكل متدفق)
+# ==========================================
+class _TableParser(HTMLParser):
+    """محلل تدريجي لجداول HTML (صيغة "صفحة ويب" التي تصدّر بها المنصات ملفات xls)"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self.sources = []
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            self._cell = []
+        elif tag == "br" and self._cell is not None:
+            self._cell.append(" ")
+        elif tag == "x:worksheetsource":
+            self.sources.extend(value for key, value in attrs if key == "href" and value)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th") and self._cell is not None:
+            self._row.append("".join(self._cell).replace("\xa0", " ").strip())
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def _open_binary(source):
+    if hasattr(source, "read"):
+        source.seek(0)
+        return source, False
+    return open(source, "rb"), True
+
+
+def _text_blocks(source):
+    """قراءة ملف نصي على كتل مع اكتشاف الترميز (UTF-8 أو Windows-1256)"""
+    stream, owned = _open_binary(source)
+    try:
+        first = stream.read(READ_BLOCK_SIZE)
+        encoding = "utf-8-sig"
+        try:
+            codecs.getincrementaldecoder("utf-8-sig")().decode(first)
+        except UnicodeDecodeError:
+            encoding = "cp1256"
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        block = first
+        while block:
+            yield decoder.decode(block)
+            block = stream.read(READ_BLOCK_SIZE)
+        yield decoder.decode(b"", final=True)
+    finally:
+        if owned:
+            stream.close()
+
+
+def _html_rows(source):
+    parser = _TableParser()
+    for text in _text_blocks(source):
+        parser.feed(text)
+        yield from parser.rows
+        parser.rows.clear()
+    parser.close()
+    yield from parser.rows
+
+    # ملف الإطارات (Eleve.xls) يشير إلى ورقة العمل في مجلد مرافق
+    if parser.sources and not isinstance(source, (str, os.PathLike)):
+        raise ValueError("هذا الملف يشير إلى ورقة عمل خارجية؛ يرجى رفع ملف الورقة نفسه (sheet001.htm).")
+    for href in parser.sources:
+        path = os.path.join(os.path.dirname(os.path.abspath(source)), href.replace("\\", "/"))
+        if not os.path.exists(path):
+            raise ValueError(f"ورقة العمل غير موجودة: {href}")
+        yield from _html_rows(path)
+
+
+class _Lines:
+    """تحويل كتل النص إلى أسطر لقارئ csv دون تحميل الملف كاملاً"""
+
+    def __init__(self, blocks):
+        self._blocks = blocks
+        self._buffer = ""
+
+    def __iter__(self):
+        for block in self._blocks:
+            self._buffer += block
+            *lines, self._buffer = self._buffer.split("\n")
+            for line in lines:
+                yield line + "\n"
+        if self._buffer:
+            yield self._buffer
+
+
+def _csv_rows(source):
+    lines = iter(_Lines(_text_blocks(source)))
+    head = []
+    for line in lines:
+        head.append(line)
+        if len(head) >= 5:
+            break
+    # الفاصل الأكثر تكراراً في أول الأسطر (تصديرات Excel بالعربية والفرنسية تستعمل ";")
+    sample = "".join(head)
+    delimiter = max(",;\t", key=sample.count)
+
+    def all_lines():
+        yield from head
+        yield from lines
+
+    yield from csv.reader(all_lines(), delimiter=delimiter)
+
+
+def _xlsx_rows(source):
+    import openpyxl
+    if hasattr(source, "read"):
+        source.seek(0)
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def _xls_rows(source):
+    import xlrd
+    if hasattr(source, "read"):
+        source.seek(0)
+        book = xlrd.open_workbook(file_contents=source.read(), on_demand=True)
+    else:
+        book = xlrd.open_workbook(source, on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        for i in range(sheet.nrows):
+            yield sheet.row_values(i)
+    finally:
+        book.release_resources()
+
+
+def iter_rows(source):
+    """
+    صفوف أول ورقة في الملف (مسار أو ملف ثنائي مفتوح) كقوائم خلايا.
+    الصيغة تُكتشف من محتوى الملف: XLSX، XLS (BIFF)، جدول HTML (تصدير "xls" الشائع)، أو CSV.
+    """
+    stream, owned = _open_binary(source)
+    try:
+        magic = stream.read(512)
+    finally:
+        if owned:
+            stream.close()
+    if magic.startswith(b"PK"):
+        return _xlsx_rows(source)
+    if magic.startswith(b"\xd0\xcf\x11\xe0"):
+        return _xls_rows(source)
+    if magic.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<"):
+        return _html_rows(source)
+    return _csv_rows(source)
+
+
+# ==========================================
+# 3. توحيد الحقول
+# ==========================================
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return _SPACES.sub(" ", str(value)).strip()
+
+
+def normalize_dob(value):
+    """تاريخ الميلاد بصيغة YYYY-MM-DD (يقبل صيغ التاريخ الشائعة وأرقام تواريخ Excel)"""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (int, float)) and 1 < value < 100000:
+        return (EXCEL_EPOCH + timedelta(days=int(value))).isoformat()
+    text = _text(value).split(" ")[0]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return text
+
+
+def normalize_gender(value):
+    return _GENDER_LOOKUP.get(_fold(_text(value)), "")
+
+
+def _header_map(row):
+    """مواضع الأعمدة المعروفة في صف العناوين، أو None إن لم يكن صف عناوين"""
+    columns = {}
+    for i, cell in enumerate(row):
+        field = _HEADER_LOOKUP.get(_fold(_text(cell)))
+        if field and field not in columns:
+            columns[field] = i
+    has_name = "name" in columns or "surname" in columns or "first_name" in columns
+    return columns if has_name and len(columns) >= 2 else None
+
+
+def iter_records(rows):
+    """
+    تحويل الصفوف إلى (رقم الصف، الاسم، info) بعد إيجاد صف العناوين وتوحيد الحقول.
+    الصفوف التي تسبق العناوين (اسم المؤسسة، العنوان...) تُتجاهل.
+    """
+    columns = None
+    for line_no, row in enumerate(rows, 1):
+        if columns is None:
+            columns = _header_map(row)
+            continue
+
+        def cell(field):
+            i = columns.get(field)
+            return row[i] if i is not None and i < len(row) else None
+
+        name = _text(cell("name"))
+        if not name:
+            name = " ".join(p for p in (_text(cell("first_name")), _text(cell("surname"))) if p)
+        info = {}
+        if "id" in columns:
+            info["id"] = _text(cell("id"))
+        if "dob" in columns:
+            info["dob"] = normalize_dob(cell("dob"))
+        if "gender" in columns:
+            info["gender"] = normalize_gender(cell("gender"))
+        if "class_level" in columns:
+            info["class_level"] = _text(cell("class_level"))
+        if not name and not any(info.values()):
+            continue  # صف فارغ
+        yield line_no, name, {k: v for k, v in info.items() if v}
+    if columns is None:
+        raise ValueError("لم يتم العثور على صف العناوين (الاسم، تاريخ الميلاد، الجنس، القسم...).")
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ==========================================
+# 4. الاستيراد الجماعي
+# ==========================================
+def import_roster(source, update_existing=False, default_level="", chunk_rows=IMPORT_CHUNK_ROWS, progress=None):
+    """
+    استيراد قائمة تلاميذ من ملف XLS/XLSX/CSV/HTML مع حذف المكرر وحفظ الكل في كتابة واحدة.
+    التلميذ الموجود (بنفس رقم التعريف أو نفس الاسم) يُتجاهل، أو تُحدَّث بياناته إذا update_existing.
+    progress(rows) تُستدعى بعد كل دفعة من الصفوف.
+    يُرجع ملخصاً: {"rows", "added", "updated", "duplicates", "errors"}.
+    """
+    existing = dm.student_infos()
+    by_id = {info["id"]: name for name, info in existing.items() if info.get("id")}
+    summary = {"rows": 0, "added": 0, "updated": 0, "duplicates": 0, "errors": []}
+    added, updated = {}, {}
+
+    for chunk in _chunks(iter_records(iter_rows(source)), chunk_rows):
+        for line_no, name, info in chunk:
+            summary["rows"] += 1
+            if not name:
+                summary["errors"].append(f"الصف {line_no}: الاسم غير موجود")
+                continue
+            if default_level and not info.get("class_level"):
+                info["class_level"] = default_level
+            match = by_id.get(info.get("id")) or (name if name in existing or name in added else None)
+            if match is None:
+                added[name] = info
+                if info.get("id"):
+                    by_id[info["id"]] = name
+            elif update_existing and match in existing:
+                updated.setdefault(match, {}).update(info)
+            else:
+                summary["duplicates"] += 1
+        if progress:
+            progress(summary["rows"])
+
+    def insert(info):
+        # تلميذ أُضيف من جلسة أخرى أثناء الاستيراد لا يُستبدل
+        return lambda record: record if record is not None else {"info": info, "evaluations": {}}
+
+    def merge(info):
+        def apply(record):
+            if record is None:
+                return None
+            record.setdefault("info", {}).update(info)
+            return record
+        return apply
+
+    updates = {name: insert(info) for name, info in added.items()}
+    updates.update((name, merge(info)) for name, info in updated.items())
+    if updates and dm.update_students(updates) is None:
+        summary["errors"].append("تعذر حفظ البيانات")
+        return summary
+    summary["added"] = len(added)
+    summary["updated"] = len(updated)
+    return summary
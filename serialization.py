@@ -0,0 +1,121 @@
+import json
+import mmap
+
+# مكتبات اختيارية أسرع: تُستعمل إذا كانت مثبتة، وإلا تكفي json القياسية
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# ==========================================
+# 1. صيغ ملف اللقطة
+# ==========================================
+# الصيغة تُكتشف من بداية الملف عند القراءة، فيمكن تغيير الصيغة المختارة في أي وقت:
+# الملف القديم يُقرأ كما هو ويُحوَّل إلى الصيغة الجديدة عند أول كتابة للقطة.
+DEFAULT_FORMAT = "json"
+MSGPACK_MAGIC = b"\x00STUDENTS-MSGPACK\x01\n"   # لا يمكن أن يبدأ به ملف JSON
+MMAP_MIN_BYTES = 1 << 20    # الملفات الأكبر من هذا تُقرأ عبر mmap بدل نسخها كاملة في الذاكرة
+
+
+def dumps_json(obj):
+    """JSON مضغوط (بدون مسافات، النص العربي كما هو) كبايتات UTF-8"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads_json(data):
+    """فك JSON من بايتات أو نص أو memoryview (يرفع ValueError عند التلف)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+class JSONCodec:
+    """JSON مضغوط (orjson إن وجدت): الصيغة الافتراضية، مقروءة ومتوافقة مع الإصدارات السابقة"""
+    name = "json"
+    binary = False      # البايتات (مثل مصفوفة الدرجات) تُكتب بترميز base64
+
+    def matches(self, head):
+        return not head.startswith(MSGPACK_MAGIC)
+
+    def dumps(self, obj):
+        return dumps_json(obj)
+
+    def loads(self, data):
+        return loads_json(data)
+
+
+class MsgpackCodec:
+    """MessagePack ثنائي: أصغر وأسرع، والبايتات تُحفظ كما هي دون base64"""
+    name = "msgpack"
+    binary = True
+
+    def matches(self, head):
+        return head.startswith(MSGPACK_MAGIC)
+
+    def dumps(self, obj):
+        return MSGPACK_MAGIC + msgpack.packb(obj, use_bin_type=True)
+
+    def loads(self, data):
+        if msgpack is None:
+            raise ValueError("ملف اللقطة بصيغة msgpack والمكتبة غير مثبتة: pip install msgpack")
+        try:
+            return msgpack.unpackb(memoryview(data)[len(MSGPACK_MAGIC):], raw=False)
+        except Exception as e:  # أخطاء msgpack لا ترث كلها من ValueError
+            raise ValueError(f"ملف msgpack تالف: {e}") from e
+
+
+CODECS = {"json": JSONCodec(), "msgpack": MsgpackCodec()}
+_warned = set()
+
+
+def get_codec(name=None):
+    """صيغة الكتابة المطلوبة؛ msgpack بدون المكتبة تعود إلى JSON مع تنبيه مرة واحدة"""
+    name = name or DEFAULT_FORMAT
+    if name not in CODECS:
+        raise ValueError(f"صيغة غير معروفة: {name} (المتاح: {', '.join(CODECS)})")
+    if name == "msgpack" and msgpack is None:
+        if name not in _warned:
+            _warned.add(name)
+            print("تنبيه: مكتبة msgpack غير مثبتة، ستُحفظ البيانات بصيغة JSON.")
+        return CODECS[DEFAULT_FORMAT]
+    return CODECS[name]
+
+
+def detect(head):
+    """الصيغة المناسبة لمحتوى يبدأ بالبايتات head"""
+    for codec in CODECS.values():
+        if codec.name != "json" and codec.matches(head):
+            return codec
+    return CODECS["json"]
+
+
+# ==========================================
+# 2. قراءة وكتابة الملفات
+# ==========================================
+def load_file(path):
+    """(المحتوى، الصيغة) لملف بأي صيغة معروفة؛ الملفات الكبيرة تُقرأ عبر mmap"""
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+        f.seek(0)
+        if size < MMAP_MIN_BYTES:
+            data = f.read()
+            codec = detect(data[:len(MSGPACK_MAGIC)])
+            return codec.loads(data), codec
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            codec = detect(mm[:len(MSGPACK_MAGIC)])
+            with memoryview(mm) as view:
+                return codec.loads(view), codec
+
+
+def export_pretty(f, data):
+    """JSON منسق للقراءة البشرية (للتصدير فقط، لا يُستعمل كصيغة تخزين)"""
+    json.dump(data, f, ensure_ascii=False, indent=4)
@@ -0,0 +1,250 @@
+import base64
+import sys
+
+import curriculum
+
+# ==========================================
+# 1. إعدادات فهرس المهارات
+# ==========================================
+# بدل تكرار أسماء المواد والمهارات العربية في سجل كل تلميذ، تُرقَّم كل مهارة مرة واحدة
+# في الفهرس وتُخزن درجات التلميذ كمصفوفة متراصة: خانتان (bit) لكل مهارة.
+# ملف اللقطة: {"format": SNAPSHOT_FORMAT، "catalog": الفهرس، "students": السجلات}،
+# فالفهرس خارج قاموس التلاميذ ولا يوجد اسم تلميذ محجوز. قيمة format نص، وسجلات
+# التلاميذ قواميس، فلا يمكن أن يُخلط الغلاف بملف قديم (الاسم -> السجل).
+SNAPSHOT_FORMAT = "students-snapshot/2"
+LEGACY_CATALOG_KEY = "__catalog__"   # مفتاح الفهرس في اللقطات السابقة للغلاف
+RATINGS_KEY = "@ratings"      # مفتاح الدرجات المضغوطة داخل سجل التلميذ
+CATALOG_VERSION = 1
+# الخانة 0 = غير مقيّمة، وإلا فهي الدرجة + 1 (الدرجات المسموحة 0 و 1 و 2)
+SCORES = (0, 1, 2)
+
+# فك بايت واحد: قائمة (موضع المهارة داخل البايت، الدرجة) للخانات المقيّمة فقط
+_DECODE = [
+    tuple((slot, ((byte >> (slot * 2)) & 3) - 1) for slot in range(4) if (byte >> (slot * 2)) & 3)
+    for byte in range(256)
+]
+
+
+def default_paths():
+    """مهارات الشبكة الرسمية بترتيبها في النماذج (أرقامها الأولى في كل فهرس جديد)"""
+    paths = [("academic", "", subject, skill)
+             for subject, skills in curriculum.ACADEMIC_SUBJECTS.items() for skill in skills]
+    paths += [
+        ("behavioral", main, sub, skill)
+        for main, subs in curriculum.BEHAVIORAL_SKILLS.items()
+        for sub, skills in subs.items()
+        for skill in skills
+    ]
+    return paths
+
+
+def _flatten(evals):
+    """
+    درجات تقييمات تلميذ بالترتيب: [((الفئة، المجال، المادة، المهارة)، الدرجة)]،
+    أو None إذا احتوت على مادة أو مجال فارغ (لا يمكن تمثيله في الصيغة المضغوطة).
+    """
+    flat = []
+    for subject, skills in evals.get("academic", {}).items():
+        if not skills:
+            return None
+        flat.extend((("academic", "", subject, skill), score) for skill, score in skills.items())
+    for main, subs in evals.get("behavioral", {}).items():
+        if not subs:
+            return None
+        for sub, skills in subs.items():
+            if not skills:
+                return None
+            flat.extend((("behavioral", main, sub, skill), score) for skill, score in skills.items())
+    return flat
+
+
+# ==========================================
+# 2. الفهرس والضغط
+# ==========================================
+class SkillCatalog:
+    """
+    فهرس إلحاقي (مهارة -> رقم): الأرقام لا تتغير داخل الملف الواحد، والمهارات الجديدة تُضاف في آخره.
+    """
+
+    def __init__(self, paths=()):
+        self.paths = []
+        self._ids = {}
+        self._bytes = {}   # (رقم البايت، قيمته) -> خاناته المفكوكة (الأرقام لا تتغير فيصح حفظها)
+        for path in paths:
+            self.intern(tuple(path))
+
+    def __len__(self):
+        return len(self.paths)
+
+    def intern(self, path):
+        skill_id = self._ids.get(path)
+        if skill_id is None:
+            skill_id = self._ids[path] = len(self.paths)
+            self.paths.append(path)
+        return skill_id
+
+    def to_json(self):
+        return {"version": CATALOG_VERSION, "skills": [list(path) for path in self.paths]}
+
+    @classmethod
+    def from_json(cls, obj):
+        if obj.get("version") != CATALOG_VERSION:
+            raise ValueError(f"Unsupported skill catalog version: {obj.get('version')}")
+        return cls(obj["skills"])
+
+    def pack(self, ids, scores):
+        """أرقام المهارات ودرجاتها -> بايتات بخانتين لكل مهارة"""
+        packed = bytearray((max(ids) >> 2) + 1 if ids else 0)
+        for skill_id, score in zip(ids, scores):
+            packed[skill_id >> 2] |= (score + 1) << ((skill_id & 3) << 1)
+        return bytes(packed)
+
+    def _decode(self, index, byte):
+        key = (index, byte)
+        entries = self._bytes.get(key)
+        if entries is None:
+            base = index << 2
+            entries = self._bytes[key] = tuple(
+                (self.paths[base + slot][:3], self.paths[base + slot][3], score) for slot, score in _DECODE[byte]
+            )
+        return entries
+
+    def groups(self, packed):
+        """بايتات الدرجات -> {(الفئة، المجال، المادة): {المهارة: الدرجة}} بترتيب أرقام المهارات"""
+        groups = {}
+        for index, byte in enumerate(packed):
+            if not byte:
+                continue
+            for group, skill, score in self._decode(index, byte):
+                skills = groups.get(group)
+                if skills is None:
+                    skills = groups[group] = {}
+                skills[skill] = score
+        return groups
+
+    def unpack(self, packed):
+        """بايتات الدرجات -> {"academic": {...}, "behavioral": {...}} بالشكل المتداخل المعتاد"""
+        evals = {}
+        for (category, domain, subject), skills in self.groups(packed).items():
+            target = evals.setdefault(category, {})
+            if domain:
+                target = target.setdefault(domain, {})
+            target[subject] = skills
+        return evals
+
+
+def _clone(obj):
+    if isinstance(obj, dict):
+        return {k: _clone(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_clone(v) for v in obj]
+    return obj
+
+
+def _interned(values):
+    """نسخة من قاموس بقيم نصية مشتركة (المستوى، الجنس، التاريخ تتكرر بين آلاف التلاميذ)"""
+    return {k: sys.intern(v) if isinstance(v, str) else _clone(v) for k, v in values.items()}
+
+
+def pack_record(catalog, record):
+    """
+    سجل تلميذ بصيغته المضغوطة: نفس السجل مع استبدال شجرتي الدرجات بـ RATINGS_KEY (بايتات).
+    يُرجع نسخة من السجل كما هو إذا تعذر الضغط دون أي فقدان (درجة غير معتادة، مادة فارغة، ترتيب مختلف...).
+    """
+    evals = record.get("evaluations") if isinstance(record, dict) else None
+    if not isinstance(evals, dict) or RATINGS_KEY in record:
+        return _clone(record)
+    try:
+        flat = _flatten(evals)
+    except (AttributeError, TypeError):
+        return _clone(record)
+    if not flat or any(type(score) is not int or score not in SCORES for _, score in flat):
+        return _clone(record)
+    ids = [catalog.intern(path) for path, _ in flat]
+    # فك الضغط يعيد المهارات بترتيب أرقامها، فلا يُضغط إلا ما يحافظ على ترتيب المواد والمهارات
+    if any(a >= b for a, b in zip(ids, ids[1:])):
+        return _clone(record)
+
+    compact = {k: _interned(v) if isinstance(v, dict) else _clone(v) for k, v in record.items() if k != "evaluations"}
+    categories = {path[0] for path, _ in flat}
+    compact["evaluations"] = _interned({k: v for k, v in evals.items() if k not in categories})
+    compact[RATINGS_KEY] = catalog.pack(ids, [score for _, score in flat])
+    return compact
+
+
+def unpack_record(catalog, compact):
+    """نسخة مستقلة من السجل بالشكل المتداخل المعتاد (عكس pack_record)"""
+    packed = compact.get(RATINGS_KEY) if isinstance(compact, dict) else None
+    if packed is None:
+        return _clone(compact)
+    record = {k: _clone(v) for k, v in compact.items() if k != RATINGS_KEY}
+    evals = catalog.unpack(packed)
+    evals.update(record.get("evaluations", {}))
+    record["evaluations"] = evals
+    return record
+
+
+# ==========================================
+# 3. صيغة الملف
+# ==========================================
+def encode_snapshot(catalog, records, binary=False, generation=None):
+    """
+    السجلات المضغوطة -> قاموس قابل للكتابة (الغلاف: الصيغة ثم الفهرس ثم التلاميذ).
+    الدرجات بترميز base64 لصيغة JSON، أو بايتات كما هي إذا كانت الصيغة ثنائية (binary).
+    generation: معرف اللقطة الذي يُكتب أيضاً في رأس السجل الإلحاقي المبني عليها.
+    """
+    students = {}
+    for name, compact in records.items():
+        packed = compact.get(RATINGS_KEY) if isinstance(compact, dict) else None
+        if packed is not None and not binary:
+            compact = dict(compact)
+            compact[RATINGS_KEY] = base64.b64encode(packed).decode("ascii")
+        students[name] = compact
+    return {"format": SNAPSHOT_FORMAT, "generation": generation, "catalog": catalog.to_json(), "students": students}
+
+
+def _is_catalog(meta):
+    return isinstance(meta, dict) and set(meta) == {"version", "skills"}
+
+
+def decode_snapshot(data):
+    """
+    محتوى ملف اللقطة -> (الفهرس، السجلات المضغوطة، معرف اللقطة أو None).
+    الملفات القديمة (بدون فهرس، أو بالفهرس داخل قاموس التلاميذ) تُقرأ كما هي
+    وتُكتب بالغلاف الجديد عند أول دمج.
+    محتوى بشكل غير صالح (قائمة، غلاف ناقص، سجل ليس قاموساً...) يرفع ValueError مثل ملف تالف.
+    """
+    try:
+        return _decode_snapshot(data)
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid snapshot structure: {e!r}") from e
+
+
+def _decode_snapshot(data):
+    if not isinstance(data, dict):
+        raise TypeError(f"snapshot is a {type(data).__name__}, expected a mapping")
+    generation = None
+    if data.get("format") == SNAPSHOT_FORMAT:
+        meta, data, generation = data["catalog"], data["students"], data.get("generation")
+    elif _is_catalog(data.get(LEGACY_CATALOG_KEY)):
+        meta = data.pop(LEGACY_CATALOG_KEY)
+    else:
+        meta = None
+    bad = next((name for name, record in data.items() if not isinstance(record, dict)), None)
+    if bad is not None:
+        raise TypeError(f"record {bad!r} is not a mapping")
+    if meta is None:
+        catalog = SkillCatalog(default_paths())
+        return catalog, {name: pack_record(catalog, record) for name, record in data.items()}, generation
+    catalog = SkillCatalog.from_json(meta)
+    # مهارات أضيفت للشبكة الرسمية بعد إنشاء الملف تأخذ أرقاماً جديدة في آخر الفهرس
+    for path in default_paths():
+        catalog.intern(path)
+    records = {}
+    for name, compact in data.items():
+        packed = compact.get(RATINGS_KEY) if isinstance(compact, dict) else None
+        if packed is not None:
+            compact = {k: _interned(v) if isinstance(v, dict) else v for k, v in compact.items()}
+            compact[RATINGS_KEY] = base64.b64decode(packed) if isinstance(packed, str) else bytes(packed)
+        records[name] = compact
+    return catalog, records, generation
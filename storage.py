@@ -0,0 +1,795 @@
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import serialization
+import skill_catalog
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ==========================================
+# 1. إعدادات محرك التخزين
+# ==========================================
+# كل تعديل على تلميذ يُلحق كسطر JSON في ملف السجل (Journal)،
+# ثم يُدمج السجل دورياً في ملف اللقطة (Snapshot) الرئيسي.
+JOURNAL_SUFFIX = ".journal"
+LOCK_SUFFIX = ".lock"
+COMPACT_MIN_ENTRIES = 200   # أقل عدد من السطور قبل التفكير في الدمج
+COMPACT_RATIO = 1.0         # الدمج عندما يتجاوز حجم السجل حجم اللقطة بهذه النسبة
+SQLITE_BUSY_TIMEOUT = 30    # ثوانٍ انتظار قفل الكتابة في SQLite
+
+
+def _clone(obj):
+    """نسخ عميق سريع لبيانات بصيغة JSON (قواميس، قوائم، قيم بسيطة)"""
+    if isinstance(obj, dict):
+        return {k: _clone(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_clone(v) for v in obj]
+    return obj
+
+
+def iter_rating_groups(name, evals):
+    """تسطيح تقييمات تلميذ إلى مجموعات (الاسم، الفئة، المجال، المادة، {المهارة: الدرجة})"""
+    for subj, skills in evals.get("academic", {}).items():
+        yield (name, "academic", "", subj, skills)
+    for main, sub_cats in evals.get("behavioral", {}).items():
+        for sub, skills in sub_cats.items():
+            yield (name, "behavioral", main, sub, skills)
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    except FileNotFoundError:
+        return None
+
+
+def _changed_names(data, base):
+    """أسماء التلاميذ الذين تغيرت سجلاتهم بين نسخة الأساس والنسخة الجديدة"""
+    names = [n for n, rec in data.items() if base.get(n) != rec]
+    return names + [n for n in base if n not in data]
+
+
+def atomic_write(path, write, binary=False):
+    """كتابة ذرية: ملف مؤقت في نفس المجلد ثم إعادة تسمية فوق الملف الأصلي"""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with (os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8")) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class FileLock:
+    """
+    قفل كتابة حصري بين العمليات (وبين خيوط العملية الواحدة) عبر ملف .lock.
+    يمكن إعادة الدخول إليه من نفس الخيط.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fh = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            fh = open(self.path, "a+b")
+            try:
+                if fcntl:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+                else:
+                    fh.seek(0)
+                    while True:
+                        try:
+                            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            continue
+            except BaseException:
+                fh.close()
+                self._thread_lock.release()
+                raise
+            self._fh = fh
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            else:
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+            self._fh.close()
+            self._fh = None
+        self._thread_lock.release()
+
+
+# ==========================================
+# 2. المخزن: لقطة + سجل إلحاقي
+# ==========================================
+class JournalStore:
+    """
+    مخزن بيانات التلاميذ القائم على لقطة JSON وسجل إلحاقي.
+    كتابة تلميذ واحد تكلف حجم سجله فقط بدلاً من إعادة كتابة الملف كاملاً.
+    السجلات محفوظة في الذاكرة وفي اللقطة بصيغة مضغوطة (انظر skill_catalog)
+    وتُعاد بالشكل المتداخل المعتاد عند القراءة.
+    كل كتابة تتم تحت قفل ملف بعد مزامنة ما كتبته العمليات الأخرى،
+    لذلك لا تمس الجلسات المتزامنة إلا سجلات التلاميذ التي عدلتها.
+    """
+
+    def __init__(self, path, codec=None):
+        self.path = path
+        self.codec = codec or serialization.get_codec()  # صيغة كتابة اللقطة (انظر serialization)
+        self._snapshot_codec = None                       # صيغة اللقطة الحالية على القرص
+        self.journal_path = path + JOURNAL_SUFFIX
+        self._lock = FileLock(path + LOCK_SUFFIX)
+        self._mutex = threading.RLock()  # يحمي الحالة في الذاكرة بين الخيوط
+        self._records = {}      # الاسم -> السجل المضغوط
+        self._catalog = skill_catalog.SkillCatalog()
+        self._stamp = None      # (mtime, size, inode) للقطة عند آخر قراءة
+        self._snapshot_id = None  # معرف اللقطة: السجل صالح فقط إذا حمل رأسه نفس المعرف
+        self._offset = 0        # عدد بايتات السجل التي تم تطبيقها (مع سطر الرأس)
+        self._entries = 0       # عدد سطور السجل المطبقة
+        self._loaded = False
+        # أرقام المراجعة: تتغير مع كل تعديل لتلميذ (لمفاتيح ذاكرة التخزين المؤقت)
+        self._generation = 0
+        self._seq = 0
+        self._revs = {}
+        self._changes = []      # أسماء التلاميذ المعدَّلين بالترتيب منذ بداية الجيل الحالي
+        self._base_seq = 0
+
+    # --- القراءة ---
+    def _read_snapshot(self):
+        self._snapshot_codec = None
+        self._snapshot_id = None
+        if not os.path.exists(self.path):
+            self._catalog = skill_catalog.SkillCatalog(skill_catalog.default_paths())
+            return {}
+        data, self._snapshot_codec = serialization.load_file(self.path)
+        self._catalog, records, self._snapshot_id = skill_catalog.decode_snapshot(data)
+        return records
+
+    def _pack(self, record):
+        return skill_catalog.pack_record(self._catalog, record)
+
+    def _unpack(self, compact):
+        return skill_catalog.unpack_record(self._catalog, compact)
+
+    def _journal_header(self):
+        return serialization.dumps_json({"op": "base", "snapshot": self._snapshot_id}) + b"\n"
+
+    def _replay_tail(self):
+        """
+        تطبيق السطور الجديدة فقط من السجل (منذ آخر قراءة).
+        السجل يبدأ برأس يحمل معرف اللقطة المبني عليها؛ سجل لقطة سابقة (بين كتابة لقطة
+        جديدة وحذف السجل القديم) يُتجاهل بدل تطبيقه وحفظ موضع في ملف سيُستبدل.
+        """
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "rb") as f:
+            if self._offset == 0:
+                line = f.readline()
+                try:
+                    header = serialization.loads_json(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    header = None
+                if isinstance(header, dict) and header.get("op") == "base":
+                    if header.get("snapshot") != self._snapshot_id:
+                        return
+                    self._offset = len(line)
+                elif self._snapshot_id is not None or not line.endswith(b"\n"):
+                    # سجل بلا رأس لا يصلح إلا مع لقطة قديمة بلا معرف
+                    return
+            f.seek(self._offset)
+            chunk = f.read()
+        if not chunk:
+            return
+        # تجاهل السطر الأخير إذا كان غير مكتمل (كتابة مقطوعة)
+        end = chunk.rfind(b"\n") + 1
+        for raw in chunk[:end].splitlines():
+            if not raw.strip():
+                continue
+            try:
+                entry = serialization.loads_json(raw)
+            except ValueError:
+                continue
+            self._apply(entry)
+            self._entries += 1
+        self._offset += end
+
+    def _apply(self, entry, compact=None):
+        op = entry.get("op")
+        self._seq += 1
+        self._revs[entry.get("name")] = self._seq
+        self._changes.append(entry.get("name"))
+        if op == "put":
+            self._records[entry["name"]] = compact if compact is not None else self._pack(entry["record"])
+        elif op == "del":
+            self._records.pop(entry["name"], None)
+
+    def refresh(self):
+        """مزامنة النسخة في الذاكرة مع الملفات على القرص"""
+        with self._mutex:
+            stamp = _stat(self.path)
+            journal = _stat(self.journal_path)
+            journal_size = journal[1] if journal else 0
+            if not self._loaded or stamp != self._stamp or journal_size < self._offset:
+                self._loaded = False
+                self._records = self._read_snapshot()
+                self._stamp = stamp
+                self._offset = 0
+                self._entries = 0
+                self._new_generation()
+                self._loaded = True
+            self._replay_tail()
+            return self._records
+
+    def load_all(self):
+        """إرجاع نسخة مستقلة من جميع السجلات"""
+        with self._mutex:
+            return {name: self._unpack(compact) for name, compact in self.refresh().items()}
+
+    def get(self, name):
+        """إرجاع نسخة من سجل تلميذ واحد أو None"""
+        with self._mutex:
+            compact = self.refresh().get(name)
+            return self._unpack(compact) if compact is not None else None
+
+    def revision(self, name=None):
+        """
+        رقم مراجعة تلميذ معين (None إن لم يوجد)، أو مراجعة البيانات كاملة إذا لم يُحدد اسم.
+        يتغير الرقم مع كل تعديل، ويصلح مفتاحاً لذاكرة التخزين المؤقت داخل العملية.
+        """
+        with self._mutex:
+            records = self.refresh()
+            if name is None:
+                return (self._generation, self._seq)
+            if name not in records:
+                return None
+            return (self._generation, self._revs.get(name, 0))
+
+    def changes(self, since):
+        """
+        (المراجعة الحالية، أسماء التلاميذ المعدَّلين أو المحذوفين منذ المراجعة since)،
+        أو None بدل الأسماء إذا تعذر معرفتها (لقطة جديدة أو مراجعة من جيل آخر) فيلزم إعادة البناء.
+        """
+        with self._mutex:
+            self.refresh()
+            revision = (self._generation, self._seq)
+            if since is None or since[0] != self._generation:
+                return revision, None
+            return revision, set(self._changes[since[1] - self._base_seq:])
+
+    def infos(self):
+        """قاموس (الاسم -> البيانات الشخصية) دون التقييمات"""
+        with self._mutex:
+            return {name: dict(rec.get("info", {})) for name, rec in self.refresh().items()}
+
+    # --- الكتابة (تُستدعى تحت القفل فقط) ---
+    def _append(self, entries, compacts):
+        payload = b"".join(serialization.dumps_json(e) + b"\n" for e in entries)
+        if self._offset == 0:
+            # سجل جديد (أو سجل لقطة سابقة لم يُطبَّق): يبدأ من جديد برأس اللقطة الحالية
+            payload = self._journal_header() + payload
+        with open(self.journal_path, "ab") as f:
+            # حذف أي سطر مقطوع في النهاية حتى لا يلتصق بالسطر الجديد
+            if f.tell() > self._offset:
+                f.truncate(self._offset)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        for e in entries:
+            self._apply(e, compacts.get(e["name"]))
+        self._offset += len(payload)
+        self._entries += len(entries)
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._entries < COMPACT_MIN_ENTRIES:
+            return
+        snapshot_size = self._stamp[1] if self._stamp else 0
+        if self._offset > snapshot_size * COMPACT_RATIO:
+            self._write_snapshot(self._records)
+
+    def _write_snapshot(self, records):
+        snapshot_id = os.urandom(8).hex()
+        payload = self.codec.dumps(
+            skill_catalog.encode_snapshot(self._catalog, records, binary=self.codec.binary, generation=snapshot_id)
+        )
+        atomic_write(self.path, lambda f: f.write(payload), binary=True)
+        # من يقرأ اللقطة الجديدة قبل حذف السجل القديم يتجاهله (رأسه يحمل معرف اللقطة السابقة)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._records = records
+        self._snapshot_codec = self.codec
+        self._snapshot_id = snapshot_id
+        self._stamp = _stat(self.path)
+        self._offset = 0
+        self._entries = 0
+        self._new_generation()
+        self._loaded = True
+
+    def _new_generation(self):
+        self._generation += 1
+        self._revs = {}
+        self._changes = []
+        self._base_seq = self._seq
+
+    def _sync_for_write(self):
+        """
+        مزامنة تحت القفل؛ تُرجع None إذا كانت اللقطة تالفة. اللقطة التالفة (وسجلها)
+        تُنقل أولاً إلى students_data.json.corrupt-<الوقت> حتى لا تمحوها الكتابة التالية،
+        فتبقى بيانات باقي التلاميذ قابلة للاسترجاع.
+        """
+        try:
+            return self.refresh()
+        except ValueError as e:
+            self._loaded = False
+            suffix = ".corrupt-" + time.strftime("%Y%m%d-%H%M%S")
+            # لا تُستبدل نسخة سابقة نُقلت في نفس الثانية
+            for n in itertools.count(1):
+                if not os.path.exists(self.path + suffix):
+                    break
+                suffix = ".corrupt-" + time.strftime("%Y%m%d-%H%M%S") + f"-{n}"
+            os.replace(self.path, self.path + suffix)
+            if os.path.exists(self.journal_path):
+                os.replace(self.journal_path, self.journal_path + suffix)
+            logger.error("Unreadable snapshot %s moved aside to %s: %s", self.path, self.path + suffix, e)
+            return None
+
+    def _write_entries(self, current, entries, compacts):
+        """compacts: الصيغة المضغوطة الجاهزة لسجلات entries (حتى لا يُعاد ضغطها)"""
+        if not entries:
+            return
+        # عند تغير أغلب البيانات تكون كتابة لقطة جديدة أرخص من السجل،
+        # وكذلك إذا كانت اللقطة بصيغة غير المختارة (تحويل تلقائي عند أول حفظ)
+        converting = self._snapshot_codec is not None and self._snapshot_codec is not self.codec
+        if current is None or converting or len(entries) > max(len(current), 1) // 2:
+            records = current if current is not None else {}
+            for e in entries:
+                if e["op"] == "put":
+                    records[e["name"]] = compacts[e["name"]]
+                else:
+                    records.pop(e["name"], None)
+            self._write_snapshot(records)
+        else:
+            self._append(entries, compacts)
+
+    # --- الواجهة العامة للكتابة ---
+    def compact(self):
+        """دمج السجل في لقطة جديدة (كتابة ذرية) ثم تفريغ السجل"""
+        with self._mutex, self._lock:
+            self._write_snapshot(self.refresh())
+
+    def update(self, name, fn, on_write=None):
+        """
+        قراءة-تعديل-كتابة لسجل تلميذ واحد تحت القفل.
+        fn تستقبل نسخة من السجل الحالي (أو None) وتُرجع السجل الجديد (أو None للحذف).
+        """
+        return self.update_many({name: fn}, on_write)[name]
+
+    def update_many(self, updates, on_write=None):
+        """
+        مثل update لعدة تلاميذ ({الاسم: fn}) في كتابة واحدة تحت القفل:
+        سطر في السجل لكل تلميذ متغير، أو لقطة جديدة إذا تغير أغلب البيانات.
+        on_write() تُستدعى بعد الكتابة وقبل تحرير القفل إذا تغير شيء، فتُرتَّب
+        الأعمال المرتبطة بالتعديل (مثل السجل الزمني) بنفس ترتيب الكتابات.
+        يُرجع {الاسم: السجل الجديد}.
+        """
+        with self._mutex, self._lock:
+            current = self._sync_for_write()
+            entries = []
+            compacts = {}
+            results = {}
+            for name, fn in updates.items():
+                before = current.get(name) if current is not None else None
+                after = results[name] = fn(self._unpack(before) if before is not None else None)
+                if after is None:
+                    if before is not None:
+                        entries.append({"op": "del", "name": name})
+                    continue
+                # المقارنة بالصيغة المضغوطة: السجلان متساويان إذا تساوت صيغتاهما
+                compact = self._pack(after)
+                if compact == before and current is not None:
+                    continue
+                compacts[name] = compact
+                entries.append({"op": "put", "name": name, "record": _clone(after)})
+            self._write_entries(current, entries, compacts)
+            if entries and on_write:
+                on_write()
+            return results
+
+    def put(self, name, record):
+        """حفظ سجل تلميذ واحد (يتم تجاهل الكتابة إذا لم يتغير شيء)"""
+        self.update(name, lambda _: record)
+
+    def delete(self, name):
+        """حذف تلميذ من المخزن"""
+        self.update(name, lambda _: None)
+
+    def replace_all(self, data, base=None):
+        """
+        استبدال البيانات كاملة مع تسجيل التلاميذ المتغيرين فقط.
+        إذا مُررت base (النسخة التي حمّلتها الجلسة) تُكتب فقط السجلات التي عدلتها
+        الجلسة منذ ذلك الحين، فلا تُمحى تعديلات الجلسات الأخرى.
+        """
+        with self._mutex, self._lock:
+            current = self._sync_for_write()
+            if base is not None:
+                names = _changed_names(data, base)
+            else:
+                names = list(data) + [n for n in (current or {}) if n not in data]
+            entries = []
+            compacts = {}
+            for name in names:
+                if name in data:
+                    compact = self._pack(data[name])
+                    if current is None or current.get(name) != compact:
+                        compacts[name] = compact
+                        entries.append({"op": "put", "name": name, "record": _clone(data[name])})
+                elif current is None or name in current:
+                    entries.append({"op": "del", "name": name})
+            self._write_entries(current, entries, compacts)
+
+
+# ==========================================
+# 3. مخزن SQLite (جداول مفهرسة لكل تلميذ)
+# ==========================================
+INFO_COLUMNS = {"class_level": "class_level", "gender": "gender", "dob": "dob", "id": "ext_id", "notes": "notes"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    student_id  INTEGER PRIMARY KEY,
+    name        TEXT NOT NULL UNIQUE,
+    class_level TEXT,
+    gender      TEXT,
+    dob         TEXT,
+    ext_id      TEXT,
+    notes       TEXT,
+    info_extra  TEXT,
+    eval_extra  TEXT,
+    extra       TEXT,
+    last_update TEXT,
+    revision    INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_students_level ON students(class_level);
+CREATE TABLE IF NOT EXISTS evaluations (
+    student_id INTEGER NOT NULL REFERENCES students(student_id) ON DELETE CASCADE,
+    position   INTEGER NOT NULL,
+    category   TEXT NOT NULL,
+    domain     TEXT NOT NULL,
+    subject    TEXT NOT NULL,
+    skill      TEXT NOT NULL,
+    score      INTEGER NOT NULL,
+    PRIMARY KEY (student_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_evaluations_skill ON evaluations(category, subject, skill);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta VALUES ('revision', 0);
+CREATE TABLE IF NOT EXISTS removed (
+    name     TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+"""
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) if obj else None
+
+
+class SQLiteStore:
+    """
+    مخزن SQLite: البيانات الشخصية في جدول students والتقييمات صفاً لكل مهارة
+    في جدول evaluations. يتم جلب تلميذ واحد أو مجاميع لوحة التحكم دون تحميل الكل.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            path, timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(students)")}
+        if "revision" not in columns:  # قواعد أُنشئت قبل إضافة أرقام المراجعة
+            self._conn.execute("ALTER TABLE students ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+        self._pending_rev = 0
+
+    def close(self):
+        self._conn.close()
+
+    # --- التحويل بين السجل والصفوف ---
+    @staticmethod
+    def _split(record):
+        """تفكيك سجل تلميذ إلى صف students وصفوف evaluations"""
+        info = dict(record.get("info", {}))
+        evals = dict(record.get("evaluations", {}))
+        extra = {k: v for k, v in record.items() if k not in ("info", "evaluations")}
+        columns = {col: info.pop(key, None) for key, col in INFO_COLUMNS.items()}
+
+        rows = []
+        academic = evals.pop("academic", None)
+        behavioral = evals.pop("behavioral", None)
+        if academic is not None:
+            for subj, skills in academic.items():
+                for skill, score in skills.items():
+                    rows.append(("academic", "", subj, skill, score))
+            if not rows:
+                evals["academic"] = academic
+        if behavioral is not None:
+            before = len(rows)
+            for main, subs in behavioral.items():
+                for sub, skills in subs.items():
+                    for skill, score in skills.items():
+                        rows.append(("behavioral", main, sub, skill, score))
+            if len(rows) == before:
+                evals["behavioral"] = behavioral
+        last_update = evals.pop("last_update", None)
+        columns.update(
+            info_extra=_dumps(info), eval_extra=_dumps(evals), extra=_dumps(extra), last_update=last_update
+        )
+        return columns, rows
+
+    @staticmethod
+    def _join(row, eval_rows):
+        """إعادة بناء السجل بالشكل المتداخل المعتاد"""
+        info = json.loads(row["info_extra"]) if row["info_extra"] else {}
+        for key, col in INFO_COLUMNS.items():
+            if row[col] is not None:
+                info[key] = row[col]
+        evals = {}
+        for category, domain, subject, skill, score in eval_rows:
+            if category == "academic":
+                evals.setdefault("academic", {}).setdefault(subject, {})[skill] = score
+            else:
+                evals.setdefault("behavioral", {}).setdefault(domain, {}).setdefault(subject, {})[skill] = score
+        if row["eval_extra"]:
+            evals.update(json.loads(row["eval_extra"]))
+        if row["last_update"] is not None:
+            evals["last_update"] = row["last_update"]
+        record = {"info": info, "evaluations": evals}
+        if row["extra"]:
+            record.update(json.loads(row["extra"]))
+        return record
+
+    def _write(self, name, record, before=None):
+        """
+        كتابة سجل تلميذ. إذا مُرر before (السجل الحالي) وكانت المهارات نفسها بنفس الترتيب
+        تُحدَّث درجات المهارات المتغيرة فقط بدل إعادة كتابة كل صفوف التقييم.
+        """
+        columns, rows = self._split(record)
+        columns["revision"] = self._pending_rev
+        names = list(columns)
+        cur = self._conn.execute(
+            f"INSERT INTO students (name, {', '.join(names)}) VALUES (?{', ?' * len(names)}) "
+            f"ON CONFLICT(name) DO UPDATE SET {', '.join(f'{n}=excluded.{n}' for n in names)} "
+            "RETURNING student_id",
+            [name] + [columns[n] for n in names],
+        )
+        student_id = cur.fetchone()[0]
+        if before is not None:
+            old_rows = self._split(before)[1]
+            if [r[:4] for r in old_rows] == [r[:4] for r in rows]:
+                self._conn.executemany(
+                    "UPDATE evaluations SET score = ? WHERE student_id = ? AND category = ? "
+                    "AND domain = ? AND subject = ? AND skill = ?",
+                    [(new[4], student_id) + new[:4] for old, new in zip(old_rows, rows) if old[4] != new[4]],
+                )
+                return
+        self._conn.execute("DELETE FROM evaluations WHERE student_id = ?", (student_id,))
+        self._conn.executemany(
+            "INSERT INTO evaluations VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(student_id, pos) + r for pos, r in enumerate(rows)],
+        )
+
+    def _delete(self, names):
+        """حذف تلاميذ مع تسجيل أسمائهم في جدول removed (ليظهر الحذف في changes)"""
+        rows = [(name,) for name in names]
+        self._conn.executemany("DELETE FROM students WHERE name = ?", rows)
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO removed VALUES (?, ?)", [(name, self._pending_rev) for name in names]
+        )
+
+    def _fetch(self, where="", params=()):
+        self._conn.row_factory = sqlite3.Row
+        try:
+            students = self._conn.execute(f"SELECT * FROM students {where} ORDER BY student_id", params).fetchall()
+        finally:
+            self._conn.row_factory = None
+        if not students:
+            return {}
+        ids = [r["student_id"] for r in students]
+        grouped = {i: [] for i in ids}
+        query = (
+            "SELECT student_id, category, domain, subject, skill, score FROM evaluations "
+            + (f"WHERE student_id IN ({', '.join('?' * len(ids))}) " if where else "")
+            + "ORDER BY student_id, position"
+        )
+        for sid, *rest in self._conn.execute(query, ids if where else ()):
+            grouped[sid].append(rest)
+        return {r["name"]: self._join(r, grouped[r["student_id"]]) for r in students}
+
+    # --- واجهة المخزن ---
+    def load_all(self):
+        with self._lock:
+            return self._fetch()
+
+    def get(self, name):
+        with self._lock:
+            return self._fetch("WHERE name = ?", (name,)).get(name)
+
+    def infos(self):
+        with self._lock:
+            self._conn.row_factory = sqlite3.Row
+            try:
+                rows = self._conn.execute("SELECT * FROM students ORDER BY student_id").fetchall()
+            finally:
+                self._conn.row_factory = None
+        result = {}
+        for row in rows:
+            info = json.loads(row["info_extra"]) if row["info_extra"] else {}
+            for key, col in INFO_COLUMNS.items():
+                if row[col] is not None:
+                    info[key] = row[col]
+            result[row["name"]] = info
+        return result
+
+    def _transaction(self, work):
+        """
+        تنفيذ work داخل معاملة كتابة (BEGIN IMMEDIATE تسلسل الكتّاب بين العمليات).
+        رقم مراجعة القاعدة يزيد فقط إذا كتبت work شيئاً، فلا تُبطل الكتابات الفارغة الذاكرات المؤقتة.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # الرقم التالي محجوز لهذه المعاملة: لا كاتب آخر قبل COMMIT
+                self._pending_rev = self._conn.execute(
+                    "SELECT value + 1 FROM meta WHERE key = 'revision'"
+                ).fetchone()[0]
+                changes = self._conn.total_changes
+                result = work()
+                if self._conn.total_changes != changes:
+                    self._conn.execute("UPDATE meta SET value = ? WHERE key = 'revision'", (self._pending_rev,))
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def update(self, name, fn, on_write=None):
+        """قراءة-تعديل-كتابة لسجل تلميذ واحد داخل معاملة واحدة"""
+        return self.update_many({name: fn}, on_write)[name]
+
+    def update_many(self, updates, on_write=None):
+        """
+        مثل update لعدة تلاميذ ({الاسم: fn}) داخل معاملة واحدة.
+        on_write() تُستدعى داخل المعاملة قبل COMMIT إذا تغير شيء (مثل JournalStore.update_many).
+        """
+        def work():
+            results = {}
+            written = False
+            for name, fn in updates.items():
+                before = self._fetch("WHERE name = ?", (name,)).get(name)
+                after = results[name] = fn(_clone(before) if before is not None else None)
+                if after is None:
+                    if before is not None:
+                        self._delete([name])
+                        written = True
+                elif after != before:
+                    self._write(name, after, before)
+                    written = True
+            if written and on_write:
+                on_write()
+            return results
+        return self._transaction(work)
+
+    def put(self, name, record):
+        self._transaction(lambda: self._write(name, record))
+
+    def delete(self, name):
+        self._transaction(lambda: self._delete([name]))
+
+    def replace_all(self, data, base=None):
+        """استبدال البيانات (أو السجلات المتغيرة عن base فقط) في معاملة واحدة"""
+        def work():
+            if base is not None:
+                for name in _changed_names(data, base):
+                    if name in data:
+                        self._write(name, data[name])
+                    else:
+                        self._delete([name])
+            elif not data:
+                self._conn.execute("DELETE FROM evaluations")
+                self._delete([n for (n,) in self._conn.execute("SELECT name FROM students")])
+            else:
+                existing = {n for (n,) in self._conn.execute("SELECT name FROM students")}
+                self._delete([n for n in existing if n not in data])
+                for name, record in data.items():
+                    self._write(name, record)
+        self._transaction(work)
+
+    def revision(self, name=None):
+        """رقم مراجعة تلميذ معين (None إن لم يوجد) أو مراجعة القاعدة كاملة"""
+        with self._lock:
+            if name is None:
+                return self._conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+            row = self._conn.execute("SELECT revision FROM students WHERE name = ?", (name,)).fetchone()
+            return row[0] if row else None
+
+    def changes(self, since):
+        """(المراجعة الحالية، أسماء التلاميذ المعدَّلين أو المحذوفين منذ المراجعة since) مثل JournalStore.changes"""
+        with self._lock:
+            # قراءة المراجعة والأسماء من نفس حالة القاعدة
+            self._conn.execute("BEGIN")
+            try:
+                revision = self._conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+                if since is None:
+                    return revision, None
+                names = {n for (n,) in self._conn.execute(
+                    "SELECT name FROM students WHERE revision > ? UNION SELECT name FROM removed WHERE revision > ?",
+                    (since, since),
+                )}
+            finally:
+                self._conn.execute("COMMIT")
+        return revision, names
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM students LIMIT 1").fetchone() is None
+
+
+def migrate_json_to_sqlite(json_path, db_path):
+    """نقل ملف JSON موجود (مع سجله الإلحاقي) إلى قاعدة SQLite في معاملة واحدة"""
+    data = JournalStore(json_path).load_all()
+    store = get_store(db_path, backend="sqlite")
+    store.replace_all(data)
+    return len(data)
+
+
+# ==========================================
+# 4. سجل المخازن المفتوحة (مخزن واحد لكل ملف)
+# ==========================================
+BACKENDS = {"json": JournalStore, "sqlite": SQLiteStore}
+_stores = {}
+
+
+def get_store(path, backend="json", snapshot_format=None):
+    """
+    إرجاع المخزن الخاص بمسار معين (مع إعادة استخدامه بين الاستدعاءات).
+    snapshot_format: صيغة لقطة مخزن JSON ("json" أو "msgpack")، تُطبق عند كل استدعاء.
+    """
+    key = (backend, os.path.abspath(path))
+    store = _stores.get(key)
+    if store is None:
+        store = _stores[key] = BACKENDS[backend](path)
+    if snapshot_format and backend == "json":
+        store.codec = serialization.get_codec(snapshot_format)
+    return store
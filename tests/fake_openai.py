@@ -0,0 +1,105 @@
+"""
+خادم محلي بسيط يحاكي واجهة OpenAI (chat/completions) للاختبارات دون اتصال بالإنترنت.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = {
+    "narrative": "تلميذ مجتهد يحتاج إلى مزيد من التركيز.",
+    "action_plan": [["القراءة اليومية", "قراءة قصة قصيرة كل مساء"]],
+}
+
+
+class FakeOpenAIServer:
+    """
+    reply: دالة تستقبل جسم الطلب وتُرجع نص رد النموذج.
+    statuses: قائمة رموز HTTP تُستهلك بالترتيب قبل الرد الناجح (لاختبار 429/5xx).
+    delay: تأخير بالثواني قبل كل رد.
+    """
+
+    def __init__(self, reply=None, delay=0.0, statuses=None):
+        self.reply = reply or (lambda body: json.dumps(DEFAULT_REPLY, ensure_ascii=False))
+        self.delay = delay
+        self.statuses = list(statuses or [])
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.requests.append(body)
+                    status = fake.statuses.pop(0) if fake.statuses else 200
+                if fake.delay:
+                    time.sleep(fake.delay)
+                if status != 200:
+                    self._send(status, {"error": {"message": "fake error", "type": "fake"}})
+                    return
+                content = fake.reply(body)
+                if body.get("stream"):
+                    self._stream(body, content)
+                    return
+                self._send(200, {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": body.get("model"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+                })
+
+            def _send(self, status, payload):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, body, content, chunk_size=8):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for i in range(0, len(content), chunk_size):
+                    chunk = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": 0,
+                        "model": body.get("model"),
+                        "choices": [{"index": 0, "delta": {"content": content[i:i + chunk_size]}, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
@@ -0,0 +1,110 @@
+import unittest
+import os
+import tempfile
+import shutil
+import sys
+import threading
+from unittest import mock
+# Add parent directory to path to import data_manager
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import ai_cache
+import data_manager as dm
+from fake_openai import FakeOpenAIServer
+
+EVALS = {"academic": {"الرياضيات": {"العد": 2}}, "last_update": "2025-01-01"}
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.cache = ai_cache.ResponseCache(os.path.join(self.test_dir, "cache.db"), ttl=100, max_entries=2)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_ttl_expiry(self):
+        with mock.patch("ai_cache.time.time", return_value=1000.0):
+            self.cache.put("k", {"v": 1})
+        with mock.patch("ai_cache.time.time", return_value=1050.0):
+            self.assertEqual(self.cache.get("k"), {"v": 1})
+        with mock.patch("ai_cache.time.time", return_value=1200.0):
+            self.assertIsNone(self.cache.get("k"))
+
+    def test_lru_eviction(self):
+        self.cache.ttl = None
+        with mock.patch("ai_cache.time.time", side_effect=[1.0, 2.0, 3.0, 4.0]):
+            self.cache.put("a", 1)
+            self.cache.put("b", 2)
+            self.cache.get("a")          # a أصبح أحدث استخداماً من b
+            self.cache.put("c", 3)
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), 1)
+
+    def test_concurrent_requests_are_coalesced(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {"v": 42}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get_or_compute("k", compute)))
+                   for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for t in threads[1:]:
+            t.start()
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"v": 42}] * 5)
+
+class TestAnalysisCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch.object(dm, "AI_CACHE_FILE", os.path.join(self.test_dir, "ai.db")),
+            mock.patch.dict(os.environ, {"CEREBRAS_API_KEY": "test-key"}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.test_dir)
+
+    def test_repeat_analysis_hits_cache(self):
+        with FakeOpenAIServer() as server, mock.patch.object(dm, "AI_BASE_URL", server.base_url):
+            first = dm.analyze_student_performance("أحمد", EVALS, "ذكر")
+            # تغيير تاريخ التحديث فقط لا يستدعي طلباً جديداً
+            second = dm.analyze_student_performance("أحمد", dict(EVALS, last_update="2025-02-02"), "ذكر")
+            self.assertEqual(len(server.requests), 1)
+            self.assertEqual(first, second)
+            self.assertIn("مجتهد", first[0])
+
+            dm.analyze_student_performance("أحمد", EVALS, "ذكر", refresh=True)
+            self.assertEqual(len(server.requests), 2)
+
+            dm.analyze_student_performance("أحمد", {"academic": {"الرياضيات": {"العد": 1}}}, "ذكر")
+            self.assertEqual(len(server.requests), 3)
+
+        self.assertEqual(dm.cached_analysis("أحمد", EVALS, "ذكر"), first)
+
+    def test_failed_responses_are_not_cached(self):
+        with FakeOpenAIServer(reply=lambda body: "ليس JSON") as server, \
+                mock.patch.object(dm, "AI_BASE_URL", server.base_url):
+            dm.analyze_student_performance("أحمد", EVALS, "ذكر")
+            dm.analyze_student_performance("أحمد", EVALS, "ذكر")
+            self.assertEqual(len(server.requests), 2)
+        self.assertIsNone(dm.cached_analysis("أحمد", EVALS, "ذكر"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+import os
+import json
+import random
+import tempfile
+import shutil
+import sys
+from unittest import mock
+# Add parent directory to path to import ai_stream
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import ai_stream
+import data_manager as dm
+import jobs
+import metrics
+from fake_openai import FakeOpenAIServer
+
+REPLY = {
+    "narrative": "تلميذ \"مجتهد\"\nيحب القراءة 📚 \\ ويشارك بفعالية.",
+    "action_plan": [["القراءة اليومية", "قصة كل مساء"], ["الحساب", "ألعاب العد [1، 2، 3]"]],
+}
+EVALS = {"academic": {"الرياضيات": {"العد": 2}}}
+
+def feed_in_chunks(text, seed):
+    rng = random.Random(seed)
+    parser = ai_stream.AnalysisStream()
+    narratives, plans = [], []
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, 6)
+        parser.feed(text[i:i + size])
+        narratives.append(parser.narrative)
+        plans.append(len(parser.action_plan))
+        i += size
+    return parser, narratives, plans
+
+class TestAnalysisStream(unittest.TestCase):
+    def test_any_chunking_gives_growing_prefixes(self):
+        for ensure_ascii in (False, True):
+            text = "```json\n" + json.dumps(REPLY, ensure_ascii=ensure_ascii) + "\n```"
+            for seed in range(50):
+                parser, narratives, plans = feed_in_chunks(text, seed)
+                self.assertEqual(parser.narrative, REPLY["narrative"])
+                self.assertEqual(parser.action_plan, REPLY["action_plan"])
+                self.assertEqual(parser.text, text)
+                for partial in narratives:
+                    self.assertTrue(REPLY["narrative"].startswith(partial))
+                self.assertEqual(plans, sorted(plans))
+
+    def test_plan_items_appear_as_each_one_completes(self):
+        parser = ai_stream.AnalysisStream()
+        text = json.dumps(REPLY, ensure_ascii=False)
+        second = text.index('["الحساب"')
+        self.assertTrue(parser.feed(text[:second]))
+        self.assertEqual(parser.action_plan, REPLY["action_plan"][:1])
+        parser.feed(text[second:])
+        self.assertEqual(parser.action_plan, REPLY["action_plan"])
+
+    def test_narrative_is_shown_before_the_object_closes(self):
+        parser = ai_stream.AnalysisStream()
+        self.assertTrue(parser.feed('{"narrative": "تلميذ مج'))
+        self.assertEqual(parser.narrative, "تلميذ مج")
+        self.assertFalse(parser.feed("\\"))
+        self.assertEqual(parser.narrative, "تلميذ مج")
+        self.assertTrue(parser.feed('n'))
+        self.assertEqual(parser.narrative, "تلميذ مج\n")
+
+class TestStreamingAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        self.server = FakeOpenAIServer(reply=lambda body: json.dumps(REPLY, ensure_ascii=False))
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        for patcher in [
+            mock.patch.object(dm, "AI_BASE_URL", self.server.base_url),
+            mock.patch.object(dm, "DATA_FILE", os.path.join(self.test_dir, "data.json")),
+            mock.patch.object(dm, "AI_CACHE_FILE", os.path.join(self.test_dir, "ai.db")),
+            mock.patch.object(dm, "HISTORY_FILE", os.path.join(self.test_dir, "history.db")),
+            mock.patch.dict(os.environ, {"CEREBRAS_API_KEY": "test-key"}),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_partials_arrive_before_the_final_result(self):
+        partials = []
+        narrative, plan = dm.analyze_student_performance(
+            "أحمد", EVALS, "ذكر", on_partial=lambda n, p: partials.append((n, p))
+        )
+        self.assertTrue(self.server.requests[0]["stream"])
+        self.assertEqual((narrative, plan), (REPLY["narrative"], REPLY["action_plan"]))
+        self.assertGreater(len(partials), 5)
+        self.assertLess(len(partials[0][0]), len(REPLY["narrative"]))
+        self.assertEqual(partials[-1], (REPLY["narrative"], REPLY["action_plan"]))
+        # النتيجة الكاملة محفوظة كالمعتاد فلا طلب ثانٍ
+        self.assertEqual(dm.cached_analysis("أحمد", EVALS, "ذكر"), (REPLY["narrative"], REPLY["action_plan"]))
+
+    def test_first_content_is_measured(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        with mock.patch.object(metrics, "ENABLED", True):
+            dm.analyze_student_performance("أحمد", EVALS, "ذكر", on_partial=lambda n, p: None)
+        self.assertEqual(metrics.snapshot()["timings"]["ai.first_content"]["count"], 1)
+
+    def test_analysis_job_publishes_partial_results(self):
+        dm.save_student_info("أحمد", {"class_level": "روضة", "gender": "ذكر"})
+        dm.save_evaluation("أحمد", "academic", EVALS["academic"])
+        queue = jobs.JobQueue(os.path.join(self.test_dir, "jobs.db"), workers=0)
+        self.addCleanup(queue.close)
+        seen = []
+        original = queue._progress
+
+        def spy(job_id, done, total, message="", partial=None):
+            original(job_id, done, total, message, partial)
+            if partial is not None:
+                seen.append(queue.get(job_id)["partial"])
+
+        with mock.patch.object(queue, "_progress", spy):
+            job_id = queue.submit("analysis", "أحمد")
+            queue.run_one()
+        self.assertEqual(queue.get(job_id)["status"], jobs.DONE)
+        self.assertTrue(seen)
+        self.assertTrue(REPLY["narrative"].startswith(seen[0]["narrative"]))
+        self.assertEqual(dm.saved_analysis("أحمد", dm.get_student("أحمد"))[0], REPLY["narrative"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import os
+import tempfile
+import shutil
+import sys
+from unittest import mock
+# Add parent directory to path to import analytics
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import analytics
+import data_manager as dm
+import storage
+
+def record(level, math, reading=None):
+    academic = {"الرياضيات": {"العد": math}}
+    if reading is not None:
+        academic["اللغة العربية"] = {"القراءة": reading}
+    return {"info": {"class_level": level}, "evaluations": {"academic": academic}}
+
+class TestClassAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.stats = analytics.ClassAnalytics()
+        self.stats.rebuild({
+            "أ": record("روضة", 2, 2),
+            "ب": record("روضة", 0, 1),
+            "ج": record("روضة", 1, 1),
+            "د": record("تحضيري", 2),
+        })
+
+    def test_summary_and_histogram(self):
+        summary = self.stats.summary("روضة")
+        self.assertEqual(summary["students"], 3)
+        self.assertAlmostEqual(summary["overall_average"], (100 + 25 + 50) / 3)
+        self.assertEqual(sum(summary["histogram"]), 3)
+        self.assertEqual(summary["histogram"][-1], 1)
+        self.assertEqual(self.stats.summary()["students"], 4)
+        self.assertEqual(self.stats.levels(), ["تحضيري", "روضة"])
+
+    def test_hardest_skills_and_ranking(self):
+        hardest = self.stats.hardest_skills("روضة", limit=1)[0]
+        self.assertEqual((hardest["skill"], hardest["level_0"], hardest["rated"]), ("العد", 1, 3))
+        self.assertEqual([r["name"] for r in self.stats.ranking("روضة")], ["أ", "ج", "ب"])
+        self.assertEqual(self.stats.rank_of("ب")["rank"], 3)
+        self.assertEqual(self.stats.rank_of("أ", across_levels=True)["rank"], 1)
+        self.assertAlmostEqual(self.stats.rank_of("ج")["percentile"], 50.0)
+
+    def test_updates_replace_old_contribution(self):
+        self.stats.update("ب", record("تحضيري", 2, 2))
+        self.assertEqual(self.stats.summary("روضة")["students"], 2)
+        self.assertEqual(self.stats.rank_of("ب")["rank"], 1)
+        self.assertEqual(self.stats.rank_of("ب")["students"], 2)
+        self.stats.update("د", None)
+        self.stats.update("ب", None)
+        self.assertEqual(self.stats.levels(), ["روضة"])
+        fresh = analytics.ClassAnalytics()
+        fresh.rebuild({"أ": record("روضة", 2, 2), "ج": record("روضة", 1, 1)})
+        self.assertEqual(self.stats.skills("روضة"), fresh.skills("روضة"))
+        self.assertEqual(self.stats.summary(), fresh.summary())
+
+class TestAnalyticsSync(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+
+    def check_incremental_sync(self, store):
+        store.replace_all({"أ": record("روضة", 2), "ب": record("روضة", 0)})
+        stats = analytics.ClassAnalytics().sync(store)
+        self.assertEqual(stats.summary()["students"], 2)
+        with mock.patch.object(store, "load_all", side_effect=AssertionError("full rescan")):
+            store.put("ب", record("روضة", 2))
+            store.put("ج", record("تحضيري", 1))
+            store.delete("أ")
+            stats.sync(store)
+        self.assertEqual(stats.levels(), ["تحضيري", "روضة"])
+        self.assertEqual(stats.summary("روضة")["overall_average"], 100.0)
+        self.assertIsNone(stats.rank_of("أ"))
+
+    def test_json_store(self):
+        self.check_incremental_sync(storage.JournalStore(os.path.join(self.test_dir, "data.json")))
+
+    def test_sqlite_store(self):
+        store = storage.SQLiteStore(os.path.join(self.test_dir, "data.db"))
+        self.addCleanup(store.close)
+        self.check_incremental_sync(store)
+
+    def test_changes_from_another_process_are_applied(self):
+        path = os.path.join(self.test_dir, "data.json")
+        ours, theirs = storage.JournalStore(path), storage.JournalStore(path)
+        ours.put("أ", record("روضة", 0))
+        stats = analytics.ClassAnalytics().sync(ours)
+        theirs.put("أ", record("روضة", 2))
+        self.assertEqual(stats.sync(ours).summary()["overall_average"], 100.0)
+
+    def test_data_manager_dashboard_follows_saves(self):
+        with mock.patch.object(dm, "DATA_FILE", os.path.join(self.test_dir, "data.json")), \
+                mock.patch.object(dm, "HISTORY_FILE", os.path.join(self.test_dir, "history.db")):
+            dm.save_student_info("أ", {"class_level": "روضة"})
+            dm.save_evaluation("أ", "academic", {"الرياضيات": {"العد": 1}})
+            self.assertEqual(dm.class_analytics().summary("روضة")["overall_average"], 50.0)
+            dm.save_evaluation("أ", "academic", {"الرياضيات": {"العد": 2}})
+            self.assertEqual(dm.class_analytics().summary("روضة")["overall_average"], 100.0)
+
+if __name__ == '__main__':
+    unittest.main()
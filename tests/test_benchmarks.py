@@ -0,0 +1,44 @@
+import unittest
+import os
+import sys
+# Add parent directory to path to import the benchmark modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import data_manager as dm
+import run as bench
+from synthetic import make_roster
+
+class TestSyntheticRoster(unittest.TestCase):
+    def test_roster_is_deterministic_and_valid(self):
+        roster = make_roster(50, seed=3)
+        self.assertEqual(len(roster), 50)
+        self.assertEqual(roster, make_roster(50, seed=3))
+        for record in roster.values():
+            self.assertIn(record["info"]["class_level"], ["تحضيري", "روضة", "سنة أولى"])
+            for subject, skills in record["evaluations"]["academic"].items():
+                self.assertTrue(set(skills) <= set(dm.ACADEMIC_SUBJECTS[subject]))
+            stats = dm.calculate_scores(record["evaluations"])
+            self.assertTrue(0 <= stats["overall_percentage"] <= 100)
+
+class TestBenchmarkRunner(unittest.TestCase):
+    def test_measure_reports_percentiles(self):
+        stats = bench.measure(lambda: sum(range(1000)), repeat=4, items=10)
+        self.assertEqual(stats["n"], 4)
+        self.assertLessEqual(stats["p50_ms"], stats["p95_ms"])
+        self.assertLessEqual(stats["p95_ms"], stats["p99_ms"])
+        self.assertGreater(stats["throughput"], 0)
+        self.assertGreaterEqual(stats["peak_mb"], 0)
+
+    def test_compare_flags_only_regressions(self):
+        baseline = {"a": {"p50_ms": 10.0}, "b": {"p50_ms": 10.0}}
+        results = {"a": {"p50_ms": 14.0}, "b": {"p50_ms": 16.0}, "new": {"p50_ms": 99.0}}
+        self.assertEqual(bench.compare(results, baseline, tolerance=0.5), [("b", 10.0, 16.0)])
+
+    def test_selected_cases_run(self):
+        data_file = dm.DATA_FILE
+        results = bench.run(sizes=[20], only=["calculate_scores", "score_roster"], progress=None)
+        self.assertEqual(set(results), {"calculate_scores[x200]", "score_roster[20]"})
+        self.assertEqual(dm.DATA_FILE, data_file)
+
+if __name__ == '__main__':
+    unittest.main()
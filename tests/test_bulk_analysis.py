@@ -0,0 +1,97 @@
+import unittest
+import os
+import tempfile
+import shutil
+import sys
+import time
+from unittest import mock
+# Add parent directory to path to import data_manager
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import bulk_analysis
+import data_manager as dm
+from fake_openai import FakeOpenAIServer
+
+class TestBulkAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch.object(dm, "DATA_FILE", os.path.join(self.test_dir, "data.json")),
+            mock.patch.object(dm, "AI_CACHE_FILE", os.path.join(self.test_dir, "ai.db")),
+            mock.patch.object(dm, "HISTORY_FILE", os.path.join(self.test_dir, "history.db")),
+            mock.patch.dict(os.environ, {"CEREBRAS_API_KEY": "test-key"}),
+        ]
+        for p in self.patches:
+            p.start()
+        for i in range(6):
+            level = "روضة" if i < 4 else "تحضيري"
+            dm.save_student_info(f"تلميذ {i}", {"class_level": level, "gender": "ذكر"})
+            dm.save_evaluation(f"تلميذ {i}", "academic", {"الرياضيات": {"العد": i % 3}})
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.test_dir)
+
+    def test_class_is_analyzed_with_retries_and_persisted(self):
+        calls = []
+        with FakeOpenAIServer(statuses=[429, 503], delay=0.05) as server, \
+                mock.patch.object(dm, "AI_BASE_URL", server.base_url):
+            summary = bulk_analysis.analyze_class(
+                "روضة", rate=100, burst=10, backoff=0.01,
+                progress=lambda done, total, name, status: calls.append((done, total, status)),
+            )
+            self.assertEqual(summary["ok"], 4)
+            self.assertEqual(summary["failed"], 0)
+            self.assertEqual(len(server.requests), 4 + 2)
+            self.assertEqual([c[0] for c in calls], [1, 2, 3, 4])
+
+            record = dm.get_student("تلميذ 0")
+            self.assertIn("مجتهد", record["ai_report"]["narrative"])
+            self.assertIsNotNone(dm.saved_analysis("تلميذ 0", record))
+            self.assertNotIn("ai_report", dm.get_student("تلميذ 5"))
+
+            # تشغيل ثانٍ: كل النتائج محفوظة فلا طلبات جديدة
+            again = bulk_analysis.analyze_class("روضة", rate=100, burst=10)
+            self.assertEqual(again["cached"], 4)
+            self.assertEqual(len(server.requests), 6)
+
+    def test_requests_run_concurrently(self):
+        with FakeOpenAIServer(delay=0.3) as server, mock.patch.object(dm, "AI_BASE_URL", server.base_url):
+            summary = bulk_analysis.analyze_class(workers=6, rate=100, burst=10)
+        self.assertEqual(summary["ok"], 6)
+        self.assertLess(summary["elapsed"], 6 * 0.3)
+
+    def test_exhausted_retries_are_reported(self):
+        with FakeOpenAIServer(statuses=[500] * 10) as server, \
+                mock.patch.object(dm, "AI_BASE_URL", server.base_url):
+            summary = bulk_analysis.analyze_class(
+                names=["تلميذ 0"], rate=100, burst=10, max_retries=2, backoff=0.01
+            )
+        self.assertEqual(summary["failed"], 1)
+        self.assertEqual(len(server.requests), 3)
+        self.assertIn("تلميذ 0", summary["errors"])
+
+    def test_missing_student_is_reported_as_failed(self):
+        calls = []
+        with FakeOpenAIServer() as server, mock.patch.object(dm, "AI_BASE_URL", server.base_url):
+            summary = bulk_analysis.analyze_class(
+                names=["تلميذ 0", "غير موجود"], rate=100, burst=10,
+                progress=lambda done, total, name, status: calls.append((done, total, status)),
+            )
+        self.assertEqual((summary["total"], summary["ok"], summary["failed"]), (2, 1, 1))
+        self.assertIn("غير موجود", summary["errors"])
+        self.assertEqual(sorted(calls), [(1, 2, "failed"), (2, 2, "ok")])
+        self.assertEqual(len(server.requests), 1)
+
+class TestTokenBucket(unittest.TestCase):
+    def test_rate_is_enforced_after_burst(self):
+        bucket = bulk_analysis.TokenBucket(rate=50, capacity=2)
+        start = time.monotonic()
+        for _ in range(7):
+            bucket.acquire()
+        # دفعة أولى من طلبين ثم 5 طلبات بمعدل 50 في الثانية
+        self.assertGreaterEqual(time.monotonic() - start, 5 / 50 * 0.9)
+
+if __name__ == '__main__':
+    unittest.main()
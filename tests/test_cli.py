@@ -0,0 +1,84 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+import sys
+from unittest import mock
+# Add parent directory to path to import cli
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cli
+import data_manager as dm
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.out = os.path.join(self.test_dir, "out")
+        self.patches = [
+            mock.patch.object(dm, "DATA_FILE", os.path.join(self.test_dir, "data.json")),
+            mock.patch.object(dm, "AI_CACHE_FILE", os.path.join(self.test_dir, "ai.db")),
+            mock.patch.object(dm, "HISTORY_FILE", os.path.join(self.test_dir, "history.db")),
+        ]
+        for p in self.patches:
+            p.start()
+        dm.save_data({
+            "أحمد": {"info": {"class_level": "روضة", "gender": "ذكر"},
+                     "evaluations": {"academic": {"الرياضيات": {"العد": 2}}, "last_update": "2025-10-01"}},
+            "مريم": {"info": {"class_level": "روضة", "gender": "أنثى"},
+                     "evaluations": {"academic": {"الرياضيات": {"العد": 1}}, "last_update": "2025-12-20"}},
+            "يوسف": {"info": {"class_level": "تحضيري", "gender": "ذكر"},
+                     "evaluations": {"academic": {"الرياضيات": {"العد": 0}}, "last_update": "2025-12-21"}},
+        })
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.test_dir)
+
+    def test_filters(self):
+        self.assertEqual(cli.select_students(level="روضة"), ["أحمد", "مريم"])
+        self.assertEqual(cli.select_students(since="2025-12-01"), ["مريم", "يوسف"])
+        self.assertEqual(cli.select_students(level="روضة", since="2025-12-01"), ["مريم"])
+        self.assertEqual(cli.select_students(names=["يوسف"]), ["يوسف"])
+
+    def test_scores_export(self):
+        self.assertEqual(cli.main(["scores", "--level", "روضة", "--out", self.out]), 0)
+        with open(os.path.join(self.out, "scores.csv"), encoding="utf-8-sig") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith("أحمد,روضة,100.0"))
+        self.assertTrue(os.path.exists(os.path.join(self.out, "subjects.csv")))
+
+    def test_text_reports(self):
+        self.assertEqual(cli.main(["text", "--out", self.out, "--workers", "2"]), 0)
+        self.assertEqual(len(os.listdir(self.out)), 3)
+        with open(os.path.join(self.out, "Report_مريم.txt"), encoding="utf-8") as f:
+            self.assertIn("الاسم: مريم", f.read())
+
+    def test_pdf_reports_per_student(self):
+        self.assertEqual(cli.main(["pdf", "--name", "يوسف", "--out", self.out, "--workers", "1"]), 0)
+        self.assertEqual(os.listdir(self.out), ["Report_يوسف.pdf"])
+
+    def test_json_export(self):
+        self.assertEqual(cli.main(["json", "--level", "روضة", "--out", self.out]), 0)
+        with open(os.path.join(self.out, "students.json"), encoding="utf-8") as f:
+            self.assertEqual(sorted(json.load(f)), ["أحمد", "مريم"])
+
+    def test_sqlite_data_is_not_filled_from_working_json(self):
+        db = os.path.join(self.test_dir, "other.db")
+        with mock.patch.object(dm, "STORAGE_BACKEND", "json"), \
+                mock.patch.object(dm, "SQLITE_FILE", dm.SQLITE_FILE), \
+                mock.patch.object(dm, "MIGRATE_JSON_FILE", True):
+            self.assertEqual(cli.main(["json", "--backend", "sqlite", "--data", db, "--out", self.out]), 0)
+            self.assertEqual(dm.load_data(), {})
+        self.assertFalse(os.path.exists(self.out))
+
+    def test_sqlite_default_file_migrates_working_json(self):
+        with mock.patch.object(dm, "STORAGE_BACKEND", "json"), \
+                mock.patch.object(dm, "SQLITE_FILE", os.path.join(self.test_dir, "data.db")):
+            self.assertEqual(cli.main(["json", "--backend", "sqlite", "--out", self.out]), 0)
+        with open(os.path.join(self.out, "students.json"), encoding="utf-8") as f:
+            self.assertEqual(len(json.load(f)), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ import json
 import tempfile
 import shutil
 import sys
+from unittest import mock
 # Add parent directory to path to import data_manager
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import data_manager as dm
@@ -15,10 +16,13 @@ class TestDataManager(unittest.TestCase):
         # Override DATA_FILE in data_manager for testing
         self.original_data_file = dm.DATA_FILE
         dm.DATA_FILE = os.path.join(self.test_dir, "test_data.json")
+        self.original_history_file = dm.HISTORY_FILE
+        dm.HISTORY_FILE = os.path.join(self.test_dir, "history.db")
 
     def tearDown(self):
         # Restore original DATA_FILE
         dm.DATA_FILE = self.original_data_file
+        dm.HISTORY_FILE = self.original_history_file
         # Remove temporary directory
         shutil.rmtree(self.test_dir)
 
@@ -51,5 +55,114 @@ class TestDataManager(unittest.TestCase):
             # implementation uses st.error which writes to UI.
             pass
 
+    def test_save_evaluation_merges_into_current_record(self):
+        dm.save_student_info("a", {"class_level": "روضة"})
+        # جلستان تحفظان فئتين مختلفتين لنفس التلميذ
+        dm.save_evaluation("a", "academic", {"الرياضيات": {"العد": 2}})
+        dm.save_evaluation("a", "behavioral", {"م": {"ف": {"س": 1}}})
+
+        record = dm.get_student("a")
+        self.assertEqual(record["info"], {"class_level": "روضة"})
+        self.assertEqual(record["evaluations"]["academic"], {"الرياضيات": {"العد": 2}})
+        self.assertEqual(record["evaluations"]["behavioral"], {"م": {"ف": {"س": 1}}})
+        self.assertIn("last_update", record["evaluations"])
+
+    def test_unchanged_evaluation_is_not_saved(self):
+        dm.save_student_info("a", {"class_level": "روضة"})
+        dm.save_evaluation("a", "academic", {"الرياضيات": {"العد": 2, "الجمع": 1}})
+        dm.update_student("a", lambda r: {**r, "evaluations": {**r["evaluations"], "last_update": "2025-01-01"}})
+        revision = dm._store().revision("a")
+
+        with mock.patch.object(dm, "invalidate_scores") as invalidate:
+            dm.save_evaluation("a", "academic", {"الرياضيات": {"العد": 2, "الجمع": 1}})
+        invalidate.assert_not_called()
+        self.assertEqual(dm._store().revision("a"), revision)
+        self.assertEqual(dm.get_student("a")["evaluations"]["last_update"], "2025-01-01")
+
+        self.assertEqual(dm.evaluation_changes(dm.get_student("a"), "academic", {"الرياضيات": {"العد": 0}}),
+                         {("academic", "", "الرياضيات", "العد"): 0, ("academic", "", "الرياضيات", "الجمع"): -1})
+        dm.save_evaluation("a", "academic", {"الرياضيات": {"العد": 0, "الجمع": 1}})
+        evals = dm.get_student("a")["evaluations"]
+        self.assertEqual(evals["academic"], {"الرياضيات": {"العد": 0, "الجمع": 1}})
+        self.assertNotEqual(evals["last_update"], "2025-01-01")
+
+    def test_evaluation_for_unknown_student_is_rejected(self):
+        dm.save_student_info("a", {"class_level": "روضة"})
+        with self.assertRaises(KeyError):
+            dm.save_evaluation("غائب", "academic", {"الرياضيات": {"العد": 2}})
+        self.assertIsNone(dm.get_student("غائب"))
+        self.assertEqual(dm.list_students(), ["a"])
+        self.assertEqual(len(dm.student_trajectory("غائب")), 0)
+
+    def test_update_student_invalidates_only_on_change(self):
+        dm.save_student_info("a", {"class_level": "روضة"})
+        with mock.patch.object(dm, "invalidate_scores") as invalidate:
+            dm.update_student("a", lambda record: record)
+            invalidate.assert_not_called()
+            dm.save_student_info("a", {"class_level": "تحضيري"})
+            invalidate.assert_called_once_with("a")
+
+    def test_score_roster_matches_calculate_scores(self):
+        students = {
+            "a": {"info": {"class_level": "روضة"}, "evaluations": {
+                "academic": {"الرياضيات": {"الأعداد والحساب": 2, "القياس": 1}, "مادة أخرى": {"مهارة": 0}},
+                "behavioral": {"م": {"ف": {"س": 1}}}}},
+            "b": {"info": {}, "evaluations": {"behavioral": {"م": {"ف": {"س": 2}}}}},
+            "c": {"info": {}, "evaluations": {}},
+        }
+        result = dm.score_roster(students)
+        rows = result["students"].set_index("name")
+        for name, record in students.items():
+            expected = dm.calculate_scores(record["evaluations"])
+            for key, value in expected.items():
+                self.assertAlmostEqual(rows.loc[name, key], value)
+
+        skills = result["skills"].set_index("skill")
+        self.assertEqual(skills.loc["س", "rated"], 2)
+        self.assertEqual(skills.loc["س", "level_1"], 1)
+        self.assertAlmostEqual(skills.loc["س", "acquired_percentage"], 75.0)
+        subjects = result["subjects"].set_index("subject")
+        self.assertAlmostEqual(subjects.loc["الرياضيات", "percentage"], 75.0)
+
+    def test_student_scores_are_cached_until_saved(self):
+        dm.save_student_info("a", {"class_level": "روضة"})
+        dm.save_evaluation("a", "academic", {"الرياضيات": {"القياس": 2}})
+        with mock.patch.object(dm, "calculate_scores", wraps=dm.calculate_scores) as calc:
+            self.assertEqual(dm.student_scores("a")["academic_percentage"], 100.0)
+            self.assertEqual(dm.student_scores("a")["academic_percentage"], 100.0)
+            self.assertEqual(calc.call_count, 1)
+
+            dm.save_evaluation("a", "academic", {"الرياضيات": {"القياس": 0}})
+            self.assertEqual(dm.student_scores("a")["academic_percentage"], 0.0)
+            self.assertEqual(calc.call_count, 2)
+
+    def test_student_view_is_shared_until_saved(self):
+        dm.save_student_info("أحمد", {"class_level": "روضة", "gender": "ذكر"})
+        dm.save_evaluation("أحمد", "academic", {"الرياضيات": {"العد": 2}})
+        dm.save_evaluation("أحمد", "behavioral", {"السلوك": {"عام": {"الانضباط": 1}}})
+        view = dm.student_view("أحمد")
+        # كل الجلسات تحصل على نفس الكائن ما دام السجل لم يتغير
+        self.assertIs(dm.student_view("أحمد"), view)
+        self.assertEqual(view, dm.get_student("أحمد"))
+        self.assertEqual(json.loads(json.dumps(view)), dm.get_student("أحمد"))
+        with self.assertRaises(TypeError):
+            view["info"]["gender"] = "أنثى"
+        with self.assertRaises(TypeError):
+            view["evaluations"].pop("academic")
+
+        dm.save_evaluation("أحمد", "academic", {"الرياضيات": {"العد": 0}})
+        updated = dm.student_view("أحمد")
+        self.assertIsNot(updated, view)
+        self.assertEqual(updated["evaluations"]["academic"]["الرياضيات"]["العد"], 0)
+        self.assertEqual(view["evaluations"]["academic"]["الرياضيات"]["العد"], 2)
+        # الأجزاء التي لم تتغير مشتركة بين النسختين
+        self.assertIs(updated["info"], view["info"])
+        self.assertIs(updated["evaluations"]["behavioral"], view["evaluations"]["behavioral"])
+
+        copy = updated.thaw()
+        copy["info"]["gender"] = "أنثى"
+        self.assertEqual(dm.student_view("أحمد")["info"]["gender"], "ذكر")
+        self.assertIsNone(dm.student_view("غير موجود"))
+
 if __name__ == '__main__':
     unittest.main()
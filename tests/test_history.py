@@ -0,0 +1,114 @@
+import unittest
+import os
+import tempfile
+import shutil
+import sys
+from datetime import datetime
+from unittest import mock
+# Add parent directory to path to import history
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import history
+import data_manager as dm
+
+def evals(math, reading=None, attention=None):
+    result = {"academic": {"الرياضيات": {"العد": math, "الجمع": 2}}}
+    if reading is not None:
+        result["academic"]["اللغة العربية"] = {"القراءة": reading}
+    if attention is not None:
+        result["behavioral"] = {"م": {"التركيز": {"الانتباه": attention}}}
+    return result
+
+class TestHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.store = history.HistoryStore(os.path.join(self.test_dir, "history.db"))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_only_changed_ratings_are_stored(self):
+        self.assertIsNotNone(self.store.record("a", {}, evals(0), taken_at=datetime(2025, 10, 1)))
+        self.assertIsNone(self.store.record("a", evals(0), evals(0)))
+        self.store.record("a", evals(0), evals(2, reading=1), taken_at=datetime(2025, 11, 1))
+        row = self.store._conn.execute(
+            "SELECT length(scores) FROM snapshots ORDER BY snapshot_id DESC LIMIT 1"
+        ).fetchone()
+        self.assertEqual(row[0], 2)  # العد + القراءة فقط
+
+    def test_state_is_rebuilt_from_deltas(self):
+        self.store.record("a", {}, evals(0, reading=1), taken_at=datetime(2025, 10, 1))
+        self.store.record("a", evals(0, reading=1), evals(2, attention=1), taken_at=datetime(2026, 1, 10))
+        self.assertEqual(self.store.state_at("a", "2025-12-31 23:59:59"), history.flatten_ratings(evals(0, reading=1)))
+        self.assertEqual(self.store.state_at("a"), history.flatten_ratings(evals(2, attention=1)))
+
+    def test_trajectory_matches_calculate_scores(self):
+        steps = [evals(0), evals(1, attention=0), evals(2, reading=2, attention=2)]
+        before = {}
+        for month, after in zip((10, 11, 12), steps):
+            self.store.record("a", before, after, taken_at=datetime(2025, month, 1))
+            before = after
+        points = self.store.trajectory("a")
+        self.assertEqual(len(points), 3)
+        for point, step in zip(points, steps):
+            expected = dm.calculate_scores(step)
+            for key in ("academic_percentage", "behavioral_percentage", "overall_percentage"):
+                self.assertAlmostEqual(point[key], expected[key])
+
+    def test_class_average_uses_last_snapshot_per_term(self):
+        self.store.record("a", {}, evals(0), "روضة", taken_at=datetime(2025, 10, 1))
+        self.store.record("a", evals(0), evals(2), "روضة", taken_at=datetime(2025, 12, 1))
+        self.store.record("b", {}, evals(0), "روضة", taken_at=datetime(2025, 11, 1))
+        self.store.record("b", evals(0), evals(2), "روضة", taken_at=datetime(2026, 2, 1))
+        averages = {(r["term"], r["class_level"]): r for r in self.store.class_averages()}
+        first = averages[("2025/2026-1", "روضة")]
+        self.assertEqual(first["students"], 2)
+        self.assertAlmostEqual(first["average"], (100 + 50) / 2)
+        self.assertAlmostEqual(averages[("2025/2026-2", "روضة")]["average"], 100)
+
+    def test_term_boundaries(self):
+        self.assertEqual(history.term_of("2025-09-01"), "2025/2026-1")
+        self.assertEqual(history.term_of("2026-03-31"), "2025/2026-2")
+        self.assertEqual(history.term_of("2026-06-15"), "2025/2026-3")
+
+class TestEvaluationHistory(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch.object(dm, "DATA_FILE", os.path.join(self.test_dir, "data.json")),
+            mock.patch.object(dm, "HISTORY_FILE", os.path.join(self.test_dir, "history.db")),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.test_dir)
+
+    def test_each_form_save_is_recorded(self):
+        dm.save_student_info("a", {"class_level": "روضة"})
+        dm.save_evaluation("a", "academic", {"الرياضيات": {"العد": 0}})
+        dm.save_evaluation("a", "academic", {"الرياضيات": {"العد": 0}})  # دون تغيير
+        dm.save_evaluation("a", "behavioral", {"م": {"ف": {"س": 2}}})
+        trajectory = dm.student_trajectory("a")
+        self.assertEqual(list(trajectory["overall_percentage"]), [0.0, 50.0])
+        self.assertEqual(list(dm.class_term_averages()["class_level"]), ["روضة"])
+        # السجل الزمني لا يُضاف إلى ملف البيانات الرئيسي
+        self.assertEqual(set(dm.get_student("a")["evaluations"]), {"academic", "behavioral", "last_update"})
+
+    def test_delta_is_recorded_under_the_write_lock(self):
+        held = []
+        original = history.HistoryStore.record
+        def record(store, *args, **kwargs):
+            held.append(dm._store()._lock._depth > 0)
+            return original(store, *args, **kwargs)
+        dm.save_student_info("a", {"class_level": "روضة"})
+        with mock.patch.object(history.HistoryStore, "record", record):
+            dm.save_evaluation("a", "academic", {"الرياضيات": {"العد": 1}})
+            dm.save_evaluation("a", "academic", {"الرياضيات": {"العد": 1}})  # دون تغيير
+        self.assertEqual(held, [True])
+        self.assertEqual(len(dm.student_trajectory("a")), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# الحد الأقصى لزمن استيراد الوحدات الخفيفة (يشمل ملفاتها ومكتباتها القياسية فقط)
+IMPORT_BUDGET_MS = 300
+HEAVY_MODULES = ["streamlit", "openai", "pandas", "numpy", "fpdf"]
+
+def import_in_subprocess(module):
+    """استيراد module في عملية جديدة وإرجاع (الزمن بالمللي ثانية، المكتبات الثقيلة المحمّلة)"""
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = (time.perf_counter() - start) * 1000\n"
+        f"print(json.dumps([elapsed, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+class TestColdStart(unittest.TestCase):
+    def test_core_modules_skip_heavy_dependencies(self):
+        for module in ["data_manager", "storage", "history", "roster_import", "metrics"]:
+            elapsed, loaded = import_in_subprocess(module)
+            self.assertEqual(loaded, [], module)
+            self.assertLess(elapsed, IMPORT_BUDGET_MS, module)
+
+    def test_scoring_works_without_heavy_dependencies(self):
+        code = (
+            "import sys, data_manager as dm\n"
+            "s = dm.calculate_scores({'academic': {'الرياضيات': {'العد': 2}}})\n"
+            "print(s['academic_percentage'], 'pandas' in sys.modules)\n"
+        )
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.split(), ["100.0", "False"])
+
+    def test_storage_layer_does_not_import_data_manager(self):
+        code = (
+            "import os, sys, tempfile, storage\n"
+            "store = storage.JournalStore(os.path.join(tempfile.mkdtemp(), 'data.json'))\n"
+            "store.put('أ', {'info': {}, 'evaluations': {'academic': {'الرياضيات': {'القياس': 2}}}})\n"
+            "print(len(store.load_all()), 'data_manager' in sys.modules)\n"
+        )
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.split(), ["1", "False"])
+
+    def test_pdf_generator_skips_app_dependencies(self):
+        _, loaded = import_in_subprocess("pdf_generator")
+        self.assertNotIn("streamlit", loaded)
+        self.assertNotIn("openai", loaded)
+        self.assertNotIn("pandas", loaded)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import unittest
+import os
+import tempfile
+import shutil
+import sys
+import threading
+import time
+from unittest import mock
+# Add parent directory to path to import jobs
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import jobs
+import data_manager as dm
+from fake_openai import FakeOpenAIServer
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+
+    def queue(self, handlers, workers=0):
+        queue = jobs.JobQueue(os.path.join(self.test_dir, "jobs.db"), workers=workers, handlers=handlers)
+        self.addCleanup(queue.close)
+        return queue
+
+    def test_results_progress_and_failures(self):
+        def ok(job, progress):
+            progress(1, 2, "نصف")
+            return b"%PDF" + job["target"].encode()
+
+        def broken(job, progress):
+            raise jobs.JobError("تعذر")
+
+        queue = self.queue({"ok": ok, "broken": broken, "path": lambda job, progress: "/tmp/out.zip"})
+        first = queue.submit("ok", "أ")
+        second = queue.submit("broken", "ب")
+        third = queue.submit("path", "ج", {"level": "روضة"})
+        self.assertEqual(queue.get(first)["status"], jobs.QUEUED)
+        while queue.run_one():
+            pass
+        self.assertFalse(queue.run_one())
+
+        done = queue.get(first)
+        self.assertEqual((done["status"], done["done"], done["total"], done["message"]), (jobs.DONE, 1, 2, "نصف"))
+        self.assertEqual(queue.result(first), b"%PDF" + "أ".encode())
+        failed = queue.latest("broken", "ب")
+        self.assertEqual((failed["job_id"], failed["status"], failed["error"]), (second, jobs.FAILED, "تعذر"))
+        self.assertEqual(queue.get(third)["output"], "/tmp/out.zip")
+        self.assertEqual(queue.get(third)["params"], {"level": "روضة"})
+        with self.assertRaises(ValueError):
+            queue.submit("missing", "أ")
+
+    def test_duplicate_submissions_share_the_active_job(self):
+        queue = self.queue({"ok": lambda job, progress: None})
+        first = queue.submit("ok", "أ", {"refresh": True})
+        self.assertEqual(queue.submit("ok", "أ", {"refresh": True}), first)
+        self.assertNotEqual(queue.submit("ok", "أ"), first)
+        queue.run_one()
+        self.assertNotEqual(queue.submit("ok", "أ", {"refresh": True}), first)
+
+    def test_worker_threads_run_jobs_in_background(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow(job, progress):
+            started.set()
+            release.wait(5)
+
+        queue = self.queue({"slow": slow}, workers=2)
+        job_id = queue.submit("slow", "أ")
+        # submit لا ينتظر التنفيذ
+        self.assertTrue(started.wait(5))
+        self.assertEqual(queue.get(job_id)["status"], jobs.RUNNING)
+        release.set()
+        self.assertEqual(queue.wait(job_id, timeout=5)["status"], jobs.DONE)
+
+    def test_stale_running_jobs_are_retried(self):
+        queue = self.queue({"ok": lambda job, progress: None})
+        job_id = queue.submit("ok", "أ")
+        queue._claim()   # عملية حجزت المهمة ثم أُغلقت
+        self.assertFalse(queue.run_one())
+        with mock.patch.object(jobs, "JOB_STALE_AFTER", -1):
+            self.assertTrue(queue.run_one())
+        job = queue.get(job_id)
+        self.assertEqual((job["status"], job["attempts"]), (jobs.DONE, 2))
+
+    def test_long_running_job_keeps_its_heartbeat(self):
+        queue = self.queue({})
+        seen = {}
+
+        def slow(job, progress):
+            # لا تقدم مُبلغ عنه: النبض الدوري وحده يمنع عاملاً آخر من إعادة المهمة
+            time.sleep(0.3)
+            with mock.patch.object(jobs, "JOB_STALE_AFTER", 0.2):
+                seen["reclaimed"] = queue._claim()
+
+        queue.handlers = {"slow": slow}
+        job_id = queue.submit("slow", "أ")
+        with mock.patch.object(jobs, "JOB_HEARTBEAT_INTERVAL", 0.05):
+            self.assertTrue(queue.run_one())
+        self.assertIsNone(seen["reclaimed"])
+        job = queue.get(job_id)
+        self.assertEqual((job["status"], job["attempts"]), (jobs.DONE, 1))
+
+class TestJobHandlers(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch.object(dm, "DATA_FILE", os.path.join(self.test_dir, "data.json")),
+            mock.patch.object(dm, "AI_CACHE_FILE", os.path.join(self.test_dir, "ai.db")),
+            mock.patch.object(dm, "HISTORY_FILE", os.path.join(self.test_dir, "history.db")),
+            mock.patch.dict(os.environ, {"CEREBRAS_API_KEY": "test-key"}),
+        ]
+        for p in self.patches:
+            p.start()
+        self.queue = jobs.JobQueue(os.path.join(self.test_dir, "jobs.db"), workers=0)
+        dm.save_student_info("أحمد", {"class_level": "روضة", "gender": "ذكر"})
+        dm.save_evaluation("أحمد", "academic", {"الرياضيات": {"العد": 2}})
+
+    def tearDown(self):
+        self.queue.close()
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.test_dir)
+
+    def test_analysis_result_is_saved_in_the_store(self):
+        with FakeOpenAIServer() as server, mock.patch.object(dm, "AI_BASE_URL", server.base_url):
+            job_id = self.queue.submit("analysis", "أحمد")
+            self.queue.run_one()
+        self.assertEqual(self.queue.get(job_id)["status"], jobs.DONE)
+        self.assertIsNotNone(dm.saved_analysis("أحمد", dm.get_student("أحمد")))
+
+    def test_analysis_errors_fail_the_job(self):
+        with FakeOpenAIServer(statuses=[500] * 10) as server, mock.patch.object(dm, "AI_BASE_URL", server.base_url):
+            job_id = self.queue.submit("analysis", "أحمد")
+            self.queue.run_one()
+        job = self.queue.get(job_id)
+        self.assertEqual(job["status"], jobs.FAILED)
+        self.assertTrue(job["error"])
+        self.assertNotIn("ai_report", dm.get_student("أحمد"))
+
+    def test_failed_refresh_keeps_the_saved_analysis(self):
+        with FakeOpenAIServer() as server, mock.patch.object(dm, "AI_BASE_URL", server.base_url):
+            self.queue.submit("analysis", "أحمد")
+            self.queue.run_one()
+        report = dm.get_student("أحمد")["ai_report"]
+        cached = dm.cached_analysis("أحمد", dm.get_student("أحمد")["evaluations"], "ذكر")
+
+        with FakeOpenAIServer(statuses=[500] * 10) as server, mock.patch.object(dm, "AI_BASE_URL", server.base_url):
+            job_id = self.queue.submit("analysis", "أحمد", {"refresh": True})
+            self.queue.run_one()
+        self.assertEqual(self.queue.get(job_id)["status"], jobs.FAILED)
+        self.assertEqual(dm.get_student("أحمد")["ai_report"], report)
+        self.assertEqual(dm.cached_analysis("أحمد", dm.get_student("أحمد")["evaluations"], "ذكر"), cached)
+
+    def test_pdf_job_returns_the_file(self):
+        job_id = self.queue.submit("pdf", "أحمد")
+        self.queue.run_one()
+        self.assertTrue(self.queue.result(job_id).startswith(b"%PDF"))
+        self.queue.submit("pdf", "غائب")
+        self.queue.run_one()
+        self.assertEqual(self.queue.latest("pdf", "غائب")["status"], jobs.FAILED)
+
+if __name__ == '__main__':
+    unittest.main()
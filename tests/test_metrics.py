@@ -0,0 +1,79 @@
+import unittest
+import os
+import tempfile
+import shutil
+import sys
+from unittest import mock
+# Add parent directory to path to import metrics
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import metrics
+import data_manager as dm
+import pdf_generator
+from fake_openai import FakeOpenAIServer
+
+EVALS = {"academic": {"الرياضيات": {"العد": 2, "الجمع": 1}}, "last_update": "2025-01-01"}
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        patcher = mock.patch.object(metrics, "ENABLED", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(metrics.reset)
+
+    def test_disabled_records_nothing(self):
+        metrics.enable(False)
+        dm.calculate_scores(EVALS)
+        with metrics.span("block"):
+            pass
+        metrics.count("hits")
+        metrics.observe("ai.first_content", 0.5)
+        self.assertEqual(metrics.snapshot(), {"timings": {}, "counters": {}})
+
+    def test_timed_and_span_record_durations(self):
+        dm.calculate_scores(EVALS)
+        dm.calculate_scores(EVALS)
+        with metrics.span("block"):
+            pass
+        timings = metrics.snapshot()["timings"]
+        self.assertEqual(timings["calculate_scores"]["count"], 2)
+        self.assertEqual(timings["block"]["count"], 1)
+        self.assertLessEqual(timings["calculate_scores"]["p50_ms"], timings["calculate_scores"]["max_ms"])
+
+    def test_pdf_stages_are_timed(self):
+        pdf_generator.create_pdf("أ", {"gender": "ذكر"}, EVALS, "نص", [])
+        timings = metrics.snapshot()["timings"]
+        for stage in ["pdf.generate", "pdf.draw_student_details", "pdf.draw_columnar_table", "pdf.output"]:
+            self.assertIn(stage, timings)
+        self.assertEqual(timings["pdf.draw_columnar_table"]["count"], 2)
+
+    def test_ai_token_usage_is_counted(self):
+        test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir)
+        with FakeOpenAIServer() as server, \
+                mock.patch.object(dm, "AI_BASE_URL", server.base_url), \
+                mock.patch.object(dm, "AI_CACHE_FILE", os.path.join(test_dir, "ai.db")), \
+                mock.patch.dict(os.environ, {"CEREBRAS_API_KEY": "test-key"}):
+            dm.analyze_student_performance("أحمد", EVALS, "ذكر")
+            dm.analyze_student_performance("أحمد", EVALS, "ذكر")
+        stats = metrics.snapshot()
+        self.assertEqual(stats["counters"]["ai.requests"], 1)
+        self.assertEqual(stats["counters"]["ai.cache_hits"], 1)
+        self.assertEqual(stats["counters"]["ai.prompt_tokens"], 100)
+        self.assertEqual(stats["counters"]["ai.completion_tokens"], 50)
+        self.assertEqual(stats["timings"]["ai.request"]["count"], 1)
+
+    def test_exports(self):
+        metrics.observe("load_data", 0.25)
+        metrics.count("ai.prompt_tokens", 7)
+        lines = metrics.export_jsonl().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('"name": "load_data"', lines[0])
+        prom = metrics.export_prometheus()
+        self.assertIn('students_operation_seconds_count{op="load_data"} 1', prom)
+        self.assertIn('students_operation_seconds_sum{op="load_data"} 0.250000', prom)
+        self.assertIn("students_ai_prompt_tokens_total 7", prom)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import io
+import os
+import tempfile
+import shutil
+import sys
+import zipfile
+from unittest import mock
+# Add parent directory to path to import pdf_generator
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pdf_generator
+
+INFO = {"class_level": "القسم التحضيري", "dob": "2020-01-01", "gender": "ذكر"}
+EVALS = {
+    "academic": {"الرياضيات": {"العد": 2, "الجمع": 1}},
+    "behavioral": {"الوظائف الذهنية": {"الانتباه": {"التركيز": 0}}},
+}
+
+def make_jobs(count):
+    return [(f"تلميذ {i}", INFO, EVALS, "نص تجريبي للتحليل التربوي.", []) for i in range(count)]
+
+class TestPdfBatch(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_zip_archive_has_one_pdf_per_student(self):
+        out = os.path.join(self.test_dir, "reports.zip")
+        progress = []
+        written, errors = pdf_generator.create_pdf_batch(
+            make_jobs(3), out, workers=2, progress=lambda done, total, name: progress.append(done)
+        )
+        self.assertEqual((written, errors), (3, {}))
+        self.assertEqual(progress, [1, 2, 3])
+        with zipfile.ZipFile(out) as archive:
+            names = archive.namelist()
+            self.assertEqual(names, [pdf_generator.report_filename(f"تلميذ {i}") for i in range(3)])
+            self.assertTrue(archive.read(names[0]).startswith(b"%PDF"))
+
+    def test_merged_pdf_contains_every_report(self):
+        from pypdf import PdfReader
+        single, _ = pdf_generator.create_pdf(*make_jobs(1)[0])
+        pages_per_report = len(PdfReader(io.BytesIO(single)).pages)
+
+        out = os.path.join(self.test_dir, "reports.pdf")
+        written, errors = pdf_generator.create_pdf_batch(make_jobs(3), out, merged=True, workers=2)
+        self.assertEqual((written, errors), (3, {}))
+        self.assertEqual(len(PdfReader(out).pages), 3 * pages_per_report)
+
+    def test_generator_input_is_merged_in_order(self):
+        from pypdf import PdfReader
+        import arabic_reshaper
+        out = os.path.join(self.test_dir, "merged.pdf")
+        progress = []
+        written, errors = pdf_generator.create_pdf_batch(
+            iter(make_jobs(3)), out, merged=True, workers=2, total=3,
+            progress=lambda done, total, name: progress.append((done, total)),
+        )
+        self.assertEqual((written, errors), (3, {}))
+        self.assertEqual(progress, [(1, 3), (2, 3), (3, 3)])
+        reader = PdfReader(out, strict=True)
+        marker = arabic_reshaper.reshape("تلميذ")
+        names = [text.split(marker)[0][-2] for text in (p.extract_text() for p in reader.pages) if marker in text]
+        self.assertEqual(names, ["0", "1", "2"])
+
+    def test_empty_batch_starts_no_workers(self):
+        with mock.patch.object(pdf_generator.multiprocessing, "get_context") as get_context:
+            self.assertEqual(pdf_generator.create_pdf_batch(iter([]), os.path.join(self.test_dir, "x.zip")), (0, {}))
+        get_context.assert_not_called()
+        self.assertNotEqual(pdf_generator.POOL_START_METHOD, "fork")
+
+if __name__ == '__main__':
+    unittest.main()
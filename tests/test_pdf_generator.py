@@ -0,0 +1,116 @@
+import unittest
+import io
+import os
+import sys
+from unittest import mock
+# Add parent directory to path to import pdf_generator
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pdf_generator
+
+INFO = {"class_level": "القسم التحضيري", "dob": "2020-01-01", "gender": "ذكر"}
+EVALS = {"academic": {"الرياضيات": {"العد": 2, "الجمع": 1}}}
+
+class TestFontCache(unittest.TestCase):
+    def test_reports_share_parsed_fonts(self):
+        first = pdf_generator.PDFReport("أ", INFO)
+        second = pdf_generator.PDFReport("ب", INFO)
+        self.assertTrue(first.custom_font_loaded)
+        self.assertIsNot(first.fonts["amiri"], second.fonts["amiri"])
+        self.assertIs(first.fonts["amiri"].cw, second.fonts["amiri"].cw)
+        self.assertIsNot(first.fonts["amiri"].subset, second.fonts["amiri"].subset)
+
+    def test_add_font_is_used_when_sharing_fails(self):
+        with mock.patch.object(pdf_generator, "_attach_font", side_effect=AttributeError("internals")), \
+                mock.patch("builtins.print") as printed:
+            pdf = pdf_generator.PDFReport("أ", INFO)
+        self.assertTrue(pdf.custom_font_loaded)
+        self.assertEqual(pdf.font_family, "Amiri")
+        self.assertIn("amiriB", pdf.fonts)
+        self.assertIn("falling back to add_font", printed.call_args[0][0])
+        pdf.add_page()
+        pdf.set_font(pdf.font_family, '', 11)
+        text = pdf.process_text("تلميذ مجتهد")
+        self.assertAlmostEqual(pdf.text_width(text), pdf.get_string_width(text), places=6)
+
+    def test_text_width_matches_fpdf(self):
+        pdf = pdf_generator.PDFReport("أ", INFO)
+        pdf.add_page()
+        pdf.set_font(pdf.font_family, '', 11)
+        text = pdf.process_text("تلميذ مجتهد في القراءة 123")
+        self.assertAlmostEqual(pdf.text_width(text), pdf.get_string_width(text), places=6)
+
+    def test_consecutive_reports_embed_their_own_glyphs(self):
+        from pypdf import PdfReader
+        pdf_generator.create_pdf("أ", INFO, EVALS, "نص أول", [])
+        pdf_bytes, error = pdf_generator.create_pdf("ب", INFO, EVALS, "ظفر وثقة", [])
+        self.assertIsNone(error)
+        text = "".join(page.extract_text() for page in PdfReader(io.BytesIO(pdf_bytes)).pages)
+        import arabic_reshaper
+        self.assertIn(arabic_reshaper.reshape("ظفر وثقة"), text)
+
+class TestShaping(unittest.TestCase):
+    def test_shaped_text_matches_reshaper_and_bidi(self):
+        import arabic_reshaper
+        from bidi.algorithm import get_display
+        for text in ["مكتسب", "تلميذ 12 سنة", "Ali علي"]:
+            self.assertEqual(pdf_generator.shape_text(text), get_display(arabic_reshaper.reshape(text)))
+
+    def test_catalog_labels_are_precomputed(self):
+        pdf_generator.PDFReport("أ", INFO)
+        labels = pdf_generator.shaped_labels()
+        for label in ["الرياضيات", "القراءة", "الاستقلالية", "في طريق الاكتساب"]:
+            self.assertIn(label, labels)
+        pdf_generator._shape.cache_clear()
+        pdf_generator.shape_text("في طريق الاكتساب")
+        self.assertEqual(pdf_generator._shape.cache_info().misses, 0)
+
+class TestLineBreaking(unittest.TestCase):
+    WIDTHS = [12, 30, 7, 25, 18, 40, 9, 22, 15, 31, 6, 27]
+
+    def naive_break(self, widths, space, max_width):
+        lines, line = [], []
+        for i, w in enumerate(widths):
+            test = line + [i]
+            if sum(widths[j] for j in test) + space * (len(test) - 1) > max_width and line:
+                lines.append((line[0], line[-1] + 1))
+                line = [i]
+            else:
+                line = test
+        if line:
+            lines.append((line[0], line[-1] + 1))
+        return lines
+
+    def line_width(self, start, end, space=3):
+        return sum(self.WIDTHS[start:end]) + space * (end - start - 1)
+
+    def test_greedy_matches_naive_wrapping(self):
+        for max_width in (20, 45, 60, 100, 500):
+            self.assertEqual(pdf_generator.break_lines(self.WIDTHS, 3, max_width),
+                             self.naive_break(self.WIDTHS, 3, max_width))
+
+    def test_optimal_lines_fit_and_cover_all_words(self):
+        lines = pdf_generator.break_lines(self.WIDTHS, 3, 60, optimal=True)
+        self.assertEqual(lines[0][0], 0)
+        self.assertEqual(lines[-1][1], len(self.WIDTHS))
+        for (_, end), (start, _) in zip(lines, lines[1:]):
+            self.assertEqual(end, start)
+        for start, end in lines:
+            self.assertLessEqual(self.line_width(start, end), 60)
+
+    def test_overlong_word_gets_its_own_line(self):
+        self.assertEqual(pdf_generator.break_lines([5, 80, 5], 1, 50), [(0, 1), (1, 2), (2, 3)])
+        self.assertEqual(pdf_generator.break_lines([5, 80, 5], 1, 50, optimal=True), [(0, 1), (1, 2), (2, 3)])
+
+    def test_height_is_known_before_drawing(self):
+        pdf = pdf_generator.PDFReport("أ", INFO)
+        pdf.add_page()
+        pdf.set_font(pdf.font_family, '', 11)
+        narrative = "تلميذ مجتهد يشارك بفعالية في القسم " * 12 + "\n\nيحتاج إلى دعم في الكتابة."
+        height = pdf.arabic_text_height(180, 7, narrative, optimal=True)
+        top = pdf.get_y()
+        pdf.arabic_multi_cell(180, 7, narrative, 'R', optimal=True)
+        self.assertAlmostEqual(pdf.get_y() - top, height)
+        self.assertGreater(height, 7 * 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import io
+import os
+import tempfile
+import shutil
+import sys
+from unittest import mock
+# Add parent directory to path to import roster_import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_manager as dm
+import roster_import
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+HTML_SHEET = """<html><body><table>
+<tr><td colspan=4>مدرسة النور - قائمة التلاميذ</td></tr>
+<tr><td>اللقب</td><td>الاسم</td><td>تاريخ الميلاد</td><td>الجنس</td><td>القسم</td></tr>
+<tr><td>بن علي</td><td>أحمد</td><td>05/03/2019</td><td>ذكر</td><td>تحضيري&nbsp;1</td></tr>
+<tr><td>سعدي</td><td>مريم</td><td>2019-11-20</td><td>أنثى</td><td>تحضيري 1</td></tr>
+</table></body></html>"""
+
+class TestRosterImport(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch.object(dm, "DATA_FILE", os.path.join(self.test_dir, "data.json")),
+            mock.patch.object(dm, "HISTORY_FILE", os.path.join(self.test_dir, "history.db")),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.test_dir)
+
+    def write(self, name, content, encoding="utf-8"):
+        path = os.path.join(self.test_dir, name)
+        with open(path, "w", encoding=encoding, newline="") as f:
+            f.write(content)
+        return path
+
+    def test_html_export_is_normalized(self):
+        summary = roster_import.import_roster(self.write("Eleve.xls", HTML_SHEET))
+        self.assertEqual((summary["added"], summary["errors"]), (2, []))
+        self.assertEqual(dm.get_student("أحمد بن علي")["info"],
+                         {"dob": "2019-03-05", "gender": "ذكر", "class_level": "تحضيري 1"})
+        self.assertEqual(dm.get_student("مريم سعدي")["info"]["gender"], "أنثى")
+
+    def test_duplicates_are_skipped_or_updated(self):
+        dm.save_student_info("علي", {"class_level": "روضة", "id": "7"})
+        csv_text = "Matricule;Nom et prénom;Sexe;Classe\n7;علي;M;تحضيري\n8;سارة;F;تحضيري\n8;سارة;F;تحضيري\n"
+        path = self.write("roster.csv", csv_text, encoding="cp1256")
+        summary = roster_import.import_roster(path)
+        self.assertEqual((summary["added"], summary["duplicates"]), (1, 2))
+        self.assertEqual(dm.get_student("علي")["info"]["class_level"], "روضة")
+
+        summary = roster_import.import_roster(path, update_existing=True)
+        self.assertEqual(summary["updated"], 2)
+        self.assertEqual(dm.get_student("علي")["info"], {"class_level": "تحضيري", "id": "7", "gender": "ذكر"})
+
+    def test_large_roster_is_written_once(self):
+        lines = ["الاسم الكامل,تاريخ الميلاد,الجنس"]
+        lines += [f"تلميذ {i},{(i % 28) + 1}/09/2019,{'ذكر' if i % 2 else 'أنثى'}" for i in range(5000)]
+        path = self.write("big.csv", "\n".join(lines))
+        with mock.patch.object(dm, "update_students", wraps=dm.update_students) as update:
+            summary = roster_import.import_roster(path, default_level="تحضيري", chunk_rows=700)
+        self.assertEqual(summary["added"], 5000)
+        self.assertEqual(update.call_count, 1)
+        self.assertEqual(len(dm.student_infos()), 5000)
+        self.assertEqual(dm.get_student("تلميذ 4999")["info"]["class_level"], "تحضيري")
+
+    def test_frameset_without_sheet_is_reported(self):
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Eleve.xls")
+        with self.assertRaises(ValueError):
+            roster_import.import_roster(path)
+
+    @unittest.skipUnless(openpyxl, "openpyxl غير مثبت")
+    def test_xlsx_upload(self):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(["الاسم واللقب", "تاريخ الميلاد", "الجنس"])
+        sheet.append(["ياسين", 43600, "ذكر"])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        summary = roster_import.import_roster(buffer)
+        self.assertEqual(summary["added"], 1)
+        self.assertEqual(dm.get_student("ياسين")["info"]["dob"], "2019-05-15")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import os
+import tempfile
+import shutil
+import sys
+from unittest import mock
+# Add parent directory to path to import data_manager
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_manager as dm
+
+INFOS = {
+    "أحمد بن علي": {"class_level": "روضة", "id": "S-1001"},
+    "فاطمة الزهراء": {"class_level": "تحضيري", "id": "S-1002"},
+    "إسماعيل مُصطفى": {"class_level": "روضة", "id": "S-2001"},
+    "عائشة": {"class_level": "تحضيري"},
+    "آمنة": {"class_level": "روضة"},
+}
+
+class TestNormalization(unittest.TestCase):
+    def test_arabic_letters_are_folded(self):
+        self.assertEqual(dm.normalize_arabic("أحمد"), dm.normalize_arabic("احمد"))
+        self.assertEqual(dm.normalize_arabic("فاطمة"), "فاطمه")
+        self.assertEqual(dm.normalize_arabic("مُصْطَفَى"), "مصطفي")
+        self.assertEqual(dm.normalize_arabic("عائـــشة"), "عايشه")
+        self.assertEqual(dm.normalize_arabic("  S-1001   Ali "), "s-1001 ali")
+
+class TestStudentIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = dm.StudentIndex(INFOS)
+
+    def names(self, query="", **kwargs):
+        return self.index.search(query, **kwargs)[1]
+
+    def test_prefix_and_folded_matches(self):
+        self.assertEqual(self.names("احم"), ["أحمد بن علي"])
+        self.assertEqual(self.names("اسماعيل"), ["إسماعيل مُصطفى"])
+        self.assertEqual(self.names("فاطمه"), ["فاطمة الزهراء"])
+        self.assertEqual(self.names("امن"), ["آمنة"])
+
+    def test_infix_and_multi_term_matches(self):
+        self.assertEqual(self.names("زهرا"), ["فاطمة الزهراء"])
+        self.assertEqual(self.names("علي احمد"), ["أحمد بن علي"])
+        self.assertEqual(self.names("علي فاطمة"), [])
+        # مقطع أقصر من طول الفهرس لا يُبحث عنه إلا في بداية الكلمات
+        self.assertEqual(self.names("مد"), [])
+
+    def test_id_search(self):
+        self.assertEqual(self.names("s-100"), ["أحمد بن علي", "فاطمة الزهراء"])
+        self.assertEqual(self.names("2001"), ["إسماعيل مُصطفى"])
+
+    def test_level_filter_and_pagination(self):
+        self.assertEqual(self.index.levels(), ["تحضيري", "روضة"])
+        self.assertEqual(self.index.names_in("تحضيري"), ["فاطمة الزهراء", "عائشة"])
+        self.assertEqual(self.names("s-", level="روضة"), ["أحمد بن علي", "إسماعيل مُصطفى"])
+        total, page = self.index.search(level="روضة", offset=1, limit=1)
+        self.assertEqual((total, page), (3, ["إسماعيل مُصطفى"]))
+        total, page = self.index.search(offset=4, limit=2)
+        self.assertEqual((total, page), (5, ["آمنة"]))
+
+class TestStudentIndexCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        patcher = mock.patch.object(dm, "DATA_FILE", os.path.join(self.test_dir, "data.json"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.test_dir)
+
+    def test_index_is_rebuilt_only_after_changes(self):
+        dm.save_student_info("أحمد", {"class_level": "روضة"})
+        first = dm.student_index()
+        self.assertIs(dm.student_index(), first)
+        dm.save_student_info("آمنة", {"class_level": "روضة"})
+        second = dm.student_index()
+        self.assertIsNot(second, first)
+        self.assertIn("آمنة", second)
+        self.assertEqual(second.search("امنه")[1], ["آمنة"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+import sys
+from unittest import mock
+# Add parent directory to path to import serialization
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import data_manager as dm
+import serialization
+import storage
+from test_skill_catalog import full_record
+
+class TestSnapshotFormats(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "data.json")
+        self.roster = {f"تلميذ {i}": full_record(i) for i in range(20)}
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def head(self):
+        with open(self.path, "rb") as f:
+            return f.read(len(serialization.MSGPACK_MAGIC))
+
+    def test_default_snapshot_is_compact_json(self):
+        storage.JournalStore(self.path).replace_all(self.roster)
+        self.assertTrue(self.head().startswith(b"{"))
+        with open(self.path, encoding="utf-8") as f:
+            self.assertNotIn("\n", f.read())
+        self.assertEqual(storage.JournalStore(self.path).load_all(), self.roster)
+
+    def test_large_files_are_read_through_mmap(self):
+        storage.JournalStore(self.path).replace_all(self.roster)
+        with mock.patch.object(serialization, "MMAP_MIN_BYTES", 0):
+            self.assertEqual(storage.JournalStore(self.path).load_all(), self.roster)
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            serialization.get_codec("yaml")
+
+    def test_missing_msgpack_falls_back_to_json(self):
+        with mock.patch.object(serialization, "msgpack", None):
+            self.assertIs(serialization.get_codec("msgpack"), serialization.CODECS["json"])
+
+    @unittest.skipUnless(serialization.msgpack, "msgpack غير مثبتة")
+    def test_msgpack_snapshot_is_smaller_and_converts_both_ways(self):
+        storage.JournalStore(self.path).replace_all(self.roster)
+        json_size = os.path.getsize(self.path)
+
+        binary = storage.JournalStore(self.path, serialization.get_codec("msgpack"))
+        self.assertEqual(binary.load_all(), self.roster)
+        # أول حفظ بعد تغيير الصيغة يعيد كتابة اللقطة بالصيغة الجديدة
+        binary.put("جديد", full_record(99))
+        self.assertEqual(self.head(), serialization.MSGPACK_MAGIC)
+        self.assertLess(os.path.getsize(self.path), json_size)
+        self.assertFalse(os.path.exists(binary.journal_path))
+
+        # المخزن بصيغة JSON يقرأ الملف الثنائي ثم يعيده إلى JSON
+        self.roster["جديد"] = full_record(99)
+        plain = storage.JournalStore(self.path)
+        self.assertEqual(plain.load_all(), self.roster)
+        with mock.patch.object(serialization, "MMAP_MIN_BYTES", 0):
+            self.assertEqual(storage.JournalStore(self.path).load_all(), self.roster)
+        plain.delete("جديد")
+        self.assertTrue(self.head().startswith(b"{"))
+        del self.roster["جديد"]
+        self.assertEqual(storage.JournalStore(self.path).load_all(), self.roster)
+
+    @unittest.skipUnless(serialization.msgpack, "msgpack غير مثبتة")
+    def test_truncated_msgpack_is_reported_as_corrupt(self):
+        storage.JournalStore(self.path, serialization.get_codec("msgpack")).replace_all(self.roster)
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) // 2)
+        with self.assertRaises(ValueError):
+            storage.JournalStore(self.path).load_all()
+
+class TestPrettyExport(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        patcher = mock.patch.object(dm, "DATA_FILE", os.path.join(self.test_dir, "data.json"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.test_dir)
+
+    def test_export_is_indented_and_readable_as_a_snapshot(self):
+        roster = {"أحمد": full_record(1), "مريم": full_record(2)}
+        dm.save_data(roster)
+        out = os.path.join(self.test_dir, "export.json")
+        self.assertEqual(dm.export_json(out), 2)
+        with open(out, encoding="utf-8") as f:
+            text = f.read()
+        self.assertIn('\n    "أحمد": {', text)
+        self.assertEqual(json.loads(text), roster)
+        # الملف المصدَّر يصلح ملف بيانات كما هو
+        self.assertEqual(storage.JournalStore(out).load_all(), roster)
+        self.assertEqual(dm.export_json(out, ["مريم", "غير موجود"]), 1)
+
+if __name__ == '__main__':
+    unittest.main()
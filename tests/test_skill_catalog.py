@@ -0,0 +1,102 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+import sys
+# Add parent directory to path to import skill_catalog
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_manager as dm
+import skill_catalog
+import storage
+
+def full_record(seed):
+    """سجل كما تكتبه نماذج التقييم: كل المواد والمهارات مقيّمة"""
+    scores = iter(range(seed, seed + 1000))
+    return {
+        "info": {"class_level": "روضة", "gender": "ذكر", "dob": "2020-01-01"},
+        "evaluations": {
+            "academic": {s: {k: next(scores) % 3 for k in skills} for s, skills in dm.ACADEMIC_SUBJECTS.items()},
+            "behavioral": {m: {s: {k: next(scores) % 3 for k in skills} for s, skills in subs.items()}
+                           for m, subs in dm.BEHAVIORAL_SKILLS.items()},
+            "last_update": "2025-12-01",
+        },
+    }
+
+class TestSkillCatalog(unittest.TestCase):
+    def setUp(self):
+        self.catalog = skill_catalog.SkillCatalog(skill_catalog.default_paths())
+
+    def assertRoundTrip(self, record, packed=True):
+        compact = skill_catalog.pack_record(self.catalog, record)
+        self.assertEqual(skill_catalog.RATINGS_KEY in compact, packed)
+        restored = skill_catalog.unpack_record(self.catalog, compact)
+        self.assertEqual(restored, record)
+        self.assertEqual(json.dumps(restored["evaluations"].get("academic"), ensure_ascii=False),
+                         json.dumps(record["evaluations"].get("academic"), ensure_ascii=False))
+
+    def test_form_records_are_packed_losslessly(self):
+        for seed in range(3):
+            self.assertRoundTrip(full_record(seed))
+
+    def test_unpackable_records_are_kept_as_is(self):
+        self.assertRoundTrip({"info": {}, "evaluations": {}}, packed=False)
+        self.assertRoundTrip({"info": {}, "evaluations": {"academic": {"الرياضيات": {}}}}, packed=False)
+        self.assertRoundTrip({"info": {}, "evaluations": {"academic": {"الرياضيات": {"العد": 5}}}}, packed=False)
+        self.assertRoundTrip({"info": {}, "evaluations": {"academic": {"الرياضيات": {"العد": True}}}}, packed=False)
+        # ترتيب مخالف لترتيب الفهرس
+        record = full_record(0)
+        academic = record["evaluations"]["academic"]
+        record["evaluations"]["academic"] = dict(reversed(list(academic.items())))
+        self.assertRoundTrip(record, packed=False)
+
+    def test_new_skills_are_appended(self):
+        size = len(self.catalog)
+        record = {"info": {}, "evaluations": {"academic": {"مادة جديدة": {"مهارة": 2}}, "behavioral": {}}}
+        self.assertRoundTrip(record)
+        self.assertEqual(len(self.catalog), size + 1)
+
+class TestPackedStore(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "data.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_old_files_are_read_and_shrink_on_compaction(self):
+        roster = {f"تلميذ {i}": full_record(i) for i in range(50)}
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(roster, f, ensure_ascii=False, indent=4)
+        old_size = os.path.getsize(self.path)
+
+        store = storage.JournalStore(self.path)
+        self.assertEqual(store.load_all(), roster)
+        store.compact()
+        self.assertLess(os.path.getsize(self.path) * 5, old_size)
+        self.assertEqual(storage.JournalStore(self.path).load_all(), roster)
+
+    def test_student_names_are_not_reserved(self):
+        roster = {"__catalog__": full_record(1), "format": full_record(2), "students": {"info": {}, "evaluations": {}}}
+        storage.JournalStore(self.path).replace_all(roster)
+        self.assertEqual(storage.JournalStore(self.path).load_all(), roster)
+        # ملف قديم بنفس الأسماء (الاسم -> السجل) يُقرأ كما هو
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(roster, f, ensure_ascii=False)
+        self.assertEqual(storage.JournalStore(self.path).load_all(), roster)
+
+    def test_snapshots_with_inline_catalog_are_read(self):
+        roster = {"أحمد": full_record(1)}
+        catalog = skill_catalog.SkillCatalog(skill_catalog.default_paths())
+        data = skill_catalog.encode_snapshot(catalog, {n: skill_catalog.pack_record(catalog, r) for n, r in roster.items()})
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({skill_catalog.LEGACY_CATALOG_KEY: data["catalog"], **data["students"]}, f, ensure_ascii=False)
+        store = storage.JournalStore(self.path)
+        self.assertEqual(store.load_all(), roster)
+        store.compact()
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(list(json.load(f)), ["format", "generation", "catalog", "students"])
+        self.assertEqual(storage.JournalStore(self.path).load_all(), roster)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+import sys
+import multiprocessing
+from unittest import mock
+# Add parent directory to path to import storage
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+
+class TestJournalStore(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "data.json")
+        self.store = storage.JournalStore(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_put_appends_to_journal_only(self):
+        self.store.replace_all({"a": {"info": {}, "evaluations": {}}, "b": {"info": {}, "evaluations": {}}})
+        snapshot_stamp = storage._stat(self.path)
+
+        self.store.put("a", {"info": {"gender": "ذكر"}, "evaluations": {}})
+
+        # اللقطة لم تتغير، والتعديل موجود في السجل فقط
+        self.assertEqual(storage._stat(self.path), snapshot_stamp)
+        with open(self.store.journal_path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0])["op"], "base")
+        self.assertEqual(json.loads(lines[1])["name"], "a")
+
+        fresh = storage.JournalStore(self.path)
+        self.assertEqual(fresh.get("a")["info"], {"gender": "ذكر"})
+
+    def test_revisions_track_changes(self):
+        self.store.replace_all({"a": {"n": 0}, "b": {"n": 0}, "c": {"n": 0}})
+        rev_a, rev_b = self.store.revision("a"), self.store.revision("b")
+        self.store.put("a", {"n": 1})
+        self.assertNotEqual(self.store.revision("a"), rev_a)
+        self.assertEqual(self.store.revision("b"), rev_b)
+        self.assertIsNone(self.store.revision("z"))
+
+    def test_unchanged_put_is_skipped(self):
+        record = {"info": {}, "evaluations": {}}
+        self.store.replace_all({"a": record})
+        self.store.put("a", dict(record))
+        self.assertFalse(os.path.exists(self.store.journal_path))
+
+    def test_compaction_folds_journal_into_snapshot(self):
+        self.store.replace_all({"a": {"n": 0}, "b": {"n": 0}, "c": {"n": 0}})
+        for i in range(1, storage.COMPACT_MIN_ENTRIES + 1):
+            self.store.put("a", {"n": i})
+
+        self.assertFalse(os.path.exists(self.store.journal_path))
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["students"]["a"], {"n": storage.COMPACT_MIN_ENTRIES})
+
+    def test_reader_between_compaction_steps_ignores_the_old_journal(self):
+        writer = storage.JournalStore(self.path)
+        reader = storage.JournalStore(self.path)
+        writer.replace_all({name: {"n": 0} for name in "abcd"})
+        writer.put("a", {"n": 1})
+        writer.put("b", {"n": 1})
+        reader.refresh()
+
+        # القارئ يزامن بعد كتابة اللقطة الجديدة وقبل حذف السجل القديم
+        remove = os.remove
+        def remove_after_refresh(path):
+            reader.refresh()
+            remove(path)
+        with mock.patch.object(storage.os, "remove", remove_after_refresh):
+            writer.compact()
+
+        # سجل جديد يتجاوز موضع القارئ في السجل القديم
+        other = storage.JournalStore(self.path)
+        other.put("c", {"n": 9})
+        for i in range(1, 5):
+            other.put("d", {"n": i})
+        self.assertEqual(reader.load_all(), {"a": {"n": 1}, "b": {"n": 1}, "c": {"n": 9}, "d": {"n": 4}})
+
+    def test_torn_journal_line_is_ignored(self):
+        self.store.replace_all({"a": {"n": 0}, "b": {"n": 0}, "c": {"n": 0}})
+        self.store.put("a", {"n": 1})
+        with open(self.store.journal_path, "a", encoding="utf-8") as f:
+            f.write('{"op": "put", "name": "b", "rec')
+
+        fresh = storage.JournalStore(self.path)
+        self.assertEqual(fresh.load_all()["a"], {"n": 1})
+        self.assertEqual(fresh.load_all()["b"], {"n": 0})
+
+        # الكتابة التالية تحذف السطر المقطوع بدلاً من الالتصاق به
+        fresh.put("c", {"n": 2})
+        self.assertEqual(storage.JournalStore(self.path).get("c"), {"n": 2})
+
+    def test_corrupt_snapshot_is_moved_aside_before_writing(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write('{"a": {"n": 0}, "b": {"n"')
+        with self.assertLogs("storage", "ERROR"):
+            self.store.put("c", {"n": 1})
+
+        backups = [n for n in os.listdir(self.test_dir) if n.startswith("data.json.corrupt-")]
+        self.assertEqual(len(backups), 1)
+        with open(os.path.join(self.test_dir, backups[0]), encoding="utf-8") as f:
+            self.assertEqual(f.read(), '{"a": {"n": 0}, "b": {"n"')
+        self.assertEqual(storage.JournalStore(self.path).load_all(), {"c": {"n": 1}})
+
+    def test_snapshot_with_wrong_structure_is_moved_aside(self):
+        for content in ('[1, 2, 3]', '{"format": "students-snapshot/2", "catalog": {}}', '{"a": [1]}'):
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(content)
+            store = storage.JournalStore(self.path)
+            with self.assertRaises(ValueError):
+                store.load_all()
+            with self.assertLogs("storage", "ERROR"):
+                store.put("c", {"n": 1})
+            self.assertEqual(storage.JournalStore(self.path).load_all(), {"c": {"n": 1}})
+        backups = [n for n in os.listdir(self.test_dir) if n.startswith("data.json.corrupt-")]
+        self.assertEqual(len(backups), 3)
+
+    def test_returned_records_are_independent_copies(self):
+        self.store.replace_all({"a": {"info": {"x": 1}}})
+        data = self.store.load_all()
+        data["a"]["info"]["x"] = 2
+        self.assertEqual(self.store.get("a"), {"info": {"x": 1}})
+
+def _grade_many(path, worker, count):
+    store = storage.JournalStore(path)
+    for i in range(count):
+        store.update(f"{worker}-{i}", lambda _: {"info": {}, "evaluations": {"n": i}})
+        store.update("shared", lambda rec: {"hits": (rec or {}).get("hits", 0) + 1})
+
+class TestConcurrentWrites(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "data.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_parallel_processes_do_not_lose_updates(self):
+        workers, count = 4, 60
+        procs = [
+            multiprocessing.Process(target=_grade_many, args=(self.path, w, count))
+            for w in range(workers)
+        ]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+
+        data = storage.JournalStore(self.path).load_all()
+        self.assertEqual(len(data), workers * count + 1)
+        self.assertEqual(data["shared"]["hits"], workers * count)
+
+    def test_replace_all_with_base_keeps_other_sessions_changes(self):
+        store = storage.JournalStore(self.path)
+        store.replace_all({"a": {"n": 0}, "b": {"n": 0}, "c": {"n": 0}})
+        session_a = store.load_all()
+        session_b = store.load_all()
+
+        session_b["b"] = {"n": 2}
+        store.replace_all(session_b, base=store.load_all())
+        edited = dict(session_a, a={"n": 1})
+        store.replace_all(edited, base=session_a)
+
+        self.assertEqual(store.load_all(), {"a": {"n": 1}, "b": {"n": 2}, "c": {"n": 0}})
+
+    def test_no_temp_files_left_behind(self):
+        store = storage.JournalStore(self.path)
+        store.replace_all({"a": {"n": 0}})
+        store.compact()
+        leftovers = [f for f in os.listdir(self.test_dir) if f.endswith(".tmp")]
+        self.assertEqual(leftovers, [])
+
+SAMPLE = {
+    "أ": {
+        "info": {"dob": "2020-01-01", "gender": "ذكر", "class_level": "تحضيري", "notes": ""},
+        "evaluations": {
+            "academic": {"الرياضيات": {"العد": 2, "الجمع": 1}},
+            "behavioral": {"الاجتماعية": {"التفاعل": {"المشاركة": 0}}},
+            "academic_notes": "ملاحظة",
+            "last_update": "2025-01-01"
+        }
+    },
+    "ب": {"info": {"gender": "أنثى", "class_level": "روضة"}, "evaluations": {}}
+}
+
+class TestSQLiteStore(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.store = storage.SQLiteStore(os.path.join(self.test_dir, "data.db"))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_roundtrip_is_lossless(self):
+        self.store.replace_all(SAMPLE)
+        self.assertEqual(self.store.load_all(), SAMPLE)
+        self.assertEqual(list(self.store.load_all()), list(SAMPLE))
+        self.assertEqual(self.store.get("ب"), SAMPLE["ب"])
+        self.assertIsNone(self.store.get("غير موجود"))
+
+    def test_put_replaces_only_one_student(self):
+        self.store.replace_all(SAMPLE)
+        self.store.put("ب", {"info": {}, "evaluations": {"academic": {"الرياضيات": {"العد": 2}}}})
+        self.assertEqual(self.store.get("أ"), SAMPLE["أ"])
+        self.assertEqual(self.store.get("ب")["evaluations"]["academic"], {"الرياضيات": {"العد": 2}})
+
+    def test_changed_scores_are_updated_in_place(self):
+        self.store.replace_all(SAMPLE)
+        record = self.store.get("أ")
+        record["evaluations"]["academic"]["الرياضيات"]["الجمع"] = 2
+        changes = self.store._conn.total_changes
+        self.store.update("أ", lambda _: record)
+        # صف التلميذ وعداد المراجعة وصف المهارة المتغيرة فقط
+        self.assertEqual(self.store._conn.total_changes - changes, 3)
+        self.assertEqual(self.store.get("أ"), record)
+        # تغير المهارات نفسها يعيد كتابة صفوف التقييم
+        record["evaluations"]["academic"]["الرياضيات"]["الطرح"] = 0
+        self.store.update("أ", lambda _: record)
+        self.assertEqual(self.store.get("أ"), record)
+
+    def test_infos(self):
+        self.store.replace_all(SAMPLE)
+        self.assertEqual(self.store.infos()["ب"], {"gender": "أنثى", "class_level": "روضة"})
+
+    def test_revisions_change_only_for_written_student(self):
+        self.store.replace_all(SAMPLE)
+        rev_a, rev_b, total = self.store.revision("أ"), self.store.revision("ب"), self.store.revision()
+        self.store.put("ب", {"info": {}, "evaluations": {}})
+        self.assertEqual(self.store.revision("أ"), rev_a)
+        self.assertNotEqual(self.store.revision("ب"), rev_b)
+        self.assertNotEqual(self.store.revision(), total)
+        self.assertIsNone(self.store.revision("غير موجود"))
+
+    def test_unchanged_update_keeps_revision(self):
+        self.store.replace_all(SAMPLE)
+        total = self.store.revision()
+        self.store.update_many({name: (lambda record: record) for name in SAMPLE})
+        self.store.update("غير موجود", lambda record: None)
+        self.assertEqual(self.store.revision(), total)
+        self.assertEqual(self.store.changes(total)[1], set())
+
+    def test_migrate_from_json(self):
+        json_path = os.path.join(self.test_dir, "data.json")
+        storage.JournalStore(json_path).replace_all(SAMPLE)
+        db_path = os.path.join(self.test_dir, "migrated.db")
+        self.assertEqual(storage.migrate_json_to_sqlite(json_path, db_path), 2)
+        self.assertEqual(storage.get_store(db_path, backend="sqlite").load_all(), SAMPLE)
+
+if __name__ == '__main__':
+    unittest.main()